@@ -4,11 +4,14 @@ import numpy as np
 import geopandas as gpd
 from io import StringIO
 import ast
+from collections.abc import Hashable
 
 class GeoCleaner:
-    def __init__(self, file):
+    def __init__(self, file, bbox=None):
         self.info_buffer = StringIO()
         self.file = file
+        # (minx, miny, maxx, maxy) in longitude and latitude, only used when loading GeoParquet
+        self.bbox = bbox
         self.df = None
         self.regions_level2 = gpd.read_file("../country_boundaries/gadm41_PRT_shp/gadm41_PRT_2.shp")
         self.logger = self.setup_logger()
@@ -59,11 +62,17 @@ class GeoCleaner:
     def load_data(self):
         self.logger.info("Loading data...")
         try:
-            self.df = pd.read_csv(self.file)
+            if self.file.endswith(".parquet"):
+                # GeoParquet written by the scraper already has typed coordinates and a point geometry in EPSG:4326
+                self.df = gpd.read_parquet(self.file, bbox=self.bbox) if self.bbox else gpd.read_parquet(self.file)
+                # The bbox covering column only serves bbox= filtering, and its dict cells can't be hashed
+                self.df = self.df.drop(columns=["bbox"], errors="ignore")
+            else:
+                self.df = pd.read_csv(self.file)
             self.logger.info(f"Data loaded successfully from {self.file}")
             self.logger.info(f"Percentage missing values {self.missing_values()}")
             self.logger.info(f"Percentage duplicated values {self.percentage_duplicates()}")
-            self.logger.info(f"Duplicated values per column: {self.df.apply(lambda x: x.duplicated().sum())}")
+            self.logger.info(f"Duplicated values per column: {self.df[self.hashable_columns()].apply(lambda x: x.duplicated().sum())}")
         except Exception as e:
             self.logger.error(f"Error loading data: {str(e)}")
             
@@ -76,8 +85,18 @@ class GeoCleaner:
         # percent of data that is missing
         return (total_missing/total_cells) * 100
         
+    def hashable_columns(self):
+        # GeoParquet keeps categories as arrays, which duplicated() can't compare
+        return [column for column in self.df.columns if self.df[column].map(lambda value: isinstance(value, Hashable)).all()]
+
     def percentage_duplicates(self):
-        return self.df.duplicated().sum() / len(self.df) * 100
+        return self.df.duplicated(subset=self.hashable_columns()).sum() / len(self.df) * 100
+
+    def has_geometry(self):
+        return isinstance(self.df, gpd.GeoDataFrame)
+
+    def location_columns(self):
+        return ['latitude', 'longitude'] if self.has_geometry() else ['coordinates']
 
     def check_data(self):
         self.logger.info("Checking data...")
@@ -98,7 +117,9 @@ class GeoCleaner:
         initial_columns = len(self.df.columns)
         self.logger.info("Removing unwanted columns...")
         try:
-            desired_columns = ["name", "website", "main_category", "categories", "phone", "address", "coordinates","link"]
+            desired_columns = ["name", "website", "main_category", "categories", "phone", "address", *self.location_columns(),"link"]
+            if self.has_geometry():
+                desired_columns.append("geometry")
             self.df = self.df[desired_columns]
             self.logger.info("Unwanted columns removed.")
             removed_columns = initial_columns - len(self.df.columns)
@@ -111,12 +132,14 @@ class GeoCleaner:
         self.logger.info("Removing null values and duplicates...")
         try:
             initial_rows = len(self.df)
-            self.df.replace("", np.nan, inplace=True)
-            self.df.replace("None", np.nan, inplace=True)
-            self.df.dropna(subset=["coordinates"], inplace=True)
+            if not self.has_geometry():
+                # Missing values are written as empty or "None" strings in the CSV, GeoParquet keeps them null
+                self.df.replace("", np.nan, inplace=True)
+                self.df.replace("None", np.nan, inplace=True)
+            self.df.dropna(subset=self.location_columns(), inplace=True)
             removed_rows = initial_rows - len(self.df)
             self.logger.info(f"Removed {removed_rows} rows with null values")
-            self.df.drop_duplicates(subset=['coordinates'] ,inplace=True)
+            self.df.drop_duplicates(subset=self.location_columns() ,inplace=True)
             initial_rows = len(self.df)
             #self.df.drop_duplicates(inplace=True)
             self.logger.info("Null values and duplicates removed.")
@@ -128,7 +151,8 @@ class GeoCleaner:
     def format_main_categories(self):
         self.logger.info("Formatting main categories...")
         try:
-            self.df[['latitude','longitude']] = self.df['coordinates'].str.split(',', expand=True)
+            if not self.has_geometry():
+                self.df[['latitude','longitude']] = self.df['coordinates'].str.split(',', expand=True)
             self.df['main_category'] = self.df['main_category'].map(self.translations).fillna(self.df['main_category'])
             self.logger.info("Main categories formatted.")
         except Exception as e:
@@ -139,9 +163,11 @@ class GeoCleaner:
         try:
             def translate_categories(category_list):
                 translated_list = []
-                if isinstance(category_list, float) and np.isnan(category_list):
+                if category_list is None or (isinstance(category_list, float) and np.isnan(category_list)):
                     return translated_list
-                for category in category_list.split(", "):
+                # Categories are a list in GeoParquet and a comma separated string in the CSV
+                categories = category_list.split(", ") if isinstance(category_list, str) else category_list
+                for category in categories:
                     if category in self.translations:
                         translated_list.append(self.translations[category])
                     else:
@@ -232,6 +258,9 @@ class GeoCleaner:
             self.logger.error(f"Error getting animal types: {str(e)}")
         
     def transform_gpd(self):
+        if self.has_geometry():
+            self.logger.info(f"Data is already a GeoDataFrame with CRS: {self.df.crs.to_epsg()}")
+            return
         self.logger.info("Converting the DataFrame to a GeoDataFrame...")
         try:
             self.df['latitude'] = self.df['latitude'].replace('None', np.nan)
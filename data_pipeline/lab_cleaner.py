@@ -6,9 +6,11 @@ from io import StringIO
 import matplotlib.pyplot as plt
 
 class GeoCleaner:
-    def __init__(self, file):
+    def __init__(self, file, bbox=None):
         self.info_buffer = StringIO()
         self.file = file
+        # (minx, miny, maxx, maxy) in longitude and latitude, only used when loading GeoParquet
+        self.bbox = bbox
         self.df = None
         self.regions_level2 = gpd.read_file("../country_boundaries/gadm41_AUT_shp/gadm41_AUT_2.shp")
         self.logger = self.setup_logger()
@@ -34,11 +36,23 @@ class GeoCleaner:
     def load_data(self):
         self.logger.info("Loading data...")
         try:
-            self.df = pd.read_csv(self.file)
+            if self.file.endswith(".parquet"):
+                # GeoParquet written by the scraper already has typed coordinates and a point geometry in EPSG:4326
+                self.df = gpd.read_parquet(self.file, bbox=self.bbox) if self.bbox else gpd.read_parquet(self.file)
+                # The bbox covering column only serves bbox= filtering, and its dict cells can't be hashed
+                self.df = self.df.drop(columns=["bbox"], errors="ignore")
+            else:
+                self.df = pd.read_csv(self.file)
             self.logger.info(f"Data loaded successfully from {self.file}")
         except Exception as e:
             self.logger.error(f"Error loading data: {str(e)}")
 
+    def has_geometry(self):
+        return isinstance(self.df, gpd.GeoDataFrame)
+
+    def location_columns(self):
+        return ['latitude', 'longitude'] if self.has_geometry() else ['coordinates']
+
     def check_data(self):
         self.logger.info("Checking data...")
         try:
@@ -58,7 +72,9 @@ class GeoCleaner:
         initial_columns = len(self.df.columns)
         self.logger.info("Removing unwanted columns...")
         try:
-            desired_columns = ["name", "website", "main_category", "categories", "phone", "address", "coordinates", "link"]
+            desired_columns = ["name", "website", "main_category", "categories", "phone", "address", *self.location_columns(), "link"]
+            if self.has_geometry():
+                desired_columns.append("geometry")
             self.df = self.df[desired_columns]
             self.logger.info("Unwanted columns removed.")
             removed_columns = initial_columns - len(self.df.columns)
@@ -70,10 +86,10 @@ class GeoCleaner:
         self.logger.info("Removing null values and duplicates...")
         try:
             initial_rows = len(self.df)
-            self.df.dropna(subset=["coordinates"], inplace=True)
+            self.df.dropna(subset=self.location_columns(), inplace=True)
             removed_rows = initial_rows - len(self.df)
             self.logger.info(f"Removed {removed_rows} rows with null values")
-            self.df.drop_duplicates(subset=['coordinates'], inplace=True)
+            self.df.drop_duplicates(subset=self.location_columns(), inplace=True)
             final_rows = len(self.df)
             self.logger.info("Null values and duplicates removed.")
             removed_rows = initial_rows - final_rows
@@ -84,7 +100,8 @@ class GeoCleaner:
     def format_main_categories(self):
         self.logger.info("Formatting main categories...")
         try:
-            self.df[['latitude', 'longitude']] = self.df['coordinates'].str.split(',', expand=True)
+            if not self.has_geometry():
+                self.df[['latitude', 'longitude']] = self.df['coordinates'].str.split(',', expand=True)
             self.df['main_category'] = self.df['main_category'].str.lower().str.strip().str.replace(" ", "_", regex=False)
             self.logger.info("Main categories formatted.")
         except Exception as e:
@@ -95,9 +112,11 @@ class GeoCleaner:
         try:
             def translate_categories(category_list):
                 translated_list = []
-                if isinstance(category_list, float) and np.isnan(category_list):
+                if category_list is None or (isinstance(category_list, float) and np.isnan(category_list)):
                     return translated_list
-                for category in category_list.split(", "):
+                # Categories are a list in GeoParquet and a comma separated string in the CSV
+                categories = category_list.split(", ") if isinstance(category_list, str) else category_list
+                for category in categories:
                     translated_list.append(category.lower().strip().replace(" ", "_"))
                 return translated_list
 
@@ -165,6 +184,9 @@ class GeoCleaner:
             self.logger.error(f"Error keeping specific categories: {str(e)}")
 
     def transform_gpd(self):
+        if self.has_geometry():
+            self.logger.info(f"Data is already a GeoDataFrame with CRS: {self.df.crs.to_epsg()}")
+            return
         self.logger.info("Converting the DataFrame to a GeoDataFrame...")
         try:
             self.df['latitude'] = self.df['latitude'].replace('None', np.nan).astype(float)
@@ -0,0 +1,76 @@
+"""
+Compares converting places to ASCII by building a transformed copy against converting them in place.
+
+Builds a payload shaped like scrape_places output, with detailed reviews, hours and about sections, and
+reports the runtime and the tracemalloc peak of each mode. Run from the scraper root:
+
+    python -m benchmarks.bench_apply_transformer 10000
+"""
+import sys
+import random
+import tracemalloc
+from copy import deepcopy
+from time import perf_counter
+
+from src.utils import applyTransformer, clear_unicode_cache, unicode_to_ascii
+
+NAMES = ["Fazenda São João", "Müller Hof", "Granja Ñandú", "Green Acres Farm", "Ferme du Château", "Orchard Lane"]
+CATEGORIES = ["Farm", "Dairy farm", "Ferme biologique", "Fazenda", "Agriturismo", "Bauernhof"]
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+WORDS = ["great", "fresh", "café", "très", "bon", "produce", "friendly", "über", "staff", "eggs"]
+
+
+def create_place(rng, index):
+    return {
+        "place_id": f"ChIJ{index:012d}",
+        "name": rng.choice(NAMES),
+        "main_category": rng.choice(CATEGORIES),
+        "categories": rng.sample(CATEGORIES, 3),
+        "address": f"Rua {rng.choice(NAMES)} {index}, São Paulo",
+        "rating": round(rng.uniform(1, 5), 1),
+        "reviews": rng.randint(0, 500),
+        "hours": [{"day": day, "times": ["9 am–5 pm"]} for day in DAYS],
+        "about": [{"id": "service_options", "name": "Service options", "options": [{"name": "Entrega", "enabled": True}]}],
+        "detailed_reviews": [
+            {
+                "review_id": f"{index}-{n}",
+                "reviewer_name": rng.choice(NAMES),
+                "review_text": " ".join(rng.choice(WORDS) for _ in range(40)),
+                "published_at": "a month ago",
+                "rating": rng.randint(1, 5),
+            }
+            for n in range(10)
+        ],
+    }
+
+
+def measure(fn):
+    clear_unicode_cache()
+    tracemalloc.start()
+    start = perf_counter()
+    fn()
+    elapsed = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(n_places=10000):
+    rng = random.Random(0)
+    places = [create_place(rng, index) for index in range(n_places)]
+    fresh = deepcopy(places)
+
+    copied = applyTransformer(deepcopy(places), unicode_to_ascii)
+    assert applyTransformer(deepcopy(places), unicode_to_ascii, in_place=True) == copied, "Modes disagree"
+
+    copy_time, copy_peak = measure(lambda: applyTransformer(places, unicode_to_ascii))
+    in_place_time, in_place_peak = measure(lambda: applyTransformer(fresh, unicode_to_ascii, in_place=True))
+
+    print(f"{n_places} places")
+    print(f"copy:     {copy_time:.3f}s, peak {copy_peak / 1_000_000:.1f} MB")
+    print(f"in place: {in_place_time:.3f}s, peak {in_place_peak / 1_000_000:.1f} MB")
+    print(f"speedup: {copy_time / in_place_time:.2f}x, memory: {copy_peak / max(in_place_peak, 1):.1f}x less")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,54 @@
+"""
+Compares decoding APP_INITIALIZATION_STATE with two splits and two json.loads against the single pass scanner.
+
+Save a few place pages first, e.g. with bt.write_html(requests.get(link).text, "pages/place-1"), then run
+from the scraper root:
+
+    python -m benchmarks.bench_extract_data output/pages
+"""
+import sys
+import glob
+from time import perf_counter
+
+from src.extract_data import parse_html, parse_legacy
+
+
+def decode_with_splits(html):
+    initialization_state_part = html.split(';window.APP_INITIALIZATION_STATE=')[1]
+    app_initialization_state = initialization_state_part.split(';window.APP_FLAGS')[0]
+    return parse_legacy(app_initialization_state)
+
+
+def measure(fn, pages, rounds):
+    start = perf_counter()
+    for _ in range(rounds):
+        for html in pages:
+            fn(html)
+    return perf_counter() - start
+
+
+def main(folder, rounds=20):
+    pages = []
+    for path in sorted(glob.glob(f"{folder}/*.html")):
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+
+    if not pages:
+        print(f"No .html fixtures found in {folder}")
+        return
+
+    for html in pages:
+        assert parse_html(html) == decode_with_splits(html), "Decoders disagree"
+
+    megabytes = sum(len(html) for html in pages) * rounds / 1_000_000
+    splits = measure(decode_with_splits, pages, rounds)
+    scanner = measure(parse_html, pages, rounds)
+
+    print(f"{len(pages)} pages x {rounds} rounds ({megabytes:.1f} MB)")
+    print(f"split + json.loads x2: {splits:.3f}s ({megabytes / splits:.1f} MB/s)")
+    print(f"single pass scanner:   {scanner:.3f}s ({megabytes / scanner:.1f} MB/s)")
+    print(f"speedup: {splits / scanner:.2f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "output/pages")
@@ -0,0 +1,250 @@
+"""
+Compares parsing review pages with BeautifulSoup and lxml against the lxml only path with precompiled selectors.
+
+Save a few reviewSort responses first, e.g. with bt.write_html(scraper._cut_response_text(text), "review_pages/place-1"),
+then run from the scraper root:
+
+    python -m benchmarks.bench_review_parsing output/review_pages
+"""
+import sys
+import glob
+import traceback
+from datetime import datetime
+from time import perf_counter
+
+import regex as re
+from bs4 import BeautifulSoup, Tag
+from lxml import html
+
+from src.reviews_scraper import GoogleMapsAPIScraper, extract_reviews_and_photos, review_default_result
+
+# Derived from the time of parsing, so they are left out of the comparison
+VOLATILE_KEYS = ["retrieval_date", "text_date", "response_text_date", "errors"]
+
+
+def format_response_soup(scraper, response_text: str):
+    """Transforms text into soup and extract list of reviews, as _format_response_text did before lxml selectors"""
+    response_soup = reviews_soup = review_count = next_token = None
+    try:
+        # Send page to soup and trees
+        response_soup = BeautifulSoup(response_text, "lxml")
+        tree = html.document_fromstring(response_text)
+        # bt.write_html(response_text , "fff.html")
+        # Encontrando número de reviews e token de próxima página
+        metadata_node = tree.xpath("//*[@data-google-review-count]")[0]
+        review_count = int(metadata_node.attrib["data-google-review-count"])
+        next_token = metadata_node.attrib["data-next-page-token"]
+
+        # Iterando sobre texto de cada review
+        # reviews_tree = tree.xpath('//*[contains(@class, "gws-localreviews__google-review")]')
+
+        reviews_soup = response_soup.find_all(True, class_="gws-localreviews__google-review")
+
+        # reviews_soup = [
+        #     response_soup.find("div", dict(r.attrib)) for r in reviews_tree
+        # ]
+    except Exception as e:
+        tb = re.sub(r"\s", " ", traceback.format_exc())  # Corrected
+
+        if next_token is None:
+            next_token = scraper._get_response_token(response_text)
+
+    return response_text, response_soup, reviews_soup, review_count, next_token
+
+
+def parse_review_text_soup(text_block) -> str:
+    """Parse review text soup, removing unwanted characters"""
+    text = ""
+    for e, s in zip(text_block.contents, text_block.stripped_strings):
+        if isinstance(e, Tag) and e.has_attr(
+            "class"
+        ):  #  and e.attrs["class"] in ["review-snippet","k8MTF",]:
+            break
+        text += s + " "
+
+    text = re.sub(r"\s", " ", text)  # Corrected
+    text = re.sub("'|\"", "", text)
+    text = text.strip()
+    return text
+
+
+def parse_review_soup(scraper, review: Tag, hl) -> dict:
+    """Parses a review soup, as _parse_review did before lxml selectors"""
+    result = review_default_result.copy()
+
+    # Make timestamp
+    result["retrieval_date"] = str(datetime.now())
+
+    # Parse text
+    try:
+        # Find text block
+        text_block = review.find(True, class_="review-full-text")
+        if not text_block:
+            text_block = review.find(True, {"data-expandable-section": True})
+        # Extract text
+        if text_block:
+            result["text"] = parse_review_text_soup(text_block)
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "text")
+    try:
+        # Find text block
+        translated_text = review.find_all(True, class_="review-full-text")
+        if not translated_text:
+            translated_text = review.find_all(True, {"data-expandable-section": True})
+        # Extract text
+        # print(text_block)
+        if len(translated_text) > 1:
+            result["translated_text"] = parse_review_text_soup(translated_text[1])
+            # print("aaaaaa", result["translated_text"])
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "translated_text")
+
+    # Parse review rating
+    try:
+        rating_text = review.find(True, class_="lTi8oc z3HNkc").get("aria-label")
+        rating_text = re.sub(",", ".", rating_text)
+        rating = re.findall("[0-9]+[.][0-9]*", rating_text)
+        result["rating"] = float(rating[0])
+        result["rating_max"] = None
+
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "rating")
+
+    # Parse other ratings
+    try:
+        other_ratings = review.find(True, class_="k8MTF")
+        if other_ratings:
+            s = " ".join([s for s in other_ratings.stripped_strings])
+            result["other_ratings"] = re.sub(r"\s+", " ", s)
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "other_ratings")
+
+    # Parse relative date
+    try:
+        result["relative_date"] = review.find(True, class_="dehysf lTi8oc").text
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "relative_date")
+
+    # Parse user name
+    try:
+        result["user_name"] = review.find(True, class_="TSUbDb").text
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "user_name")
+
+    # Parse user metadata
+    try:
+        user_node = review.find(True, class_="Msppse")
+        if user_node:
+            result["user_url"] = user_node.get("href")
+            result["user_is_local_guide"] = (
+                True if user_node.find(True, class_="QV3IV") else False
+            )
+            fixed_text = user_node.text.replace(",", "").replace(".", "")
+            user_reviews,user_photos =  extract_reviews_and_photos(fixed_text)
+            result["user_reviews"] = user_reviews
+            result["user_photos"] = user_photos
+
+            # print(text)
+            # user_reviews = re.findall(
+            #     "[Uuma0-9.,]+(?= comentário| review)", user_node.text
+            # )
+            # user_photos = re.findall("[Uuma0-9.,]+(?= foto| photo)", user_node.text)
+            # if len(user_reviews) > 0:
+            # if len(user_photos) > 0:
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "user_data")
+
+    # Parse review id
+    try:
+        # result["review_id"] = review.find(True, {"data-ri": True}).get("data-ri")
+        review_id = review.find(True, class_="RvU3D").get("href")
+        result["review_id"] = re.findall("(?<=postId=).*?(?=&)", review_id)[0]
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "review_id")
+
+    # Parse review likes
+    try:
+        review_likes = review.find(True, jsname="CMh1ye")
+        if review_likes:
+            result["likes"] = int(review_likes.text)
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "likes")
+
+    # Parse review response
+    try:
+        response = review.find(True, class_="d6SCIc")
+        if response:
+            result["response_text"] = parse_review_text_soup(response)
+        response_date = review.find(True, class_="pi8uOe")
+        if response_date:
+            result["response_relative_date"] = response_date.text
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "response")
+
+    try:
+        response = review.find_all(True, class_="d6SCIc")
+        if response:
+            result["translated_response_text"] = parse_review_text_soup(response[1])
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "response")
+
+    # Parse trip_type_travel_group
+    try:
+        trip_type_travel_group = review.find(True, class_="PV7e7")
+        if trip_type_travel_group:
+            s = " ".join([s for s in trip_type_travel_group.stripped_strings])
+            result["trip_type_travel_group"] = re.sub(r"\s+", " ", s)  # Corrected
+    except Exception as e:
+        scraper._handle_review_exception(result, review, "trip_type_travel_group")
+
+    return scraper._finish_review(result, hl)
+
+
+def parse_page_with_soup(scraper, text):
+    _, _, reviews, _, _ = format_response_soup(scraper, text)
+    return [parse_review_soup(scraper, review, "en") for review in reviews]
+
+
+def parse_page_with_lxml(scraper, text):
+    _, _, reviews, _, _ = scraper._format_response_text(text)
+    return [scraper._parse_review(review, "en") for review in reviews]
+
+
+def comparable(reviews):
+    return [{key: value for key, value in review.items() if key not in VOLATILE_KEYS} for review in reviews]
+
+
+def measure(fn, scraper, pages, rounds):
+    start = perf_counter()
+    for _ in range(rounds):
+        for text in pages:
+            fn(scraper, text)
+    return perf_counter() - start
+
+
+def main(folder, rounds=20):
+    pages = []
+    for path in sorted(glob.glob(f"{folder}/*.html")):
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+
+    if not pages:
+        print(f"No .html fixtures found in {folder}")
+        return
+
+    scraper = GoogleMapsAPIScraper()
+    for text in pages:
+        assert comparable(parse_page_with_lxml(scraper, text)) == comparable(parse_page_with_soup(scraper, text)), "Parsers disagree"
+
+    soup = measure(parse_page_with_soup, scraper, pages, rounds)
+    lxml_only = measure(parse_page_with_lxml, scraper, pages, rounds)
+
+    n = len(pages) * rounds
+    print(f"{len(pages)} pages x {rounds} rounds")
+    print(f"BeautifulSoup + lxml: {soup:.3f}s ({soup / n * 1000:.2f} ms/page)")
+    print(f"lxml selectors:       {lxml_only:.3f}s ({lxml_only / n * 1000:.2f} ms/page)")
+    print(f"speedup: {soup / lxml_only:.2f}x")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1] if len(sys.argv) > 1 else "output/review_pages")
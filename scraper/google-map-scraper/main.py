@@ -1,3 +1,4 @@
+import sys
 from src.gmaps import Gmaps
 import pandas as pd
 from tasks.data_pipeline.geo_cleaner import GeoCleaner
@@ -16,7 +17,8 @@ for _, row in df.iterrows():
     queries.append(query)
 
 
-Gmaps.places(queries, lang="en")
+# Run with --resume to pick up where an interrupted run of these queries stopped
+Gmaps.places(queries, lang="en", resume="--resume" in sys.argv)
 #cleaner = GeoCleaner()
 #cleaner.clean("output/all/csv/places-of-all.csv")
 #insert_data_from_csv("output/all/csv/places-of-all_cleaned.csv")
\ No newline at end of file
@@ -0,0 +1,138 @@
+import os
+import heapq
+import itertools
+import json
+import tempfile
+from contextlib import ExitStack
+from botasaurus.decorators_utils import create_directory_if_not_exists
+from src.sort_filter import compile_sort
+from src.utils import kebab_case
+
+ALL_STORE_DIR = "output/all/chunks/"
+
+# Chunks merged at once, so a run of thousands of queries stays under the open files limit
+MAX_OPEN_CHUNKS = 256
+
+# First line of a chunk, recording the sort spec its places are in
+SORT_HEADER = "chunk_sort"
+
+
+def write_lines(file, items):
+    for item in items:
+        file.write(json.dumps(item))
+        file.write("\n")
+
+
+def read_lines(file):
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def normalize_sort(sort):
+    """The sort spec as it reads back from JSON, so a spec of tuples equals the one stored in a chunk"""
+    return json.loads(json.dumps(sort))
+
+
+def write_chunk(path, places, sort):
+    """
+    Writes places sorted by sort, each as [position, place] with its position in places,
+    so the chunk can be sorted again with another spec from the original order.
+    """
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        write_lines(file, [{SORT_HEADER: normalize_sort(sort)}])
+        write_lines(file, ([position, places[position]] for position in compile_sort(sort).order(places)))
+    # Renamed once complete, so a crash never leaves a partial chunk behind
+    os.replace(temp_path, path)
+
+
+def read_chunk(file):
+    """Returns the sort spec of a chunk, or None if it has none, and an iterator over its [position, place] items"""
+    lines = read_lines(file)
+    first = next(lines, None)
+    if isinstance(first, dict) and set(first) == {SORT_HEADER}:
+        return first[SORT_HEADER], lines
+    # Written before chunks had a header, as bare places
+    places = lines if first is None else itertools.chain([first], lines)
+    return None, ([position, place] for position, place in enumerate(places))
+
+
+class AllStore:
+    """
+    Append-only store of the places of every query of a run, one sorted JSONL chunk per query.
+
+    Chunks are written as soon as a query is processed, so a crash keeps the places of the finished queries,
+    and the sorted "all" output is a k-way merge of the chunks instead of a sort of every place in memory.
+    Each chunk records the sort spec it was written with, and one written with another spec is sorted
+    again before merging, so a resumed run with a new sort still merges in the right order.
+    """
+    def __init__(self, directory=ALL_STORE_DIR):
+        self.directory = directory
+
+    def chunk_path(self, index, query):
+        return os.path.join(self.directory, f"{index:06d}-{kebab_case(query)}.jsonl")
+
+    def chunk_paths(self):
+        if not os.path.isdir(self.directory):
+            return []
+        names = [name for name in os.listdir(self.directory) if name.endswith(".jsonl")]
+        # Ordered by query index, so places that sort equal keep the order of their queries
+        return [os.path.join(self.directory, name) for name in sorted(names, key=lambda name: int(name.split("-")[0]))]
+
+    def clear(self):
+        for path in self.chunk_paths():
+            os.remove(path)
+
+    def append(self, index, query, places, sort):
+        """Writes the places of the query at index as a chunk sorted by sort"""
+        create_directory_if_not_exists(self.directory)
+        path = self.chunk_path(index, query)
+        write_chunk(path, places, sort)
+        return path
+
+    def load(self, index, query):
+        """Returns the places appended for the query at index, in the order they were appended"""
+        with open(self.chunk_path(index, query), encoding="utf-8") as file:
+            _, items = read_chunk(file)
+            return [place for _, place in sorted(items, key=lambda item: item[0])]
+
+    def open_chunk(self, stack, path, sort):
+        """Opens a chunk for merging, sorting it again first if it was written with another sort spec"""
+        file = stack.enter_context(open(path, encoding="utf-8"))
+        chunk_sort, items = read_chunk(file)
+        if chunk_sort == normalize_sort(sort):
+            return file, items
+
+        places = [place for _, place in sorted(items, key=lambda item: item[0])]
+        file.close()
+        write_chunk(path, places, sort)
+
+        file = stack.enter_context(open(path, encoding="utf-8"))
+        _, items = read_chunk(file)
+        return file, items
+
+    def merge_items(self, items, key):
+        return heapq.merge(*items, key=lambda item: key(item[1]))
+
+    def merged(self, sort):
+        """Yields the places of every chunk in sort order, holding one place per chunk in memory"""
+        key = compile_sort(sort).key
+        with ExitStack() as stack:
+            chunks = [self.open_chunk(stack, path, sort) for path in self.chunk_paths()]
+
+            # Merge consecutive groups of chunks into temporary files until few enough are left
+            while len(chunks) > MAX_OPEN_CHUNKS:
+                merged_chunks = []
+                for start in range(0, len(chunks), MAX_OPEN_CHUNKS):
+                    group = chunks[start:start + MAX_OPEN_CHUNKS]
+                    merged_file = stack.enter_context(tempfile.TemporaryFile("w+", encoding="utf-8"))
+                    write_lines(merged_file, self.merge_items([items for _, items in group], key))
+                    merged_file.seek(0)
+                    for file, _ in group:
+                        file.close()
+                    merged_chunks.append((merged_file, read_lines(merged_file)))
+                chunks = merged_chunks
+
+            for _, place in self.merge_items([items for _, items in chunks], key):
+                yield place
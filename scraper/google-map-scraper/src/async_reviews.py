@@ -0,0 +1,146 @@
+import asyncio
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from botasaurus.cache import Cache
+from .reviews_scraper import GoogleMapsAPIScraper, ReviewPagination, get_shared_session, default_n_retries, default_retry_time
+from .scraper import process_reviews, scrape_reviews
+from .review_store import load_stored_reviews, store_new_reviews
+
+default_requests_per_second = 10
+default_per_host_concurrency = 20
+default_concurrent_places = 200
+
+
+class AsyncRateLimiter:
+    """
+    Token bucket shared by every coroutine of the event loop, so all places together stay under requests_per_second.
+    """
+    def __init__(self, requests_per_second, burst=None):
+        self.rate = requests_per_second
+        self.burst = burst or max(1, requests_per_second)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncReviewsEngine:
+    """
+    Follows the next_page_token chains of many places at once over one event loop.
+
+    Pages of a single place are still fetched one after the other, as each page holds the token of the next.
+    Requests go through the shared requests session in worker threads, so pages are retried and decoded as in
+    GoogleMapsAPIScraper.scrape_reviews.
+    """
+    def __init__(
+        self,
+        requests_per_second: float = default_requests_per_second,
+        per_host_concurrency: int = default_per_host_concurrency,
+        concurrent_places: int = default_concurrent_places,
+        n_retries: int = default_n_retries,
+        retry_time: float = default_retry_time,
+    ):
+        self.requests_per_second = requests_per_second
+        self.per_host_concurrency = per_host_concurrency
+        self.concurrent_places = concurrent_places
+        self.n_retries = n_retries
+        self.retry_time = retry_time
+        self.scraper = GoogleMapsAPIScraper(session=get_shared_session(), n_retries=n_retries, retry_time=retry_time)
+
+    def _host_semaphore(self, url):
+        host = urlparse(url).netloc
+        if host not in self.host_semaphores:
+            self.host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return self.host_semaphores[host]
+
+    async def _fetch(self, url):
+        await self.limiter.acquire()
+        async with self._host_semaphore(url):
+            response = await asyncio.get_running_loop().run_in_executor(self.executor, self.scraper.session.get, url)
+            response.raise_for_status()
+            return self.scraper._decode_response(response)
+
+    async def _get_page(self, query):
+        response_text = await self._fetch(query)
+        # Parsing is CPU bound, so keep it off the event loop
+        return await asyncio.to_thread(self.scraper._read_response_text, response_text)
+
+    async def scrape_reviews(self, url, n_reviews, hl="en", sort_by="", token="", stop_at_review_ids=None):
+        """Async counterpart of GoogleMapsAPIScraper.scrape_reviews, paced by the shared rate limiter instead of request_interval"""
+        pages = ReviewPagination(self.scraper, url, n_reviews, hl, sort_by, token, stop_at_review_ids)
+
+        while not pages.done:
+            try:
+                page = await self._get_page(pages.query())
+                pages.check_page(page)
+            except Exception as e:
+                if pages.retry(e):
+                    await asyncio.sleep(self.retry_time)
+                continue
+
+            await asyncio.to_thread(pages.add_page, page)
+
+        return pages.result()
+
+    async def _scrape_place_reviews(self, data, cache):
+        if cache is True and Cache.has(scrape_reviews, data):
+            return Cache.get(scrape_reviews, data)
+
+        incremental = data.get("incremental")
+        stored_reviews, known_review_ids = load_stored_reviews(data["place_id"]) if incremental else ([], None)
+
+        async with self.place_semaphore:
+            try:
+                result = await self.scrape_reviews(data["link"], data["max"], data["lang"], sort_by=data["reviews_sort"], stop_at_review_ids=known_review_ids)
+            except Exception:
+                traceback.print_exc()
+                return None
+
+        reviews = process_reviews(result, data["convert_to_english"])
+        if incremental:
+            reviews = store_new_reviews(data["place_id"], reviews, stored_reviews)
+
+        processed = {"place_id": data["place_id"], "reviews": reviews}
+        if cache:
+            # Shares the cache of scraper.scrape_reviews, so both engines reuse each other's results
+            Cache.put(scrape_reviews, data, processed)
+        return processed
+
+    async def scrape_all(self, reviews_data, cache=True):
+        """Coroutine of run, for callers already running an event loop"""
+        self.limiter = AsyncRateLimiter(self.requests_per_second)
+        self.host_semaphores = {}
+        self.place_semaphore = asyncio.Semaphore(self.concurrent_places)
+        # Sized for per_host_concurrency, the default executor of asyncio.to_thread may have fewer workers
+        self.executor = ThreadPoolExecutor(max_workers=self.per_host_concurrency)
+        try:
+            return await asyncio.gather(*[self._scrape_place_reviews(data, cache) for data in reviews_data])
+        finally:
+            self.executor.shutdown(wait=False)
+
+    def run(self, reviews_data, cache=True):
+        """Scrapes the reviews of every place in reviews_data, returning the same items as scraper.scrape_reviews"""
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.scrape_all(reviews_data, cache))
+        raise RuntimeError(
+            "AsyncReviewsEngine.run can't be called from a running event loop, e.g. in Jupyter. "
+            "Use await AsyncReviewsEngine().scrape_all(reviews_data) instead."
+        )
+
+
+def scrape_reviews_async(reviews_data, cache=True, **engine_options):
+    return AsyncReviewsEngine(**engine_options).run(reviews_data, cache)
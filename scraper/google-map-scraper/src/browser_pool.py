@@ -0,0 +1,127 @@
+from importlib.metadata import PackageNotFoundError, version
+from threading import Lock, local
+from src.cookie_jar import CookieJar
+from src.scraper_utils import create_search_link, perform_visit
+
+# Search visited to get Google's cookies when no query has been searched yet, e.g. when scraping links
+WARM_UP_QUERY = "web developers in bangalore"
+
+# botasaurus versions whose browser tasks keep their idle drivers in task._driver_pool and evaluate
+# lang on the thread running a task right before taking a driver, which sharing relies on
+SUPPORTED_BOTASAURUS_VERSIONS = ("3.2.",)
+
+
+def get_botasaurus_version():
+    try:
+        return version("botasaurus")
+    except PackageNotFoundError:
+        return None
+
+
+class DriverPool(list):
+    """
+    Idle drivers of every shared task, each tagged with the lang it was launched with.
+
+    botasaurus only calls len, pop and append on the pool, without saying which task asks. The lang option
+    of a shared task selects its lang on the running thread first, so len and pop only see the drivers
+    launched with that lang, and append tags a new driver with it. Without a selection the pool is a plain list,
+    which is how the tasks close it.
+    """
+    def __init__(self):
+        super().__init__()
+        self.selected = local()
+        self.langs = {}
+        self.lock = Lock()
+
+    def select(self, lang):
+        self.selected.lang = lang
+
+    def deselect(self):
+        self.selected.__dict__.pop("lang", None)
+
+    def matching(self):
+        if "lang" not in self.selected.__dict__:
+            return None
+        lang = self.selected.lang
+        return [driver for driver in list.__iter__(self) if self.langs.get(id(driver)) == lang]
+
+    def __len__(self):
+        with self.lock:
+            drivers = self.matching()
+            return list.__len__(self) if drivers is None else len(drivers)
+
+    def pop(self, *args):
+        with self.lock:
+            drivers = self.matching()
+            if drivers is None:
+                driver = list.pop(self, *args)
+            elif not drivers:
+                raise IndexError("pop from empty list")
+            else:
+                driver = drivers[-1]
+                list.remove(self, driver)
+            self.langs.pop(id(driver), None)
+            return driver
+
+    def append(self, driver):
+        with self.lock:
+            if "lang" in self.selected.__dict__:
+                self.langs[id(driver)] = self.selected.lang
+            list.append(self, driver)
+
+
+class BrowserPool:
+    """
+    Browsers shared by scrape_places and scrape_places_by_links for a whole run.
+
+    Both are botasaurus browser tasks that reuse drivers, so they are made to lease from one pool of idle drivers:
+    a task pops a driver when it starts and puts it back when it ends, and only launches a new one when every
+    driver launched with its lang is leased. The cookie jar scrape_place sends its requests with is filled here
+    as well. Drivers add their cookies whenever they visit Google Maps, so a task only visits a search page for
+    cookies when the jar is empty.
+    """
+    def __init__(self, cookie_jar=None):
+        self.cookie_jar = cookie_jar if cookie_jar is not None else CookieJar()
+        self.idle_drivers = DriverPool()
+        self.tasks = []
+
+    def lang(self, get_lang=None):
+        """Returns the lang option of a shared task, which also selects the idle drivers launched with that lang"""
+        def evaluate(data):
+            lang = get_lang(data) if get_lang is not None else None
+            self.idle_drivers.select(lang)
+            return lang
+        return evaluate
+
+    def share(self, *tasks):
+        """Makes the botasaurus browser tasks lease their drivers from this pool"""
+        botasaurus_version = get_botasaurus_version()
+        if botasaurus_version is None or not botasaurus_version.startswith(SUPPORTED_BOTASAURUS_VERSIONS):
+            print(f"Browsers are not shared between tasks with botasaurus {botasaurus_version}, as it may keep its drivers differently.")
+            return
+        for task in tasks:
+            if not isinstance(getattr(task, "_driver_pool", None), list):
+                raise TypeError(f"{task.__name__} does not keep its drivers in a pool that can be shared, is it a browser task with keep_drivers_alive?")
+            task._driver_pool = self.idle_drivers
+            self.tasks.append(task)
+
+    def refresh_cookies(self, driver):
+        """Adds the cookies of a driver that is on Google Maps to the jar"""
+        self.cookie_jar.add(driver.get_cookies_dict())
+
+    def warm_up(self, driver):
+        """Visits a search page for cookies when the jar is empty"""
+        if self.cookie_jar.has_cookies():
+            return
+        perform_visit(driver, create_search_link(WARM_UP_QUERY, "en", None, None))
+        self.refresh_cookies(driver)
+
+    def close(self):
+        """Quits every idle driver, tasks leave theirs in the pool when they end"""
+        self.idle_drivers.deselect()
+        for task in self.tasks:
+            # Each task closes the shared pool, so only the first one has drivers left to quit
+            task.close()
+
+
+browser_pool = BrowserPool()
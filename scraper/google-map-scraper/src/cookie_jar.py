@@ -0,0 +1,102 @@
+from threading import Lock
+from time import monotonic
+
+# Sets older than this are dropped, a browser visiting Google Maps hands out a fresh one
+MAX_COOKIE_AGE = 30 * 60
+
+# Sets handed out in turn, one per browser at most since a browser keeps its cookies between visits
+MAX_COOKIE_SETS = 8
+
+# Errors in a row after which a set is retired, as Google is likely throttling the requests that send it
+MAX_COOKIE_ERRORS = 3
+
+
+class CookieSet:
+    def __init__(self, cookies):
+        self.cookies = cookies
+        self.harvested = monotonic()
+        self.requests = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+
+
+class CookieJar:
+    """
+    Google cookie sets taken from the browsers, handed out in turn to the scrape_place workers.
+
+    Spreading the requests over several sets keeps each set under the rate at which Google starts throttling it.
+    Workers report how their request went, and a set whose requests fail max_errors times in a row is retired,
+    as are sets older than max_age. The browsers add their sets whenever they visit Google Maps, and the oldest set
+    makes way once the jar holds max_sets.
+    """
+    def __init__(self, max_sets=MAX_COOKIE_SETS, max_age=MAX_COOKIE_AGE, max_errors=MAX_COOKIE_ERRORS):
+        self.max_sets = max_sets
+        self.max_age = max_age
+        self.max_errors = max_errors
+        self.lock = Lock()
+        self.sets = []
+        self.turn = 0
+        self.retired = 0
+
+    def _drop_stale(self):
+        now = monotonic()
+        fresh = [cookie_set for cookie_set in self.sets if now - cookie_set.harvested <= self.max_age]
+        self.retired += len(self.sets) - len(fresh)
+        self.sets = fresh
+
+    def add(self, cookies):
+        """Adds a set taken from a browser, or renews it if the jar already holds the same cookies"""
+        if not cookies:
+            return
+        with self.lock:
+            for cookie_set in self.sets:
+                if cookie_set.cookies == cookies:
+                    cookie_set.harvested = monotonic()
+                    return
+
+            self.sets.append(CookieSet(cookies))
+            if len(self.sets) > self.max_sets:
+                self.sets.remove(min(self.sets, key=lambda cookie_set: cookie_set.harvested))
+                self.retired += 1
+
+    def has_cookies(self):
+        with self.lock:
+            self._drop_stale()
+            return len(self.sets) > 0
+
+    def take(self):
+        """Returns the next set in turn, or None when the jar is empty"""
+        with self.lock:
+            self._drop_stale()
+            if not self.sets:
+                return None
+            cookie_set = self.sets[self.turn % len(self.sets)]
+            self.turn += 1
+            cookie_set.requests += 1
+            return cookie_set
+
+    def record_success(self, cookie_set):
+        if cookie_set is None:
+            return
+        with self.lock:
+            cookie_set.consecutive_errors = 0
+
+    def record_error(self, cookie_set):
+        if cookie_set is None:
+            return
+        with self.lock:
+            cookie_set.errors += 1
+            cookie_set.consecutive_errors += 1
+            if cookie_set.consecutive_errors >= self.max_errors and cookie_set in self.sets:
+                self.sets.remove(cookie_set)
+                self.retired += 1
+                print(f"Retired a set of cookies after {cookie_set.consecutive_errors} errors in a row, {len(self.sets)} left.")
+
+    def stats(self):
+        with self.lock:
+            return {
+                "sets": len(self.sets),
+                "retired": self.retired,
+                "requests": sum(cookie_set.requests for cookie_set in self.sets),
+                "errors": sum(cookie_set.errors for cookie_set in self.sets),
+            }
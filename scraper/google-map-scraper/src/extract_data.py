@@ -1,9 +1,24 @@
 import re as rex
 import json
 from datetime import datetime
+from threading import Lock
+from time import perf_counter
 from botasaurus import *
 
 from src.scraper_utils import create_search_link
+from src.field_paths import FieldPaths
+from src.fields import Fields
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+INITIALIZATION_STATE_MARKER = ';window.APP_INITIALIZATION_STATE='
+XSSI_PREFIX = ")]}'"
+PLACE_PATH = (3, 6)
+
+json_decoder = json.JSONDecoder()
 
 def toiso(date):
     return date.isoformat() 
@@ -61,7 +76,10 @@ def get_gps_coordinates(data):
     return {'latitude': safe_get(data, 6, 9, 2), 'longitude': safe_get(data, 6, 9, 3)}
 
 def get_images(data):
-    images = safe_get(data, 6, 171, 0) or []
+    return format_images(safe_get(data, 6, 171, 0))
+
+def format_images(images):
+    images = images or []
     ls = []
     for element in images:
         title = element[2]
@@ -71,7 +89,10 @@ def get_images(data):
     return ls
 
 def extract_questions(data):
-    images = safe_get(data, 6, 126) or []
+    return format_questions(safe_get(data, 6, 126), get_owner(data))
+
+def format_questions(questions, ownerd):
+    images = questions or []
     ls = []
     for element in images:
         question_data = safe_get(element, 0, 0)
@@ -106,7 +127,6 @@ def extract_questions(data):
                 "link": answered_by_link,
             }
         else:
-            ownerd = get_owner(data)
             answered_by = {
                 "name": ownerd.get('name', None),
                 "link": ownerd.get('link', None),
@@ -138,8 +158,11 @@ def get_hl_from_link_competitors(link):
         return match.group(1) if match else None
 
 def extract_competitors(data, link):
+    return format_competitors(safe_get(data, 6, 99,0,0,1), link)
+
+def format_competitors(competitors, link):
 
-    images = safe_get(data, 6, 99,0,0,1) or []
+    images = competitors or []
     ls = []
     hl = get_hl_from_link_competitors(link)
     for element in images:
@@ -197,7 +220,10 @@ def extract_time_data(data):
 
 
 def extract_popular_times(data):
-    images = safe_get(data, 6, 84,0) or []
+    return format_popular_times(safe_get(data, 6, 84,0))
+
+def format_popular_times(popular_times):
+    images = popular_times or []
     
     if not images:
         return 'Not Present'
@@ -218,7 +244,10 @@ def extract_popular_times(data):
     return rs
 
 def get_reservations(data):
-    images = safe_get(data, 6, 46) or []
+    return format_reservations(safe_get(data, 6, 46))
+
+def format_reservations(reservations):
+    images = reservations or []
     ls = []
     for element in images:
         link, source = element[0], element[1]
@@ -226,7 +255,10 @@ def get_reservations(data):
     return ls
 
 def get_order_online_link(data):
-    images = safe_get(data, 6, 75, 0, 1, 2) or safe_get(data, 6, 75, 0, 0, 2) or []
+    return format_order_online_links(safe_get(data, 6, 75, 0, 1, 2) or safe_get(data, 6, 75, 0, 0, 2))
+
+def format_order_online_links(order_online_links):
+    images = order_online_links or []
     ls = []
     for element in images:
         source, link = safe_get( element,0,0), safe_get( element,1,2,0)
@@ -234,7 +266,10 @@ def get_order_online_link(data):
     return ls
 
 def get_hours(data):
-    images = safe_get(data, 6, 34, 1) or []
+    return format_hours(safe_get(data, 6, 34, 1))
+
+def format_hours(hours):
+    images = hours or []
     ls = []
     for element in images:
         day, times = element[0], element[1]
@@ -243,7 +278,10 @@ def get_hours(data):
 
 
 def get_review_keywords(data):
-    images = safe_get(data, 6, 153, 0) or []
+    return format_review_keywords(safe_get(data, 6, 153, 0))
+
+def format_review_keywords(review_keywords):
+    images = review_keywords or []
     ls = []
     for element in images:
         keyword, count = element[1], element[3][4]
@@ -254,7 +292,10 @@ def get_options(data):
     return [{'name': x[1], 'enabled': (safe_get(x, 2, 1, 0, 0) or x[4][0]) != 0} for x in data]
 
 def get_about(data):
-    rvs = safe_get(data, 6, 100, 1) or []
+    return format_about(safe_get(data, 6, 100, 1))
+
+def format_about(about):
+    rvs = about or []
     ls = []
     for element in rvs:
         id, name, options = element[0], element[1], get_options(element[2] or [])
@@ -262,8 +303,9 @@ def get_about(data):
     return ls
 
 def get_menu(data):
-    link = safe_get(data, 6, 38, 0)
-    source = safe_get(data, 6, 38, 1)
+    return format_menu(safe_get(data, 6, 38, 0), safe_get(data, 6, 38, 1))
+
+def format_menu(link, source):
     return {'link': clean_link(link), 'source': source}
 
 def get_review_images(data):
@@ -303,7 +345,10 @@ def generate_google_reviews_url(placeid, query, authuser, hl, gl):
 
 
 def get_user_reviews(data):
-    rvs = safe_get(data, 6, 52, 0) or []
+    return format_user_reviews(safe_get(data, 6, 52, 0))
+
+def format_user_reviews(user_reviews):
+    rvs = user_reviews or []
     ls = []
     for element in rvs:
         
@@ -365,8 +410,9 @@ def get_user_reviews(data):
     return ls
 
 def get_owner(data):
-    name = safe_get(data, 6, 57, 1)
-    id = safe_get(data, 6, 57, 2)
+    return format_owner(safe_get(data, 6, 57, 1), safe_get(data, 6, 57, 2))
+
+def format_owner(name, id):
     link = f"https://www.google.com/maps/contrib/{id}" if id else None
     return {'id': id, 'name': name, 'link': clean_link(link) if link else None }
     # if id else {'name': name}
@@ -405,8 +451,9 @@ def get_phone(data):
     return safe_get(data, 6, 178, 0, 0)
 
 def get_price_range(data):
-    rs = safe_get(data, 6, 4, 2)
-    
+    return format_price_range(safe_get(data, 6, 4, 2))
+
+def format_price_range(rs):
     if rs is not None:
         return len(rs) * "$" 
 
@@ -431,7 +478,7 @@ def get_data_id(data):
 def get_reviews_per_rating(data):
     return {i: safe_get(data, 6, 52, 3, i - 1) for i in range(1, 6)}
 
-def parse(data):
+def parse_legacy(data):
     # Assuming 'input_string' is provided to the function in some way
     input_string = json.loads(data)[3][6]  # Replace with actual input
     substring_to_remove = ")]}'"
@@ -442,6 +489,72 @@ def parse(data):
 
     return json.loads(modified_string)
 
+def loads(text):
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # orjson rejects integers wider than 64 bits
+            pass
+    return json.loads(text)
+
+def skip_whitespace(text, pos):
+    while text[pos] in ' \t\r\n':
+        pos += 1
+    return pos
+
+def find_json_element(text, path, pos=0):
+    """
+    Returns the offset of the element at path (e.g. (3, 6)) of the JSON array starting at pos.
+    Only the elements before it are decoded (to skip over them); the rest of the array is never touched.
+    """
+    for index in path:
+        pos = skip_whitespace(text, pos)
+        if text[pos] != '[':
+            raise ValueError(f"Expected an array at offset {pos}")
+        pos += 1
+
+        for _ in range(index):
+            _, pos = json_decoder.raw_decode(text, skip_whitespace(text, pos))
+            pos = skip_whitespace(text, pos)
+            if text[pos] != ',':
+                raise IndexError(f"Index {index} is out of range")
+            pos += 1
+
+    return skip_whitespace(text, pos)
+
+def decode_payload(text, pos=0, path=PLACE_PATH):
+    """
+    Decodes only the `)]}'` prefixed string at path of the APP_INITIALIZATION_STATE array starting at pos.
+    """
+    start = find_json_element(text, path, pos)
+    payload, _ = json_decoder.raw_decode(text, start)
+
+    if payload.startswith(XSSI_PREFIX):
+        payload = payload[len(XSSI_PREFIX):]
+
+    return loads(payload)
+
+def parse(data):
+    try:
+        return decode_payload(data)
+    except (ValueError, IndexError, AttributeError):
+        return parse_legacy(data)
+
+def parse_html(html, path=PLACE_PATH):
+    """
+    Locates window.APP_INITIALIZATION_STATE in the page with a single search and decodes the payload at path.
+    """
+    start = html.find(INITIALIZATION_STATE_MARKER)
+    if start == -1:
+        raise ValueError("APP_INITIALIZATION_STATE not found in page")
+
+    start += len(INITIALIZATION_STATE_MARKER)
+    try:
+        return decode_payload(html, start, path)
+    except (ValueError, IndexError, AttributeError):
+        return parse_legacy(html[start:].split(';window.APP_FLAGS')[0])
+
 def get_hl_from_link(link):
     # Regular expression to find the 'hl' parameter in the URL
     match = rex.search(r"[?&]hl=([^&]+)", link)
@@ -575,59 +688,205 @@ def extract_most_popular_times(data):
         return data
 
 
-def extract_data(input_str, link):
-    data = parse(input_str)
-
-    categories = get_categories(data)
-    place_id = get_place_id(data)
-    order_online_links = get_order_online_link(data)
-    thumbnail = get_thumbnail(data)
-    coordinates = get_gps_coordinates(data)
-    images = get_images(data)
-    description = get_description(data)
-    status = get_open_state(data)
-    plus_code = get_plus_code(data)
-    reservations = get_reservations(data)
-    menu = get_menu(data)
-    owner = get_owner(data)
-    time_zone = get_time_zone(data)
-    complete_address = get_complete_address(data)
-    reviews_link = get_reviews_link(data)
-    if reviews_link is None:
+ADDRESS_KEYS = ['ward', 'street', 'city', 'postal_code', 'state', 'country_code']
+
+PLACE_PATHS = {
+    'categories': (6, 13),
+    'main_category': (6, 13, 0),
+    'thumbnail': (6, 72, 0, 1, 6, 0),
+    'place_id': (6, 78),
+    'description': (6, 32, 1, 1),
+    'status': (6, 34, 4, 4),
+    'hours': (6, 34, 1),
+    'plus_code': (6, 183, 2, 2, 0),
+    'ward': (6, 183, 1, 0),
+    'street': (6, 183, 1, 1),
+    'city': (6, 183, 1, 3),
+    'postal_code': (6, 183, 1, 4),
+    'state': (6, 183, 1, 5),
+    'country_code': (6, 183, 1, 6),
+    'latitude': (6, 9, 2),
+    'longitude': (6, 9, 3),
+    'images': (6, 171, 0),
+    'questions': (6, 126),
+    'competitors': (6, 99, 0, 0, 1),
+    'popular_times': (6, 84, 0),
+    'reservations': (6, 46),
+    'order_online_links': (6, 75, 0, 1, 2),
+    'order_online_links_fallback': (6, 75, 0, 0, 2),
+    'review_keywords': (6, 153, 0),
+    'about': (6, 100, 1),
+    'menu_link': (6, 38, 0),
+    'menu_source': (6, 38, 1),
+    'user_reviews': (6, 52, 0),
+    'reviews_per_rating_1': (6, 52, 3, 0),
+    'reviews_per_rating_2': (6, 52, 3, 1),
+    'reviews_per_rating_3': (6, 52, 3, 2),
+    'reviews_per_rating_4': (6, 52, 3, 3),
+    'reviews_per_rating_5': (6, 52, 3, 4),
+    'owner_name': (6, 57, 1),
+    'owner_id': (6, 57, 2),
+    'time_zone': (6, 30),
+    'reviews_link': (6, 4, 3, 0),
+    'price_range': (6, 4, 2),
+    'rating': (6, 4, 7),
+    'reviews': (6, 4, 8),
+    'phone': (6, 178, 0, 0),
+    'title': (6, 11),
+    'address': (6, 18),
+    'website': (6, 7, 0),
+    'cid': (25, 3, 0, 13, 0, 0, 1),
+    'data_id': (6, 10),
+}
+
+# Values each output field is built from
+FIELD_PATHS = {
+    Fields.PLACE_ID: ['place_id'],
+    Fields.NAME: ['title'],
+    Fields.DESCRIPTION: ['description'],
+    Fields.REVIEWS: ['reviews'],
+    Fields.COMPETITORS: ['competitors'],
+    Fields.WEBSITE: ['website'],
+    Fields.OWNER: ['owner_name', 'owner_id'],
+    Fields.FEATURED_IMAGE: ['thumbnail'],
+    Fields.MAIN_CATEGORY: ['main_category'],
+    Fields.CATEGORIES: ['categories'],
+    Fields.RATING: ['rating'],
+    Fields.WORKDAY_TIMING: ['hours'],
+    Fields.CLOSED_ON: ['hours'],
+    Fields.PHONE: ['phone'],
+    Fields.ADDRESS: ['address'],
+    Fields.REVIEW_KEYWORDS: ['review_keywords'],
+    Fields.STATUS: ['status'],
+    Fields.PRICE_RANGE: ['price_range'],
+    Fields.REVIEWS_PER_RATING: [f'reviews_per_rating_{i}' for i in range(1, 6)],
+    Fields.FEATURED_QUESTION: ['questions', 'owner_name', 'owner_id'],
+    Fields.REVIEWS_LINK: ['reviews_link', 'place_id', 'country_code'],
+    Fields.COORDINATES: ['latitude', 'longitude'],
+    Fields.PLUS_CODE: ['plus_code'],
+    Fields.DETAILED_ADDRESS: ADDRESS_KEYS,
+    Fields.TIME_ZONE: ['time_zone'],
+    Fields.CID: ['cid'],
+    Fields.DATA_ID: ['data_id'],
+    Fields.MENU: ['menu_link', 'menu_source'],
+    Fields.RESERVATIONS: ['reservations'],
+    Fields.ORDER_ONLINE_LINKS: ['order_online_links', 'order_online_links_fallback'],
+    Fields.ABOUT: ['about'],
+    Fields.IMAGES: ['images'],
+    Fields.HOURS: ['hours'],
+    Fields.MOST_POPULAR_TIMES: ['popular_times'],
+    Fields.POPULAR_TIMES: ['popular_times'],
+    Fields.FEATURED_REVIEWS: ['user_reviews'],
+}
+
+# Needed for filtering, sorting and merging whatever fields are selected
+REQUIRED_FIELDS = [Fields.PLACE_ID, Fields.NAME, Fields.REVIEWS, Fields.RATING, Fields.WEBSITE, Fields.PHONE, Fields.MAIN_CATEGORY]
+
+place_paths = FieldPaths(PLACE_PATHS, FIELD_PATHS)
+
+field_timings = {}
+field_timings_lock = Lock()
+
+def record_field_time(field, seconds):
+    with field_timings_lock:
+        total, count = field_timings.get(field, (0.0, 0))
+        field_timings[field] = (total + seconds, count + 1)
+
+def timed(field, fn, *args):
+    start = perf_counter()
+    result = fn(*args)
+    record_field_time(field, perf_counter() - start)
+    return result
+
+def get_field_timings():
+    """
+    Returns the time spent extracting each field, slowest first, as
+    {field: {"total_seconds": ..., "calls": ..., "average_ms": ...}}.
+    """
+    with field_timings_lock:
+        timings = dict(field_timings)
+
+    return {
+        field: {"total_seconds": total, "calls": count, "average_ms": total / count * 1000}
+        for field, (total, count) in sorted(timings.items(), key=lambda item: item[1][0], reverse=True)
+    }
+
+def extraction_fields(fields):
+    """
+    Returns the fields which change what extract_data computes, in a stable order so they can be part of a cache key.
+    """
+    if fields is None:
+        return None
+    return sorted(set(field for field in fields if field in FIELD_PATHS))
+
+def extract_data(input_str, link, fields=None):
+    return extract_place_data(parse(input_str), link, fields)
+
+def extract_data_from_html(html, link, fields=None):
+    return extract_place_data(parse_html(html), link, fields)
+
+def extract_place_data(data, link, fields=None):
+    def wanted(*names):
+        return fields is None or any(name in fields for name in names)
+
+    start = perf_counter()
+    values = place_paths.extract(data, None if fields is None else REQUIRED_FIELDS + list(fields))
+    record_field_time('field_paths', perf_counter() - start)
+    value = values.get
+
+    categories = value('categories')
+    place_id = value('place_id')
+    order_online_links = timed(Fields.ORDER_ONLINE_LINKS, format_order_online_links, value('order_online_links') or value('order_online_links_fallback')) if wanted(Fields.ORDER_ONLINE_LINKS) else []
+    thumbnail = value('thumbnail')
+    coordinates = {'latitude': value('latitude'), 'longitude': value('longitude')}
+    images = timed(Fields.IMAGES, format_images, value('images')) if wanted(Fields.IMAGES) else []
+    description = value('description')
+    status = value('status')
+    plus_code = value('plus_code')
+    reservations = timed(Fields.RESERVATIONS, format_reservations, value('reservations')) if wanted(Fields.RESERVATIONS) else []
+    menu = format_menu(value('menu_link'), value('menu_source'))
+    owner = format_owner(value('owner_name'), value('owner_id'))
+    time_zone = value('time_zone')
+    complete_address = {key: value(key) for key in ADDRESS_KEYS}
+    reviews_link = clean_link(value('reviews_link'))
+    if reviews_link is None and wanted(Fields.REVIEWS_LINK):
         gl = complete_address['country_code']
         hl = get_hl_from_link(link)
         query = extract_business_name(link)
         reviews_link = generate_google_reviews_url(place_id,query , 0, hl, gl)
 
-    price_range = get_price_range(data)
-    reviews_per_rating = get_reviews_per_rating(data)
-    cid = get_cid(data)
-    data_id = get_data_id(data)
-    about = get_about(data)
-    title = get_title(data)
+    price_range = format_price_range(value('price_range'))
+    reviews_per_rating = {i: value(f'reviews_per_rating_{i}') for i in range(1, 6)}
+    cid = value('cid')
+    data_id = value('data_id')
+    about = timed(Fields.ABOUT, format_about, value('about')) if wanted(Fields.ABOUT) else []
+    title = value('title')
 
-    hours = get_hours(data)
+    hours = timed(Fields.HOURS, format_hours, value('hours')) if wanted(Fields.HOURS, Fields.WORKDAY_TIMING, Fields.CLOSED_ON) else []
     if hours:
         hours = reorder_hours_list(hours)
     else:
         hours = []
     
-    rating = get_rating(data)
-    reviews = get_reviews(data)
-    phone = get_phone(data)
-    address = get_address(data)
-    website = get_website(data)
-    main_category = get_main_category(data)
-    user_reviews = get_user_reviews(data)
+    rating = value('rating')
+    reviews = value('reviews')
+    phone = value('phone')
+    address = value('address')
+    website = clean_link(value('website'))
+    main_category = value('main_category')
+    user_reviews = timed(Fields.FEATURED_REVIEWS, format_user_reviews, value('user_reviews')) if wanted(Fields.FEATURED_REVIEWS) else []
     
-    review_keywords = get_review_keywords(data)
+    review_keywords = timed(Fields.REVIEW_KEYWORDS, format_review_keywords, value('review_keywords')) if wanted(Fields.REVIEW_KEYWORDS) else []
 
-    first_question = extract_questions(data)
+    first_question = timed(Fields.FEATURED_QUESTION, format_questions, value('questions'), owner) if wanted(Fields.FEATURED_QUESTION) else None
     
     
-    competitors = extract_competitors(data, link)
-    popular_times = extract_popular_times(data)
-    most_popular_times = extract_most_popular_times(popular_times)
+    competitors = timed(Fields.COMPETITORS, format_competitors, value('competitors'), link) if wanted(Fields.COMPETITORS) else []
+    if wanted(Fields.POPULAR_TIMES, Fields.MOST_POPULAR_TIMES):
+        popular_times = timed(Fields.POPULAR_TIMES, format_popular_times, value('popular_times'))
+        most_popular_times = timed(Fields.MOST_POPULAR_TIMES, extract_most_popular_times, popular_times)
+    else:
+        popular_times = most_popular_times = 'Not Present'
     return {
         'place_id': place_id,
         'name': title,
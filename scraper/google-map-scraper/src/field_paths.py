@@ -0,0 +1,75 @@
+def compile_trie(paths):
+    """
+    Compiles {name: path} into a trie of shared path prefixes.
+
+    Each node is a tuple of (names ending at this node, ((key, child node), ...)).
+    """
+    root = {}
+    for name, path in paths.items():
+        node = root
+        for key in path:
+            node = node.setdefault(key, {})
+        node.setdefault(None, []).append(name)
+
+    def freeze(node):
+        names = tuple(node.get(None, ()))
+        children = tuple((key, freeze(child)) for key, child in node.items() if key is not None)
+        return (names, children)
+
+    return freeze(root)
+
+
+def walk_trie(node, value, values):
+    names, children = node
+    for name in names:
+        values[name] = value
+
+    for key, child in children:
+        try:
+            child_value = value[key]
+        except (IndexError, TypeError, KeyError):
+            continue
+        walk_trie(child, child_value, values)
+
+
+class FieldPaths:
+    """
+    Extracts many paths of a nested list in one walk, like calling safe_get once per path
+    but visiting every shared prefix only once.
+
+    :param paths: Mapping of value name to its path, e.g. {"rating": (6, 4, 7)}.
+    :param field_paths: Mapping of an output field to the value names it is built from.
+    """
+
+    def __init__(self, paths, field_paths):
+        self.paths = paths
+        self.field_paths = field_paths
+        self.tries = {}
+
+    def names_for(self, fields):
+        if fields is None:
+            return list(self.paths)
+
+        names = []
+        for field in fields:
+            for name in self.field_paths.get(field, []):
+                if name not in names:
+                    names.append(name)
+        return names
+
+    def trie_for(self, fields):
+        key = None if fields is None else frozenset(fields)
+        trie = self.tries.get(key)
+        if trie is None:
+            trie = compile_trie({name: self.paths[name] for name in self.names_for(fields)})
+            self.tries[key] = trie
+        return trie
+
+    def extract(self, data, fields=None):
+        """
+        Returns {name: value} for the paths needed by fields (all paths if fields is None).
+        Paths which do not exist in data are missing from the result.
+        """
+        values = {}
+        walk_trie(self.trie_for(fields), data, values)
+        return values
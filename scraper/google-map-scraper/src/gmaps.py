@@ -1,15 +1,20 @@
 from botasaurus import bt
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from src import scraper
-from src.write_output import write_output
+from src.async_reviews import scrape_reviews_async
+from src.write_output import write_output, OUTPUT_CSV, OUTPUT_JSON, OUTPUT_PARQUET, OUTPUT_GEOPARQUET, DEFAULT_OUTPUT_FORMATS
 from src.sort_filter import filter_places, sort_places
+from src.all_store import AllStore
+from src.run_manifest import RunManifest, SEARCHED, DETAILS_FETCHED, REVIEWS_FETCHED, WRITTEN
 from .cities import Cities
 from .lang import Lang
 from .category import Category
 from .fields import ALL_FIELDS, ALL_SOCIAL_FIELDS, DEFAULT_SOCIAL_FIELDS, Fields, DEFAULT_FIELDS, DEFAULT_FIELDS_WITHOUT_SOCIAL_DATA, ALL_FIELDS_WITHOUT_SOCIAL_DATA
+from .extract_data import extraction_fields
 from .social_scraper import FAILED_DUE_TO_CREDITS_EXHAUSTED, FAILED_DUE_TO_NOT_SUBSCRIBED, FAILED_DUE_TO_UNKNOWN_ERROR, scrape_social
 
-def create_place_data(query, is_spending_on_ads, max, lang, geo_coordinates, zoom, convert_to_english):
+def create_place_data(query, is_spending_on_ads, max, lang, geo_coordinates, zoom, convert_to_english, fields):
     place_data = {
             "query": query,
             "is_spending_on_ads": is_spending_on_ads,
@@ -17,10 +22,16 @@ def create_place_data(query, is_spending_on_ads, max, lang, geo_coordinates, zoo
             "lang": lang,
             "geo_coordinates": geo_coordinates,
             "zoom": zoom, 
-            "convert_to_english": convert_to_english
+            "convert_to_english": convert_to_english,
+            "fields": fields,
         }
     return place_data
 
+def determine_extraction_fields(fields, sort, output_formats=DEFAULT_OUTPUT_FORMATS):
+    # Sorting may use fields which are not written to the output, and GeoParquet makes its geometry from the coordinates
+    geo_fields = [Fields.COORDINATES] if OUTPUT_GEOPARQUET in output_formats else []
+    return extraction_fields(fields + [sort_by[0] for sort_by in sort] + geo_fields)
+
 
 def create_social_scrape_data(places, key):
     social_scrape_data = []
@@ -84,15 +95,31 @@ def get_empty_data():
   }
   return EMPTY_SOCIAL_DATA
 
-def merge_social(places, social_details):
+def index_by_place_id(details):
+    """Groups detail records by place_id, keeping the order in which they were produced"""
+    index = {}
+    for detail in details:
+        if detail is not None:
+            index.setdefault(detail['place_id'], []).append(detail)
+    return index
+
+def join_by_place_id(places, details, merge):
+    """Calls merge with every place and the list of its detail records, looking them up in one hash index"""
+    index = index_by_place_id(details)
     for place in places:
-        found_social_detail = next((detail for detail in social_details if detail['place_id'] == place['place_id']), None)
-        if found_social_detail:
-            place.update(found_social_detail['data'])
+        merge(place, index.get(place['place_id'], []))
+    return places
+
+def merge_social(places, social_details):
+    def merge(place, details):
+        if details:
+            # Later records win, e.g. a retry that found more contacts
+            for detail in details:
+                place.update(detail['data'])
         else:
             place.update(get_empty_data())
 
-    return places
+    return join_by_place_id(places, social_details, merge)
 
 printed = False
 def print_rvs_message(hl):
@@ -104,7 +131,7 @@ def print_rvs_message(hl):
         #     print("You have choes to scrape detailed reviews by using scrape_reviews, the published_at_date, response_from_owner_date is only provided in English Language. So published_at_date, response_from_owner_date will be null." ) 
         printed = True
 
-def create_reviews_data(places, reviews_max, reviews_sort, convert_to_english, lang):
+def create_reviews_data(places, reviews_max, reviews_sort, convert_to_english, lang, incremental_reviews=False):
     reviews_data = []
     
     chosen_lang = lang if lang else "en"
@@ -125,19 +152,34 @@ def create_reviews_data(places, reviews_max, reviews_sort, convert_to_english, l
             "reviews_sort": reviews_sort,
             "lang": chosen_lang, 
         }
+        if incremental_reviews:
+            # Stopping at the first stored review only works when the newest reviews come first
+            review_data["reviews_sort"] = Gmaps.NEWEST
+            review_data["incremental"] = True
         reviews_data.append(review_data)
 
     return reviews_data
 
-def merge_reviews(places, reviews):
-    for place in places:
-        # Find the reviews for the current place based on place_id
-        found_review = next((review for review in reviews if review['place_id'] == place['place_id']), None)
+def concat_review_batches(batches):
+    """Concatenates the reviews of a place's batches in order, keeping the first copy of every review_id"""
+    reviews = []
+    seen_review_ids = set()
+    for batch in batches:
+        for review in batch['reviews']:
+            review_id = review.get('review_id')
+            if review_id:
+                if review_id in seen_review_ids:
+                    continue
+                seen_review_ids.add(review_id)
+            reviews.append(review)
+    return reviews
 
-        # Add the 'reviews' from the found review to the place, or an empty list if no review is found
-        place['detailed_reviews'] = found_review['reviews'] if found_review else []
+def merge_reviews(places, reviews):
+    def merge(place, batches):
+        # An empty list if no reviews were found for the place
+        place['detailed_reviews'] = concat_review_batches(batches)
 
-    return places
+    return join_by_place_id(places, reviews, merge)
 
 
 # Cache.clear()
@@ -177,9 +219,7 @@ def determine_fields(fields, should_scrape_socials, scrape_reviews):
     #   print(fields)
       return fields
 
-def process_result(min_reviews, max_reviews, category_in, has_website, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials,convert_to_english, cache, places_obj):
-      places = places_obj["places"]
-      query = places_obj["query"]
+def process_places(min_reviews, max_reviews, category_in, has_website, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, async_reviews, incremental_reviews, lang, should_scrape_socials,convert_to_english, cache, places):
         # Sort and Filter TODO: do later
       filter_data = {
             "min_rating":min_rating,
@@ -205,23 +245,64 @@ def process_result(min_reviews, max_reviews, category_in, has_website, has_phone
         # 3. Scrape Reviews
       if scrape_reviews:
           placed_with_reviews = filter_places(cleaned_places, {"min_reviews": 1})
-          reviews_data = create_reviews_data(placed_with_reviews, reviews_max, reviews_sort, convert_to_english, lang)
-          reviews_details =  scraper.scrape_reviews(reviews_data, cache=cache)
+          reviews_data = create_reviews_data(placed_with_reviews, reviews_max, reviews_sort, convert_to_english, lang, incremental_reviews)
+          # Incremental runs always ask Google for reviews newer than the stored ones
+          reviews_cache = False if incremental_reviews else cache
+          if async_reviews:
+              reviews_details = bt.remove_nones(scrape_reviews_async(reviews_data, cache=reviews_cache))
+          else:
+              reviews_details =  scraper.scrape_reviews(reviews_data, cache=reviews_cache)
             # print_social_errors
           cleaned_places = merge_reviews(cleaned_places, reviews_details)
 
+      return cleaned_places
+
+
+def process_result(min_reviews, max_reviews, category_in, has_website, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, async_reviews, incremental_reviews, fields, output_formats, lang, should_scrape_socials,convert_to_english, cache, places_obj):
+      query = places_obj["query"]
+      cleaned_places = process_places(min_reviews, max_reviews, category_in, has_website, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, async_reviews, incremental_reviews, lang, should_scrape_socials, convert_to_english, cache, places_obj["places"])
+
         # 4. Write Output
-      write_output(query, cleaned_places, fields)
+      write_output(query, cleaned_places, fields, output_formats)
         
       result_item = {"query": query, "places": cleaned_places}
       return result_item
 
 
-def merge_places(places):
-    merged_places = []
-    for place_group in places:
-        merged_places.extend(place_group['places'])
-    return merged_places
+def run_queries(queries, scrape, process, concurrent_queries):
+    """
+    Runs scrape(index, query) and then process(index, places_obj) for every query and returns the processed results in query order.
+
+    With concurrent_queries > 1 the searches run on a bounded pool of workers, each with its own browser,
+    while a single worker post-processes finished searches in the order they complete. So one query's
+    socials and reviews overlap the scrolling of the next queries.
+
+    The first query to fail fails the run: searches that have not started are cancelled, only the ones in
+    progress are waited for, and the error is raised. The queries processed before it are already written.
+
+    The workers share the botasaurus tasks behind scrape. Their wrappers store the options of every call
+    (cache, parallel, ...) in the decorator's closure, which is not thread-safe, so scrape must pass the
+    same options from every worker, as Gmaps.places does for a run.
+    """
+    if concurrent_queries is None or concurrent_queries <= 1:
+        return [process(index, scrape(index, query)) for index, query in enumerate(queries)]
+
+    with ThreadPoolExecutor(max_workers=concurrent_queries) as search_pool, ThreadPoolExecutor(max_workers=1) as process_pool:
+        searches = {search_pool.submit(scrape, index, query): index for index, query in enumerate(queries)}
+        processing = {}
+        try:
+            for search in as_completed(searches):
+                processing[searches[search]] = process_pool.submit(process, searches[search], search.result())
+                for processed in processing.values():
+                    if processed.done() and processed.exception() is not None:
+                        raise processed.exception()
+        except BaseException:
+            # Queued searches would only be scraped to be thrown away
+            search_pool.shutdown(wait=False, cancel_futures=True)
+            process_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+        return [processing[index].result() for index in range(len(queries))]
 
 class Gmaps:
   SORT_DESCENDING = "desc"
@@ -252,6 +333,18 @@ class Gmaps:
 
   DEFAULT_FIELDS = "default"
 
+  OUTPUT_CSV = OUTPUT_CSV
+  OUTPUT_JSON = OUTPUT_JSON
+  OUTPUT_PARQUET = OUTPUT_PARQUET
+  OUTPUT_GEOPARQUET = OUTPUT_GEOPARQUET
+  DEFAULT_OUTPUT_FORMATS = DEFAULT_OUTPUT_FORMATS
+
+  AUTO_PARALLEL = scraper.AUTO_PARALLEL
+  DEFAULT_PARALLEL = scraper.DEFAULT_PARALLEL
+
+  SEARCH_BACKEND_BROWSER = scraper.SEARCH_BACKEND_BROWSER
+  SEARCH_BACKEND_HTTP = scraper.SEARCH_BACKEND_HTTP
+
   Cities  = Cities()
   Lang  = Lang()
   Category  = Category()
@@ -282,10 +375,18 @@ class Gmaps:
              scrape_reviews: bool = False,
              reviews_max: int = 20,
              reviews_sort: int = NEWEST,
+             async_reviews: bool = False,
+             incremental_reviews: bool = False,
              fields: Optional[List[str]] = DEFAULT_FIELDS,
+             output_formats: List[str] = DEFAULT_OUTPUT_FORMATS,
              lang: Optional[str] = None,
              geo_coordinates: Optional[str] = None,
-             zoom: Optional[float] = None) -> List[Dict]:
+             zoom: Optional[float] = None,
+             concurrent_queries: int = 1,
+             resume: bool = False,
+             dedupe_places: bool = False,
+             parallel: Union[int, str] = DEFAULT_PARALLEL,
+             search_backend: str = SEARCH_BACKEND_BROWSER) -> List[Dict]:
       """
       Function to scrape Google Maps places based on various criteria.
 
@@ -305,31 +406,96 @@ class Gmaps:
       :param scrape_reviews: Boolean indicating if the reviews should be scraped.
       :param reviews_max: Maximum number of reviews to scrape per place.
       :param reviews_sort: Sort order for reviews.
+      :param async_reviews: Boolean indicating if the reviews of all places should be scraped concurrently on one event loop.
+      :param incremental_reviews: Boolean indicating if only reviews newer than the ones stored by previous runs should be scraped and merged with them.
       :param fields: List of fields to return in the result.
+      :param output_formats: Formats of the output files, any of Gmaps.OUTPUT_CSV, Gmaps.OUTPUT_JSON, Gmaps.OUTPUT_PARQUET and Gmaps.OUTPUT_GEOPARQUET.
       :param lang: Language in which to return the results.
       :param geo_coordinates: Geographical coordinates to scrape around.
       :param zoom: Zoom level for scraping.
+      :param concurrent_queries: Number of queries to search at the same time, each in its own browser. Socials, reviews and output run behind the searches.
+      :param resume: Boolean indicating if the previous unfinished run of the same queries and options should be resumed, skipping the stages its queries already finished.
+      :param dedupe_places: Boolean indicating if places found by several queries should have their details fetched only once, with later queries reusing them.
+      :param parallel: Number of place details fetched at the same time, or Gmaps.AUTO_PARALLEL to raise it while Google answers quickly and lower it when it slows down or errors.
+      :param search_backend: Gmaps.SEARCH_BACKEND_BROWSER to search in Chrome, or Gmaps.SEARCH_BACKEND_HTTP to page through the search results over HTTP, falling back to Chrome if that fails.
       :return: List of dictionaries with the scraped place data.
       """
 
-      result = []
-
       should_scrape_socials = key is not None      
       fields = determine_fields(fields, should_scrape_socials, scrape_reviews) 
-          
-      for query in queries:
-        # 1. Scrape Places
-        place_data = create_place_data(query, is_spending_on_ads, max, lang, geo_coordinates, zoom, convert_to_english)
-        places_obj = scraper.scrape_places(place_data, cache = use_cache)
-
-        result_item = process_result(min_reviews, max_reviews, category_in, has_website, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials, convert_to_english,use_cache,places_obj)
+      scraped_fields = determine_extraction_fields(fields, sort, output_formats)
+      scraper.set_parallel(parallel)
+
+      # What the stages of a run produce, so a resumed run with other options starts over
+      run_options = {
+        "fields": fields, "sort": sort, "max": max, "lang": lang, "output_formats": output_formats,
+        "min_reviews": min_reviews, "max_reviews": max_reviews, "category_in": category_in, "has_website": has_website,
+        "has_phone": has_phone, "min_rating": min_rating, "max_rating": max_rating, "is_spending_on_ads": is_spending_on_ads,
+        "scrape_socials": should_scrape_socials, "convert_to_english": convert_to_english, "scrape_reviews": scrape_reviews,
+        "reviews_max": reviews_max, "reviews_sort": reviews_sort, "incremental_reviews": incremental_reviews,
+        "geo_coordinates": geo_coordinates, "zoom": zoom,
+      }
+      manifest = RunManifest.open(queries, resume, options=run_options)
+      all_store = AllStore()
+      if not manifest.resumed:
+        all_store.clear()
+
+      def scrape(index, query):
+        if manifest.reached(index, DETAILS_FETCHED):
+          # Resumed by process from its checkpoint
+          return None
+
+        if manifest.reached(index, SEARCHED):
+          # The feed was scrolled before the restart, so only fetch the details of its links
+          searched = manifest.load(index, SEARCHED)
+          places = scraper.scrape_places_by_links({"links": searched["links"], "convert_to_english": convert_to_english, "cache": use_cache, "fields": scraped_fields}, cache=use_cache)
+          places_obj = {"query": query, "places": scraper.merge_sponsored_links(places, searched["sponsored_links"])}
+        else:
+          # 1. Scrape Places
+          place_data = create_place_data(query, is_spending_on_ads, max, lang, geo_coordinates, zoom, convert_to_english, scraped_fields)
+          with scraper.search_call() as token:
+            scraper.add_search_listener(token, lambda links, sponsored_links: manifest.mark(index, SEARCHED, {"links": links, "sponsored_links": sponsored_links}))
+            try:
+              places_obj = scraper.search_places(place_data, cache = use_cache, search_backend = search_backend)
+            finally:
+              scraper.remove_search_listener(token)
+
+        manifest.mark(index, DETAILS_FETCHED, places_obj)
+        return places_obj
+
+      def process(index, places_obj):
+        query = queries[index]
+        if manifest.reached(index, WRITTEN):
+          return {"query": query, "places": all_store.load(index, query)}
+
+        if manifest.reached(index, REVIEWS_FETCHED):
+          places = manifest.load(index, REVIEWS_FETCHED)
+        else:
+          if places_obj is None:
+            places_obj = manifest.load(index, DETAILS_FETCHED)
+          places = process_places(min_reviews, max_reviews, category_in, has_website, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, async_reviews, incremental_reviews, lang, should_scrape_socials, convert_to_english, use_cache, places_obj["places"])
+          manifest.mark(index, REVIEWS_FETCHED, places)
 
-        result.append(result_item)
+        # 4. Write Output
+        write_output(query, places, fields, output_formats)
+        # Appended as soon as the query is done, so a crash keeps the places of the finished queries
+        all_store.append(index, query, places, sort)
+        manifest.mark(index, WRITTEN)
+        return {"query": query, "places": places}
+
+      if dedupe_places:
+        scraper.place_registry.start()
+      try:
+        result = run_queries(queries, scrape, process, concurrent_queries)
+      finally:
+        if dedupe_places:
+          scraper.place_registry.stop()
+        # Shared drivers outlive every task, so they are quit even when a query fails
+        scraper.browser_pool.close()
       
-      all_places = sort_places(merge_places(result), sort)
-      write_output("all", all_places, fields)
+      write_output("all", all_store.merged(sort), fields, output_formats)
+      manifest.finish()
 
-      scraper.scrape_places.close()
       return result
 
 
@@ -353,8 +519,12 @@ class Gmaps:
               scrape_reviews: bool = False,
               reviews_max: int = 20,
               reviews_sort: int = NEWEST,
+              async_reviews: bool = False,
+              incremental_reviews: bool = False,
               fields: Optional[List[str]] = DEFAULT_FIELDS,
-              lang: Optional[str] = None) -> List[Dict]:
+              output_formats: List[str] = DEFAULT_OUTPUT_FORMATS,
+              lang: Optional[str] = None,
+              parallel: Union[int, str] = DEFAULT_PARALLEL) -> List[Dict]:
         """
         Function to scrape data from specific Google Maps place links.
 
@@ -374,8 +544,12 @@ class Gmaps:
         :param scrape_reviews: Boolean indicating if the reviews should be scraped.
         :param reviews_max: Maximum number of reviews to scrape per place.
         :param reviews_sort: Sort order for reviews.
+        :param async_reviews: Boolean indicating if the reviews of all places should be scraped concurrently on one event loop.
+        :param incremental_reviews: Boolean indicating if only reviews newer than the ones stored by previous runs should be scraped and merged with them.
         :param fields: List of fields to return in the result.
+        :param output_formats: Formats of the output files, any of Gmaps.OUTPUT_CSV, Gmaps.OUTPUT_JSON, Gmaps.OUTPUT_PARQUET and Gmaps.OUTPUT_GEOPARQUET.
         :param lang: Language in which to return the results.
+        :param parallel: Number of place details fetched at the same time, or Gmaps.AUTO_PARALLEL to raise it while Google answers quickly and lower it when it slows down or errors.
         :return: List of dictionaries with the scraped data for each link.
         """
 
@@ -386,9 +560,13 @@ class Gmaps:
         if max is not None:
             links = links[:max]
 
-        places = scraper.scrape_places_by_links({"links": links, "convert_to_english": convert_to_english, "cache": use_cache}, cache=use_cache)
-        scraper.scrape_places_by_links.close()
+        scraper.set_parallel(parallel)
+
+        try:
+            places = scraper.scrape_places_by_links({"links": links, "convert_to_english": convert_to_english, "cache": use_cache, "fields": determine_extraction_fields(fields, sort, output_formats)}, cache=use_cache)
+        finally:
+            scraper.browser_pool.close()
         places_obj  = {"query":output_folder, "places": places }
-        result_item = process_result(min_reviews, max_reviews, category_in, has_website, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, fields, lang, should_scrape_socials,convert_to_english, use_cache,places_obj)
+        result_item = process_result(min_reviews, max_reviews, category_in, has_website, has_phone, min_rating, max_rating, sort, key, scrape_reviews, reviews_max, reviews_sort, async_reviews, incremental_reviews, fields, output_formats, lang, should_scrape_socials,convert_to_english, use_cache,places_obj)
         
         return result_item
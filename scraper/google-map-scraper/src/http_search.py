@@ -0,0 +1,90 @@
+import urllib.parse
+from src.extract_data import INITIALIZATION_STATE_MARKER, XSSI_PREFIX, decode_payload, find_json_element, json_decoder, loads, safe_get
+
+# Results of a search page in its APP_INITIALIZATION_STATE, a place page has its place at (3, 6) instead
+SEARCH_PATH = (3, 2)
+
+# Map shown by a search page, as [altitude in meters, longitude, latitude]
+VIEWPORT_PATH = (0, 0)
+
+RESULTS_PER_PAGE = 20
+
+# Google stops returning results after 120 places, like the feed stops scrolling
+MAX_RESULTS = 120
+MAX_PAGES = MAX_RESULTS // RESULTS_PER_PAGE
+
+# Trails the JSON of the search endpoint
+JSON_SUFFIX = '/*""*/'
+
+
+def parse_search_html(html):
+    """
+    Returns the results payload and the viewport of a search page, from the same
+    APP_INITIALIZATION_STATE that extract_data_from_html parses for place pages.
+    """
+    start = html.find(INITIALIZATION_STATE_MARKER)
+    if start == -1:
+        raise ValueError("APP_INITIALIZATION_STATE not found in page")
+
+    start += len(INITIALIZATION_STATE_MARKER)
+    viewport, _ = json_decoder.raw_decode(html, find_json_element(html, VIEWPORT_PATH, start))
+    return decode_payload(html, start, SEARCH_PATH), viewport
+
+
+def strip_xssi_prefix(text):
+    text = text.strip()
+    if text.endswith(JSON_SUFFIX):
+        text = text[:-len(JSON_SUFFIX)]
+    if text.startswith(XSSI_PREFIX):
+        text = text[len(XSSI_PREFIX):]
+    return text
+
+
+def parse_search_page(text):
+    """Returns the results payload of a page of the search endpoint"""
+    payload = loads(strip_xssi_prefix(text))
+    if isinstance(payload, dict):
+        # Sometimes wrapped as {"c": 0, "d": ")]}'..."}
+        payload = loads(strip_xssi_prefix(payload["d"]))
+    return payload
+
+
+def get_result_places(payload):
+    """Returns the places of a results payload, each laid out like the place of a place page"""
+    entries = safe_get(payload, 0, 1) or []
+    # The first entry describes the search itself and has no place
+    return [place for place in (safe_get(entry, 14) for entry in entries) if place]
+
+
+def create_place_link(place, lang):
+    """Returns the link of a search result, in the form the feed links to it, or None if it has no data_id"""
+    data_id = safe_get(place, 10)
+    name = safe_get(place, 11)
+    if data_id is None or name is None:
+        return None
+
+    latitude = safe_get(place, 9, 2)
+    longitude = safe_get(place, 9, 3)
+    if latitude is not None and longitude is not None:
+        data = f"!4m6!3m5!1s{data_id}!8m2!3d{latitude}!4d{longitude}"
+    else:
+        data = f"!4m2!3m1!1s{data_id}"
+
+    params = {'authuser': '0', 'hl': lang, 'rclk': '1'} if lang is not None else {'authuser': '0', 'rclk': '1'}
+    return f"https://www.google.com/maps/place/{urllib.parse.quote_plus(name)}/data={data}?{urllib.parse.urlencode(params)}"
+
+
+def get_place_links(payload, lang):
+    links = (create_place_link(place, lang) for place in get_result_places(payload))
+    return [link for link in links if link is not None]
+
+
+def create_search_page_link(query, lang, viewport, offset):
+    """Returns the link of the search endpoint for the results after offset, in the viewport of the search page"""
+    altitude, longitude, latitude = viewport[:3]
+    pb = (
+        f"!4m12!1m3!1d{altitude}!2d{longitude}!3d{latitude}!2m3!1f0!2f0!3f0!3m2!1i1024!2i768!4f13.1"
+        f"!7i{RESULTS_PER_PAGE}!8i{offset}!10b1"
+    )
+    params = {'tbm': 'map', 'authuser': '0', 'hl': lang, 'q': query, 'pb': pb} if lang is not None else {'tbm': 'map', 'authuser': '0', 'q': query, 'pb': pb}
+    return f"https://www.google.com/search?{urllib.parse.urlencode(params)}"
@@ -0,0 +1,104 @@
+import re
+from copy import deepcopy
+from threading import Event, Lock
+from urllib.parse import urlsplit, urlunsplit
+
+data_id_pattern = re.compile("0[xX][0-9a-fA-F]+:0[xX][0-9a-fA-F]+")
+
+
+def extract_data_id(link):
+    match = data_id_pattern.search(link)
+    return match.group(0).lower() if match else None
+
+
+def canonicalize_link(link):
+    """Returns the key of the place a link points to, its data_id, or the link without query and fragment when it has none"""
+    data_id = extract_data_id(link)
+    if data_id is not None:
+        return data_id
+
+    parts = urlsplit(link)
+    return urlunsplit((parts.scheme, parts.netloc.lower(), parts.path.rstrip("/"), "", ""))
+
+
+class ClaimedPlace:
+    def __init__(self, owner):
+        self.owner = owner
+        self.place = None
+        self.done = Event()
+
+
+class PlaceRegistry:
+    """
+    Run-wide seen-set of places, so a place found by several queries has its details fetched once.
+
+    The first query to find a place claims it and fetches it. Later queries reference it instead, and
+    wait for the owner to fetch it before taking a copy, so each query can still change its places freely.
+    A place the owner fails to fetch is claimed and fetched by the queries waiting for it, so none of them lose it.
+    """
+    def __init__(self):
+        self.lock = Lock()
+        self.enabled = False
+        self.claims = {}
+        self.fetched = 0
+        self.referenced = 0
+
+    def start(self):
+        with self.lock:
+            self.enabled = True
+            self.claims = {}
+            self.fetched = 0
+            self.referenced = 0
+
+    def stop(self):
+        with self.lock:
+            self.enabled = False
+            self.claims = {}
+        if self.fetched or self.referenced:
+            print(f"Fetched details of {self.fetched} places, reused {self.referenced} found by more than one query.")
+
+    def claim(self, link, owner):
+        """Returns True if owner should fetch the place, False if another query already does"""
+        key = canonicalize_link(link)
+        with self.lock:
+            claimed = self.claims.get(key)
+            if claimed is None:
+                self.claims[key] = ClaimedPlace(owner)
+                return True
+            return claimed.owner == owner
+
+    def resolve(self, link, place):
+        with self.lock:
+            claimed = self.claims.get(canonicalize_link(link))
+            if claimed is None or claimed.done.is_set():
+                return
+            # Owners go on to change their places, e.g. when converting them to English
+            claimed.place = deepcopy(place)
+            self.fetched += 1
+            claimed.done.set()
+
+    def release(self, owner):
+        """Called once owner has fetched its places, wakes up queries waiting for the ones it failed to fetch"""
+        with self.lock:
+            for key, claimed in list(self.claims.items()):
+                if claimed.owner == owner and not claimed.done.is_set():
+                    # Dropped, so a later query can try to fetch it again
+                    del self.claims[key]
+                    claimed.done.set()
+
+    def wait(self, link):
+        """Returns a copy of the place fetched by the query that claimed link, or None if it failed to fetch it"""
+        with self.lock:
+            claimed = self.claims.get(canonicalize_link(link))
+        if claimed is None:
+            return None
+
+        claimed.done.wait()
+        if claimed.place is None:
+            return None
+        with self.lock:
+            self.referenced += 1
+        return deepcopy(claimed.place)
+
+
+place_registry = PlaceRegistry()
@@ -0,0 +1,258 @@
+from collections import deque
+from contextlib import contextmanager
+from threading import Condition, Lock
+from time import monotonic, sleep, time
+
+
+class RateController:
+    """
+    Token bucket shared by every worker of a request path, tuned with AIMD from the outcomes it is told about.
+
+    Successes raise the rate additively while the recent error rate stays low, and grant one more
+    concurrent request every window successes. Errors halve both once the error rate passes error_threshold
+    or errors come back to back, at most once per cooldown so a burst of failures from requests that were
+    already in flight counts as one congestion signal.
+    After errors, workers back off exponentially instead of sleeping a fixed time.
+
+    With latency_tolerance set, concurrency is also tuned to latency: it is only raised while the smoothed latency
+    stays within latency_tolerance times the lowest smoothed latency seen, and is lowered by one request, at most
+    once per cooldown, while latency is above it. If latency stays high even at min_concurrency, it becomes the
+    new lowest. More concurrent requests than the remote end serves promptly only
+    queue up, so this finds the concurrency at which adding workers stops paying off.
+    """
+    def __init__(
+        self,
+        name,
+        rate=10.0,
+        min_rate=0.5,
+        max_rate=20.0,
+        concurrency=5,
+        min_concurrency=1,
+        max_concurrency=5,
+        increase=0.5,
+        decrease=0.5,
+        window=20,
+        error_threshold=0.1,
+        cooldown=2.0,
+        base_backoff=2.0,
+        max_backoff=63.0,
+        latency_tolerance=None,
+        latency_smoothing=0.1,
+    ):
+        self.name = name
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.concurrency = concurrency
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.error_threshold = error_threshold
+        self.cooldown = cooldown
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.latency_tolerance = latency_tolerance
+        self.latency_smoothing = latency_smoothing
+
+        self.condition = Condition(Lock())
+        self.tokens = 1.0
+        self.updated = monotonic()
+        self.active = 0
+        self.outcomes = deque(maxlen=window)
+        self.successes_since_increase = 0
+        self.last_decrease = 0.0
+
+        self.requests = 0
+        self.successes = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.increases = 0
+        self.decreases = 0
+        self.waited_seconds = 0.0
+        self.backoff_seconds = 0.0
+        self.total_latency = 0.0
+        self.latency_samples = 0
+        self.recent_latency = None
+        self.base_latency = None
+        self.last_error_at = None
+
+    def _refill(self, now):
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Blocks until a concurrency slot and a token are available"""
+        start = monotonic()
+        with self.condition:
+            while self.active >= self.concurrency:
+                self.condition.wait()
+            self.active += 1
+            self.requests += 1
+
+        while True:
+            with self.condition:
+                now = monotonic()
+                self._refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    self.waited_seconds += now - start
+                    return
+                wait = (1 - self.tokens) / self.rate
+            sleep(wait)
+
+    def configure(self, concurrency, max_concurrency, max_rate=None, latency_tolerance=None):
+        """Sets the concurrent requests allowed now and the most they may be raised to"""
+        with self.condition:
+            self.concurrency = concurrency
+            self.max_concurrency = max(concurrency, max_concurrency)
+            if max_rate is not None:
+                self.max_rate = max_rate
+            self.latency_tolerance = latency_tolerance
+            self.successes_since_increase = 0
+            self.condition.notify_all()
+
+    def release(self):
+        with self.condition:
+            self.active -= 1
+            self.condition.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def _track_latency(self, latency):
+        if self.recent_latency is None:
+            self.recent_latency = latency
+        else:
+            self.recent_latency += self.latency_smoothing * (latency - self.recent_latency)
+
+        # The baseline is only taken once the average settled, so one fast first request does not set it
+        self.latency_samples += 1
+        if self.latency_samples >= self.window and (self.base_latency is None or self.recent_latency < self.base_latency):
+            self.base_latency = self.recent_latency
+
+    def latency_exceeded(self):
+        if self.latency_tolerance is None or self.base_latency is None:
+            return False
+        return self.recent_latency > self.base_latency * self.latency_tolerance
+
+    def record_success(self, latency=None):
+        with self.condition:
+            self.successes += 1
+            self.consecutive_errors = 0
+            self.outcomes.append(True)
+            if latency is not None:
+                self.total_latency += latency
+                self._track_latency(latency)
+
+            if self.error_rate() <= self.error_threshold:
+                self.rate = min(self.max_rate, self.rate + self.increase / max(1.0, self.rate))
+                if self.latency_exceeded():
+                    # Requests wait on each other, so hand back a slot instead of adding one
+                    self.successes_since_increase = 0
+                    now = monotonic()
+                    if now - self.last_decrease >= self.cooldown:
+                        self.last_decrease = now
+                        if self.concurrency > self.min_concurrency:
+                            self.concurrency -= 1
+                            self.decreases += 1
+                        else:
+                            # Still slow with the fewest requests, so the network got slower rather than us too many
+                            self.base_latency = self.recent_latency
+                    return
+
+                self.successes_since_increase += 1
+                if self.successes_since_increase >= self.window and self.concurrency < self.max_concurrency:
+                    self.successes_since_increase = 0
+                    self.concurrency += 1
+                    self.increases += 1
+                    self.condition.notify()
+
+    def record_error(self):
+        with self.condition:
+            self.errors += 1
+            self.consecutive_errors += 1
+            self.outcomes.append(False)
+            self.successes_since_increase = 0
+            self.last_error_at = time()
+
+            # A lone error among successes is noise, a run of them or a high error rate is throttling
+            congested = self.consecutive_errors >= 2 or self.error_rate() > self.error_threshold
+            now = monotonic()
+            if congested and now - self.last_decrease >= self.cooldown:
+                self.last_decrease = now
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                self.concurrency = max(self.min_concurrency, int(self.concurrency * self.decrease))
+                self.decreases += 1
+                print(f"{self.name}: slowing down to {self.rate:.2f} requests/s and {self.concurrency} at a time.")
+
+    def error_backoff(self):
+        """Seconds to wait after the current run of consecutive errors"""
+        with self.condition:
+            if self.consecutive_errors == 0:
+                return 0.0
+            return min(self.max_backoff, self.base_backoff * 2 ** (self.consecutive_errors - 1))
+
+    def wait_after_error(self):
+        delay = self.error_backoff()
+        with self.condition:
+            self.backoff_seconds += delay
+        sleep(delay)
+
+    def stats(self):
+        with self.condition:
+            return {
+                "name": self.name,
+                "rate": round(self.rate, 3),
+                "concurrency": self.concurrency,
+                "active": self.active,
+                "requests": self.requests,
+                "successes": self.successes,
+                "errors": self.errors,
+                "consecutive_errors": self.consecutive_errors,
+                "error_rate": round(self.error_rate(), 3),
+                "increases": self.increases,
+                "decreases": self.decreases,
+                "waited_seconds": round(self.waited_seconds, 3),
+                "backoff_seconds": round(self.backoff_seconds, 3),
+                "average_latency": round(self.total_latency / self.successes, 3) if self.successes else None,
+                "recent_latency": round(self.recent_latency, 3) if self.recent_latency is not None else None,
+                "base_latency": round(self.base_latency, 3) if self.base_latency is not None else None,
+                "last_error_at": self.last_error_at,
+            }
+
+
+controller_options = {
+    # Place pages fetched by scrape_place, and the feed scrolled by scrape_places
+    "gmaps": dict(rate=10.0, max_rate=20.0, concurrency=5, max_concurrency=5, max_backoff=63.0),
+    # Website contacts API used by scrape_social, whose plans limit requests per second
+    "rapidapi": dict(rate=5.0, max_rate=10.0, concurrency=5, max_concurrency=5, base_backoff=2.0, max_backoff=16.0),
+}
+
+controllers = {}
+controllers_lock = Lock()
+
+
+def get_rate_controller(name):
+    """Returns the controller shared by every worker of the named request path"""
+    with controllers_lock:
+        if name not in controllers:
+            controllers[name] = RateController(name, **controller_options.get(name, {}))
+        return controllers[name]
+
+
+def get_rate_stats():
+    """State and counters of every controller in use, for monitoring"""
+    with controllers_lock:
+        return {name: controller.stats() for name, controller in controllers.items()}
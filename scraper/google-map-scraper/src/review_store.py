@@ -0,0 +1,49 @@
+import os
+from datetime import datetime
+from botasaurus import bt
+from botasaurus.decorators_utils import create_directory_if_not_exists
+from .utils import write_json_atomically
+
+REVIEW_STORE_DIR = "output/review_store/"
+
+
+def get_store_path(place_id):
+    return f"{REVIEW_STORE_DIR}{place_id}.json"
+
+
+def load_stored_reviews(place_id):
+    """
+    Returns the reviews stored by previous incremental runs for place_id, newest first, and their review ids.
+    """
+    path = get_store_path(place_id)
+    if not os.path.exists(path):
+        return [], set()
+
+    stored = bt.read_json(path)
+    reviews = stored["reviews"]
+    return reviews, {review["review_id"] for review in reviews if review.get("review_id")}
+
+
+def merge_new_reviews(new_reviews, stored_reviews):
+    """
+    Puts the new reviews before the stored ones. Reviews that were edited since the last run keep their new version.
+    """
+    new_review_ids = {review["review_id"] for review in new_reviews if review.get("review_id")}
+    return new_reviews + [review for review in stored_reviews if review.get("review_id") not in new_review_ids]
+
+
+def store_new_reviews(place_id, new_reviews, stored_reviews):
+    """
+    Merges the reviews of this run into the stored ones and saves them. The next run stops paginating at the
+    first review whose id is stored, so no separate high-water mark is kept.
+    """
+    reviews = merge_new_reviews(new_reviews, stored_reviews)
+
+    create_directory_if_not_exists(REVIEW_STORE_DIR)
+    write_json_atomically({
+        "place_id": place_id,
+        "updated_at": str(datetime.now()),
+        "reviews": reviews,
+    }, get_store_path(place_id))
+
+    return reviews
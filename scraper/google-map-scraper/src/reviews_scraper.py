@@ -1,13 +1,15 @@
 from botasaurus import bt
 from typing import List, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from threading import Lock
 import traceback
 from datetime import datetime
 import time
 import math
 import urllib.parse
-from lxml import html
-from bs4 import BeautifulSoup, Tag
+from lxml import etree, html
 import regex as re
 import re as rex
 from .time_utils import parse_relative_date
@@ -15,6 +17,8 @@ from .time_utils import parse_relative_date
 default_request_interval = 0.2
 default_n_retries = 10
 default_retry_time = 30
+default_pool_size = 20
+default_http_retries = 3
 
 sort_by_enum = {
     "most_relevant": "qualityScore",  # the most relevant reviews
@@ -62,6 +66,82 @@ metadata_default = {
     "url": "",  # hotel url
 }
 
+def has_class(name: str) -> str:
+    """XPath predicate with the semantics of bs4's class_=: one token for a single class, the whole attribute for several"""
+    if " " in name:
+        return f"normalize-space(@class)='{name}'"
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+def descendants(predicate: str) -> etree.XPath:
+    return etree.XPath(f".//*[{predicate}]")
+
+review_nodes_xpath = etree.XPath(f"//*[{has_class('gws-localreviews__google-review')}]")
+review_metadata_xpath = etree.XPath("//*[@data-google-review-count]")
+
+review_selectors = {
+    "full_text": descendants(has_class("review-full-text")),
+    "expandable_section": descendants("@data-expandable-section"),
+    "rating": descendants(has_class("lTi8oc z3HNkc")),
+    "other_ratings": descendants(has_class("k8MTF")),
+    "relative_date": descendants(has_class("dehysf lTi8oc")),
+    "user_name": descendants(has_class("TSUbDb")),
+    "user": descendants(has_class("Msppse")),
+    "local_guide": descendants(has_class("QV3IV")),
+    "review_link": descendants(has_class("RvU3D")),
+    "likes": descendants("@jsname='CMh1ye'"),
+    "response": descendants(has_class("d6SCIc")),
+    "response_date": descendants(has_class("pi8uOe")),
+    "trip_type_travel_group": descendants(has_class("PV7e7")),
+}
+
+# bs4 leaves the content of these out of .text and .stripped_strings
+skipped_string_tags = {"script", "style"}
+
+def find_all(node, selector: str) -> list:
+    return review_selectors[selector](node)
+
+def find(node, selector: str):
+    nodes = review_selectors[selector](node)
+    return nodes[0] if nodes else None
+
+def is_element(node) -> bool:
+    # Comments and processing instructions are nodes too, but their tag is not a string
+    return isinstance(node, etree._Element) and isinstance(node.tag, str)
+
+def collapse_blank(string: str) -> str:
+    # bs4 stores whitespace only strings as a single newline or space
+    if string.isspace():
+        return "\n" if "\n" in string else " "
+    return string
+
+def iter_strings(node):
+    """Text of node and its descendants in document order, like bs4's .strings"""
+    if node.text and node.tag not in skipped_string_tags:
+        yield collapse_blank(node.text)
+    for child in node:
+        if is_element(child):
+            yield from iter_strings(child)
+        if child.tail:
+            yield collapse_blank(child.tail)
+
+def get_text(node) -> str:
+    return "".join(iter_strings(node))
+
+def stripped_strings(node):
+    for string in iter_strings(node):
+        string = string.strip()
+        if string:
+            yield string
+
+def iter_contents(node):
+    """Direct children of node including the text between them, like bs4's .contents"""
+    if node.text:
+        yield node.text
+    for child in node:
+        yield child
+        if child.tail:
+            yield child.tail
+
 
 
 def extract_google_maps_contributor_url(input_url):
@@ -82,6 +162,38 @@ def extract_google_maps_contributor_url(input_url):
     else:
         return None
 
+def create_session(pool_size: int = default_pool_size, http_retries: int = default_http_retries) -> requests.Session:
+    """
+    Creates a keep-alive session whose connection pool holds pool_size connections per host.
+    Connection errors and 429/5xx responses are retried http_retries times with backoff.
+    """
+    retry = Retry(
+        total=http_retries,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["GET"],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+shared_session = None
+shared_session_lock = Lock()
+
+def get_shared_session(pool_size: int = default_pool_size, http_retries: int = default_http_retries) -> requests.Session:
+    """
+    Returns the session shared by all review scrapers of the process, creating it on first use.
+    """
+    global shared_session
+    with shared_session_lock:
+        if shared_session is None:
+            shared_session = create_session(pool_size, http_retries)
+        return shared_session
+
 def extract_reviews_and_photos(text):
     # Regular expression pattern to extract numbers that may represent reviews and photos
     pattern = r'\d+'
@@ -102,17 +214,98 @@ def extract_reviews_and_photos(text):
     # Return the extracted numbers as a tuple
     return (num_reviews, num_photos)
 
+class ReviewPagination:
+    """
+    Retry, pagination and stop rules of scraping the reviews of one place, without the requests.
+
+    Callers fetch the page of token, pass it to check_page and add_page, and call retry on any error, which tells
+    whether to fetch the same page again after retry_time. GoogleMapsAPIScraper.scrape_reviews and the asyncio
+    engine both drive it, so only how they fetch and wait differs.
+    """
+    def __init__(self, scraper, url, n_reviews, hl="en", sort_by="", token="", stop_at_review_ids=None):
+        self.scraper = scraper
+        self.url_name = scraper._get_url_name(url)
+        self.feature_id = scraper._parse_url_to_feature_id(url)
+        self.sort_by_id = scraper._parse_sort_by(sort_by)
+        self.n_reviews = n_reviews
+        self.hl = hl
+        self.token = token
+        self.stop_at_review_ids = stop_at_review_ids
+
+        self.n_requests = math.ceil((n_reviews) / 10)
+        self.request_index = 0
+        self.retries_left = scraper.n_retries
+        self.last_page = None
+        self.results = []
+        self.done = self.n_requests <= 0
+
+    def query(self) -> str:
+        return self.scraper._build_query(self.feature_id, hl=self.hl, sort_by_id=self.sort_by_id, token=self.token)
+
+    def check_page(self, page):
+        """Raises if the page has no list of reviews, keeping it so retry can still go on from its next token"""
+        self.last_page = page
+        assert isinstance(page[2], list)
+
+    def add_page(self, page):
+        _, _, reviews_soup, review_count, next_token = page
+        self.token = next_token
+        reviews, reached_known_review = self.scraper._cut_at_known_reviews(
+            self.scraper._parse_reviews(reviews_soup, self.hl, next_token), self.stop_at_review_ids
+        )
+        self.results.extend(reviews)
+
+        if review_count < 10 or next_token == "" or reached_known_review:
+            self.done = True
+        else:
+            self._next_request()
+
+    def _next_request(self):
+        self.request_index += 1
+        self.retries_left = self.scraper.n_retries
+        self.last_page = None
+        self.done = self.request_index >= self.n_requests
+
+    def retry(self, error) -> bool:
+        """Called on an error fetching or checking a page, returns True to fetch it again, False to skip it"""
+        response_text, next_token = ("", None) if self.last_page is None else (self.last_page[0], self.last_page[4])
+        self.last_page = None
+        self.retries_left -= 1
+        self.scraper._handle_place_exception(response_text, self.url_name, self.request_index)
+
+        if self.retries_left > 0:
+            return True
+        if next_token is None:
+            raise error
+
+        # Out of retries, but the page told where the next one starts
+        self.token = next_token
+        self._next_request()
+        return False
+
+    def result(self) -> list:
+        if self.n_reviews is not None and self.n_reviews >= 1:
+            return self.results[:self.n_reviews]
+        return self.results
+
+
 class GoogleMapsAPIScraper:
     def __init__(
         self,
         request_interval: float = default_request_interval,
         n_retries: int = default_n_retries,
         retry_time: float = default_retry_time,
+        session: requests.Session = None,
+        pool_size: int = default_pool_size,
+        http_retries: int = default_http_retries,
     ):
         
         self.request_interval = request_interval
         self.n_retries = n_retries
         self.retry_time = retry_time
+        # A passed in session is shared with other scrapers, so it is only closed by its owner
+        self._owns_session = session is None
+        self.session = session if session is not None else create_session(pool_size, http_retries)
         self._reset_logger_filter()
 
     def __enter__(self):
@@ -120,6 +313,8 @@ class GoogleMapsAPIScraper:
 
     def __exit__(self, exc_type, exc_value, tb):
         self._reset_logger_filter()
+        if self._owns_session:
+            self.session.close()
         if exc_type is not None:
             traceback.print_exception(exc_type, exc_value, tb)
 
@@ -171,33 +366,20 @@ class GoogleMapsAPIScraper:
         return "<html><body>" + text + "</body></html>"
 
     def _format_response_text(self, response_text: str):
-        """Transforms text into soup and extract list of reviews"""
-        response_soup = reviews_soup = review_count = next_token = None
+        """Parses text once with lxml and extracts list of review nodes"""
+        tree = review_nodes = review_count = next_token = None
         try:
-            # Send page to soup and trees
-            response_soup = BeautifulSoup(response_text, "lxml")
             tree = html.document_fromstring(response_text)
-            # bt.write_html(response_text , "fff.html")
-            # Encontrando número de reviews e token de próxima página
-            metadata_node = tree.xpath("//*[@data-google-review-count]")[0]
+            metadata_node = review_metadata_xpath(tree)[0]
             review_count = int(metadata_node.attrib["data-google-review-count"])
             next_token = metadata_node.attrib["data-next-page-token"]
 
-            # Iterando sobre texto de cada review
-            # reviews_tree = tree.xpath('//*[contains(@class, "gws-localreviews__google-review")]')
-            
-            reviews_soup = response_soup.find_all(True, class_="gws-localreviews__google-review")
-            
-            # reviews_soup = [
-            #     response_soup.find("div", dict(r.attrib)) for r in reviews_tree
-            # ]
+            review_nodes = review_nodes_xpath(tree)
         except Exception as e:
-            tb = re.sub(r"\s", " ", traceback.format_exc())  # Corrected
-            
             if next_token is None:
                 next_token = self._get_response_token(response_text)
-        
-        return response_text, response_soup, reviews_soup, review_count, next_token
+
+        return response_text, tree, review_nodes, review_count, next_token
 
     def _get_response_token(self, response_text: str) -> str:
         """Searches for token in response text using regex, in case other methods fail"""
@@ -214,9 +396,25 @@ class GoogleMapsAPIScraper:
         sort_by_id: int = "",
         associated_topic: str = "",
         token: str = "",
-    ) -> Tuple[BeautifulSoup, List[BeautifulSoup], int, str]:
+    ) -> Tuple[str, html.HtmlElement, List[html.HtmlElement], int, str]:
         """Makes and formats get request in google's api"""
-        query = f"https://www.google.com/async/reviewSort?authuser=0&hl={hl}&yv=3&cs=1&async=feature_id:{feature_id},review_source:All%20reviews,sort_by:{sort_by_id},is_owner:false,filter_text:,associated_topic:,next_page_token:{token},_pms:s,_fmt:pc"
+        query = self._build_query(feature_id, hl=hl, sort_by_id=sort_by_id, token=token)
+        # Make request
+        response = self.session.get(query)
+        response.raise_for_status()
+        # Decode response
+        response_text = self._decode_response(response)
+        return self._read_response_text(response_text)
+
+    def _build_query(
+        self,
+        feature_id: str,
+        hl: str = "",
+        sort_by_id: int = "",
+        token: str = "",
+    ) -> str:
+        """Builds the reviewSort url of one page of reviews"""
+        return f"https://www.google.com/async/reviewSort?authuser=0&hl={hl}&yv=3&cs=1&async=feature_id:{feature_id},review_source:All%20reviews,sort_by:{sort_by_id},is_owner:false,filter_text:,associated_topic:,next_page_token:{token},_pms:s,_fmt:pc"
         # query = (
         #     "https://www.google.com/async/reviewDialog?"
         #     f"hl={hl}&"
@@ -227,12 +425,9 @@ class GoogleMapsAPIScraper:
         #     f"associated_topic:{associated_topic},"
         #     f"_fmt:pc"
         # )
-        # Make request
-        response = requests.get(query)
-        response.raise_for_status()
-        # Decode response
-        response_text = self._decode_response(response)
 
+    def _read_response_text(self, response_text: str):
+        """Cuts and formats a decoded response into list of reviews"""
         # Cut response to remove css
         response_text = self._cut_response_text(response_text)
         # bt.write_html(response_text , "fff.html")
@@ -241,7 +436,7 @@ class GoogleMapsAPIScraper:
 
     def _parse_place(
         self,
-        response: BeautifulSoup,
+        response: html.HtmlElement,
     ) -> dict:
         """Parse place html"""
         metadata = metadata_default.copy()
@@ -292,14 +487,12 @@ class GoogleMapsAPIScraper:
     def _parse_review_text(self, text_block) -> str:
         """Parse review text html, removing unwanted characters"""
         text = ""
-        for e, s in zip(text_block.contents, text_block.stripped_strings):
-            if isinstance(e, Tag) and e.has_attr(
-                "class"
-            ):  #  and e.attrs["class"] in ["review-snippet","k8MTF",]:
+        for e, s in zip(iter_contents(text_block), stripped_strings(text_block)):
+            if is_element(e) and "class" in e.attrib:
                 break
             text += s + " "
 
-        text = re.sub(r"\s", " ", text)  # Corrected
+        text = re.sub(r"\s", " ", text)
         text = re.sub("'|\"", "", text)
         text = text.strip()
         return text
@@ -316,7 +509,8 @@ class GoogleMapsAPIScraper:
         with open(
             f"errors/review_{name}_{self._ts()}.html", "w", encoding="utf-8"
         ) as f:
-            f.writelines(str(review) + "\n\n" + msg)
+            review_html = html.tostring(review, encoding="unicode") if is_element(review) else str(review)
+            f.writelines(review_html + "\n\n" + msg)
         return result
 
     def _handle_place_exception(self, response_text, name, n) -> dict:
@@ -333,7 +527,8 @@ class GoogleMapsAPIScraper:
             f.writelines(str(response_text) + "\n\n" + msg)
 
 
-    def _parse_review(self, review: Tag, hl) -> dict:
+    def _parse_review(self, review, hl) -> dict:
+        """Parses a review node with the precompiled selectors"""
         result = review_default_result.copy()
 
         # Make timestamp
@@ -341,112 +536,94 @@ class GoogleMapsAPIScraper:
 
         # Parse text
         try:
-            # Find text block
-            text_block = review.find(True, class_="review-full-text")
-            if not text_block:
-                text_block = review.find(True, {"data-expandable-section": True})
-            # Extract text
-            if text_block:
+            text_block = find(review, "full_text")
+            if text_block is None:
+                text_block = find(review, "expandable_section")
+            if text_block is not None:
                 result["text"] = self._parse_review_text(text_block)
         except Exception as e:
             self._handle_review_exception(result, review, "text")
         try:
-            # Find text block
-            translated_text = review.find_all(True, class_="review-full-text")
+            translated_text = find_all(review, "full_text")
             if not translated_text:
-                translated_text = review.find_all(True, {"data-expandable-section": True})
-            # Extract text
-            # print(text_block)
+                translated_text = find_all(review, "expandable_section")
             if len(translated_text) > 1:
                 result["translated_text"] = self._parse_review_text(translated_text[1])
-                # print("aaaaaa", result["translated_text"])
         except Exception as e:
             self._handle_review_exception(result, review, "translated_text")
 
         # Parse review rating
         try:
-            rating_text = review.find(True, class_="lTi8oc z3HNkc").get("aria-label")
+            rating_text = find(review, "rating").get("aria-label")
             rating_text = re.sub(",", ".", rating_text)
             rating = re.findall("[0-9]+[.][0-9]*", rating_text)
             result["rating"] = float(rating[0])
             result["rating_max"] = None
-
         except Exception as e:
             self._handle_review_exception(result, review, "rating")
 
         # Parse other ratings
         try:
-            other_ratings = review.find(True, class_="k8MTF")
-            if other_ratings:
-                s = " ".join([s for s in other_ratings.stripped_strings])
+            other_ratings = find(review, "other_ratings")
+            if other_ratings is not None:
+                s = " ".join(stripped_strings(other_ratings))
                 result["other_ratings"] = re.sub(r"\s+", " ", s)
         except Exception as e:
             self._handle_review_exception(result, review, "other_ratings")
 
         # Parse relative date
         try:
-            result["relative_date"] = review.find(True, class_="dehysf lTi8oc").text
+            result["relative_date"] = get_text(find(review, "relative_date"))
         except Exception as e:
             self._handle_review_exception(result, review, "relative_date")
 
         # Parse user name
         try:
-            result["user_name"] = review.find(True, class_="TSUbDb").text
+            result["user_name"] = get_text(find(review, "user_name"))
         except Exception as e:
             self._handle_review_exception(result, review, "user_name")
 
         # Parse user metadata
         try:
-            user_node = review.find(True, class_="Msppse")
-            if user_node:
+            user_node = find(review, "user")
+            if user_node is not None:
                 result["user_url"] = user_node.get("href")
-                result["user_is_local_guide"] = (
-                    True if user_node.find(True, class_="QV3IV") else False
-                )
-                fixed_text = user_node.text.replace(",", "").replace(".", "")
-                user_reviews,user_photos =  extract_reviews_and_photos(fixed_text)
+                result["user_is_local_guide"] = find(user_node, "local_guide") is not None
+                fixed_text = get_text(user_node).replace(",", "").replace(".", "")
+                user_reviews, user_photos = extract_reviews_and_photos(fixed_text)
                 result["user_reviews"] = user_reviews
                 result["user_photos"] = user_photos
-
-                # print(text)
-                # user_reviews = re.findall(
-                #     "[Uuma0-9.,]+(?= comentário| review)", user_node.text
-                # )
-                # user_photos = re.findall("[Uuma0-9.,]+(?= foto| photo)", user_node.text)
-                # if len(user_reviews) > 0:
-                # if len(user_photos) > 0:
         except Exception as e:
             self._handle_review_exception(result, review, "user_data")
 
         # Parse review id
         try:
-            # result["review_id"] = review.find(True, {"data-ri": True}).get("data-ri")
-            review_id = review.find(True, class_="RvU3D").get("href")
+            review_id = find(review, "review_link").get("href")
             result["review_id"] = re.findall("(?<=postId=).*?(?=&)", review_id)[0]
         except Exception as e:
             self._handle_review_exception(result, review, "review_id")
 
         # Parse review likes
         try:
-            review_likes = review.find(True, jsname="CMh1ye")
-            if review_likes:
-                result["likes"] = int(review_likes.text)
+            review_likes = find(review, "likes")
+            if review_likes is not None:
+                result["likes"] = int(get_text(review_likes))
         except Exception as e:
             self._handle_review_exception(result, review, "likes")
 
         # Parse review response
         try:
-            response = review.find(True, class_="d6SCIc")
-            if response:
+            response = find(review, "response")
+            if response is not None:
                 result["response_text"] = self._parse_review_text(response)
-            response_date = review.find(True, class_="pi8uOe")
-            if response_date:
-                result["response_relative_date"] = response_date.text
+            response_date = find(review, "response_date")
+            if response_date is not None:
+                result["response_relative_date"] = get_text(response_date)
         except Exception as e:
             self._handle_review_exception(result, review, "response")
 
         try:
-            response = review.find_all(True, class_="d6SCIc")
+            response = find_all(review, "response")
             if response:
                 result["translated_response_text"] = self._parse_review_text(response[1])
         except Exception as e:
@@ -454,13 +631,16 @@ class GoogleMapsAPIScraper:
 
         # Parse trip_type_travel_group
         try:
-            trip_type_travel_group = review.find(True, class_="PV7e7")
-            if trip_type_travel_group:
-                s = " ".join([s for s in trip_type_travel_group.stripped_strings])
-                result["trip_type_travel_group"] = re.sub(r"\s+", " ", s)  # Corrected
+            trip_type_travel_group = find(review, "trip_type_travel_group")
+            if trip_type_travel_group is not None:
+                s = " ".join(stripped_strings(trip_type_travel_group))
+                result["trip_type_travel_group"] = re.sub(r"\s+", " ", s)
         except Exception as e:
             self._handle_review_exception(result, review, "trip_type_travel_group")
-        
+
+        return self._finish_review(result, hl)
+
+    def _finish_review(self, result: dict, hl) -> dict:
         if "en" in hl:
             if result['relative_date']:
                 try:
@@ -494,6 +674,35 @@ class GoogleMapsAPIScraper:
 
         return result
 
+    def _parse_reviews(self, reviews_soup, hl, token) -> list:
+        """Parses the reviews of one page, tagging each with the token of the next page"""
+        results = []
+        try:
+            # print("reviews_soup", len(reviews_soup))
+            for review in reviews_soup:
+                # 
+                result = self._parse_review(review, hl)
+                result["token"] = token
+
+
+                results.append(result)
+        except Exception as e:
+            traceback.print_exc()
+            tb = re.sub(r"\s", " ", traceback.format_exc())
+        return results
+
+    def _cut_at_known_reviews(self, page: list, stop_at_review_ids) -> Tuple[list, bool]:
+        """Drops the reviews from the first already known one on, telling whether one was reached"""
+        if stop_at_review_ids:
+            for index, review in enumerate(page):
+                if review["review_id"] in stop_at_review_ids:
+                    return page[:index], True
+        return page, False
+
+    def _get_url_name(self, url: str) -> str:
+        url_name = re.findall("(?<=place/).*?(?=/)", url)[0]
+        return urllib.parse.unquote_plus(url_name)
+
     def scrape_reviews(
         self,
         url: str,
@@ -501,87 +710,35 @@ class GoogleMapsAPIScraper:
         hl: str = "en",
         sort_by: str = "",
         token: str = "",
+        stop_at_review_ids: set = None,
     ):
-        """Scrape specified amount of reviews of a place, appending results in csv"""
-        url_name = re.findall("(?<=place/).*?(?=/)", url)[0]
-        url_name = urllib.parse.unquote_plus(url_name)
-        self._reset_logger_filter(url_name)
-        
-
-        feature_id = self._parse_url_to_feature_id(url)
-        sort_by_id = self._parse_sort_by(sort_by)
-
-        results = []
-        j = 0
-
-        n_requests = math.ceil((n_reviews) / 10)
-        for i in range(n_requests):
-            
-            n = self.n_retries
-            while n > 0:
-                next_token = None
-                try:
-                    response_text = ""
-
-                    (
-                        response_text,
-                        response_soup,
-                        reviews_soup,
-                        review_count,
-                        next_token,
-                    ) = self._get_request(
-                        feature_id,
-                        hl=hl,
-                        sort_by_id=sort_by_id,
-                        token=token,
-                    )
-                    
-                    assert isinstance(reviews_soup, list)
-                    break
-                except Exception as e:
-                    # traceback.print_exc()
-                    n -= 1
-                    self._handle_place_exception(response_text, url_name, i)
-                    if n == 0 and next_token is None:
-                        
-                        raise e
-                    elif n == 0:
-                        
-                        break
-                    else:
-                        
-                        time.sleep(self.retry_time)
-            token = next_token
-            if n == 0:
-                continue
-
+        """
+        Scrape specified amount of reviews of a place, appending results in csv.
+        With stop_at_review_ids, pagination stops at the first review that is already known, so sort_by should be newest.
+        """
+        pages = ReviewPagination(self, url, n_reviews, hl, sort_by, token, stop_at_review_ids)
+        self._reset_logger_filter(pages.url_name)
+
+        while not pages.done:
             try:
-                # print("reviews_soup", len(reviews_soup))
-                for review in reviews_soup:
-                    # 
-                    result = self._parse_review(review, hl)
-                    result["token"] = token
-
-
-                    results.append(result)
-                    # 
-                    j += 1
+                page = self._get_request(
+                    pages.feature_id,
+                    hl=hl,
+                    sort_by_id=pages.sort_by_id,
+                    token=pages.token,
+                )
+                pages.check_page(page)
             except Exception as e:
-                traceback.print_exc()
-                tb = re.sub(r"\s", " ", traceback.format_exc())
-                
-
-            if review_count < 10 or token == "":
-                
-                break
+                if pages.retry(e):
+                    time.sleep(self.retry_time)
+                continue
 
-            # Waiting so google wont block this scraper
-            time.sleep(self.request_interval)
+            pages.add_page(page)
+            if not pages.done:
+                # Waiting so google wont block this scraper
+                time.sleep(self.request_interval)
 
-        
-        if n_reviews is not None and n_reviews >=1 :
-            return results[:n_reviews]
-        return results
+        return pages.result()
 
     def scrape_place(
         self,
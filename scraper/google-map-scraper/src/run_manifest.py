@@ -0,0 +1,149 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+from threading import Lock
+from botasaurus.decorators_utils import create_directory_if_not_exists
+from src.utils import write_json_atomically
+
+RUN_DIR = "output/run/"
+RUN_MANIFEST_NAME = "run_manifest.jsonl"
+
+PENDING = "pending"
+SEARCHED = "searched"
+DETAILS_FETCHED = "details_fetched"
+REVIEWS_FETCHED = "reviews_fetched"
+WRITTEN = "written"
+
+# Stages every query goes through, in order
+STATES = [PENDING, SEARCHED, DETAILS_FETCHED, REVIEWS_FETCHED, WRITTEN]
+
+
+def read_json(path):
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def hash_options(options):
+    """Returns a digest of the options of a run, which decide what its stages produce"""
+    encoded = json.dumps(options, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def read_manifest(path):
+    """
+    Returns the header of the run and the latest state of each of its queries,
+    from the header line and the state changes after it
+    """
+    with open(path, encoding="utf-8") as file:
+        lines = file.read().splitlines()
+
+    header = json.loads(lines[0])
+    queries = header["queries"]
+    states = [PENDING] * len(queries)
+    for line in lines[1:]:
+        try:
+            change = json.loads(line)
+        except ValueError:
+            # The last change may be cut short by a crash
+            break
+        states[change["index"]] = change["state"]
+    return header, states
+
+
+class RunManifest:
+    """
+    Records how far every query of a run has got, so a restarted run skips the stages that are done.
+
+    The manifest is a JSONL log: a header with the queries and a hash of the run options, then one line per state change.
+    Along with the state, the output of the last finished stage of a query is checkpointed, which is
+    what the next stage resumes from: the place links once searched, the places once their details are
+    fetched and the enriched places once their socials and reviews are fetched.
+    """
+    def __init__(self, queries, states, directory=RUN_DIR, options_hash=None):
+        self.queries = queries
+        self.states = states
+        self.options_hash = options_hash
+        self.directory = directory
+        self.path = os.path.join(directory, RUN_MANIFEST_NAME)
+        self.resumed = False
+        self.lock = Lock()
+
+    @staticmethod
+    def open(queries, resume=False, directory=RUN_DIR, options=None):
+        """
+        Returns the manifest of the previous run of the same queries with the same options when resuming,
+        otherwise starts a new one
+        """
+        queries = list(queries)
+        manifest = RunManifest(queries, [PENDING] * len(queries), directory, hash_options(options))
+        if resume and os.path.exists(manifest.path):
+            header, states = read_manifest(manifest.path)
+            if header["queries"] == queries and header.get("options_hash") == manifest.options_hash:
+                manifest.states = states
+                manifest.resumed = True
+                manifest.compact()
+                manifest.print_resume()
+                return manifest
+            print("The queries or options changed since the last run, so the run starts over.")
+
+        manifest.clear()
+        manifest.compact()
+        return manifest
+
+    def compact(self):
+        """Rewrites the log as the header and the current state of every started query, dropping a line cut short by a crash"""
+        create_directory_if_not_exists(self.directory)
+        lines = [json.dumps({"queries": self.queries, "options_hash": self.options_hash, "created_at": str(datetime.now())})]
+        for index, state in enumerate(self.states):
+            if state != PENDING:
+                lines.append(json.dumps({"index": index, "state": state}))
+
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.path)
+
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            os.remove(os.path.join(self.directory, name))
+
+    def finish(self):
+        """Clears the manifest and checkpoints of a run that finished, so the next run starts over"""
+        self.clear()
+
+    def print_resume(self):
+        written = self.states.count(WRITTEN)
+        in_progress = len(self.states) - written - self.states.count(PENDING)
+        print(f"Resuming run: {written} of {len(self.states)} queries done, {in_progress} in progress.")
+
+    def state(self, index):
+        with self.lock:
+            return self.states[index]
+
+    def reached(self, index, state):
+        return STATES.index(self.state(index)) >= STATES.index(state)
+
+    def checkpoint_path(self, index, state):
+        return os.path.join(self.directory, f"{index:06d}-{state}.json")
+
+    def mark(self, index, state, checkpoint=None):
+        """Moves the query at index to state, saving checkpoint as the data later stages resume from"""
+        if checkpoint is not None:
+            write_json_atomically(checkpoint, self.checkpoint_path(index, state))
+
+        with self.lock:
+            previous = self.states[index]
+            self.states[index] = state
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps({"index": index, "state": state, "updated_at": str(datetime.now())}) + "\n")
+
+        # Only the checkpoint of the latest stage is needed to resume
+        previous_path = self.checkpoint_path(index, previous)
+        if previous not in [PENDING, state] and os.path.exists(previous_path):
+            os.remove(previous_path)
+
+    def load(self, index, state):
+        return read_json(self.checkpoint_path(index, state))
@@ -1,11 +1,21 @@
+import os
 import traceback
 from botasaurus import *
 from botasaurus.cache import DontCache
-from src.extract_data import extract_data
+from src.extract_data import extract_data_from_html, extraction_fields
 from src.scraper_utils import create_search_link, perform_visit
 from src.utils import convert_unicode_dict_to_ascii_dict, unique_strings
-from .reviews_scraper import GoogleMapsAPIScraper
+from .reviews_scraper import GoogleMapsAPIScraper, get_shared_session
+from .review_store import load_stored_reviews, store_new_reviews
+from .rate_limiter import get_rate_controller
+from .place_registry import place_registry
+from .browser_pool import browser_pool
+from .http_search import MAX_PAGES, RESULTS_PER_PAGE, create_search_page_link, get_place_links, get_result_places, parse_search_html, parse_search_page
 from time import sleep, time
+from queue import Queue
+from threading import Lock, Thread, local
+from itertools import count
+from contextlib import contextmanager
 from botasaurus.utils import retry_if_is_error
 from selenium.common.exceptions import  StaleElementReferenceException
 
@@ -45,7 +55,7 @@ def process_reviews(reviews, convert_to_english):
         processed_reviews.append(processed_review)
 
     if convert_to_english:
-        return convert_unicode_dict_to_ascii_dict(processed_reviews)
+        return convert_unicode_dict_to_ascii_dict(processed_reviews, in_place=True)
     else:
         return processed_reviews
 
@@ -65,29 +75,150 @@ def scrape_reviews(requests: AntiDetectRequests, data):
     reviews_sort = data["reviews_sort"]
     lang = data["lang"]
     convert_to_english = data["convert_to_english"]
+    # Incremental runs only fetch the reviews newer than the ones stored for the place
+    incremental = data.get("incremental")
+    stored_reviews, known_review_ids = load_stored_reviews(place_id) if incremental else ([], None)
     
     processed = []
-    with GoogleMapsAPIScraper() as scraper:
+    with GoogleMapsAPIScraper(session=get_shared_session()) as scraper:
 
         result = scraper.scrape_reviews(
-            link,  max_r, lang, sort_by=reviews_sort
+            link,  max_r, lang, sort_by=reviews_sort, stop_at_review_ids=known_review_ids
         )
         processed = process_reviews(result, convert_to_english)
+
+    if incremental:
+        processed = store_new_reviews(place_id, processed, stored_reviews)
     
     return {"place_id":place_id, "reviews": processed}
 
 
-cookies = None
-def get_cookies():
-         global cookies
-         return cookies
-
-def set_cookies(ck):
-         global cookies
-         cookies = ck
+search_tokens = count()
+current_search = local()
+
+@contextmanager
+def search_call(token=None):
+    """
+    Gives the searches made in the block a token of their own, which their stream and listener are keyed by,
+    so two calls searching the same query at once do not see each other's places.
+    botasaurus runs a task given a single query on the calling thread, so the token is found through it.
+    """
+    previous = getattr(current_search, "token", None)
+    current_search.token = next(search_tokens) if token is None else token
+    try:
+        yield current_search.token
+    finally:
+        current_search.token = previous
+
+def get_search_token():
+    return getattr(current_search, "token", None)
+
+
+class PlaceStream:
+    """
+    Collects the places of one search as soon as scrape_place returns them.
+    """
+    def __init__(self, query):
+        self.query = query
+        self.token = next(search_tokens)
+        self.queue = Queue()
+        self.sponsored_links = None
+        self.result = None
+        self.error = None
+
+place_streams = {}
+streamed_links = {}
+streams_lock = Lock()
+
+def open_stream(query):
+    stream = PlaceStream(query)
+    with streams_lock:
+        place_streams[stream.token] = stream
+    return stream
+
+def close_stream(stream):
+    with streams_lock:
+        place_streams.pop(stream.token, None)
+        for link in list(streamed_links):
+            streams = [linked for linked in streamed_links[link] if linked is not stream]
+            if streams:
+                streamed_links[link] = streams
+            else:
+                del streamed_links[link]
+
+def get_stream(token):
+    return place_streams.get(token)
+
+def track_links(token, links):
+    stream = place_streams.get(token)
+    if stream is not None:
+        with streams_lock:
+            for link in links:
+                # Several searches may find the same place
+                streams = streamed_links.setdefault(link, [])
+                if stream not in streams:
+                    streams.append(stream)
+
+def publish_place(link, place):
+    for stream in streamed_links.get(link, []):
+        stream.queue.put(place)
+
+
+search_listeners = {}
+
+def add_search_listener(token, listener):
+    """
+    Calls listener(links, sponsored_links) once the feed of the search with token is fully scrolled, before the details of its places are fetched.
+    """
+    with streams_lock:
+        search_listeners[token] = listener
+
+def remove_search_listener(token):
+    with streams_lock:
+        search_listeners.pop(token, None)
+
+def notify_search_done(token, links, sponsored_links):
+    listener = search_listeners.get(token)
+    if listener is not None:
+        listener(links, sponsored_links)
+
+
+# Workers fetching place details at once, set for a run by Gmaps.places and Gmaps.links
+DEFAULT_PARALLEL = 5
+AUTO_PARALLEL = "auto"
+
+# Requests per second allowed per worker, the default 5 workers were allowed 20
+MAX_RATE_PER_WORKER = 4.0
+
+# Most workers AUTO_PARALLEL ramps up to, they mostly wait on the network so it is a multiple of the cores
+MAX_AUTO_PARALLEL = min(64, max(16, 4 * (os.cpu_count() or 1)))
+
+# Latency, as a multiple of the lowest seen, above which AUTO_PARALLEL stops adding workers and removes them
+AUTO_LATENCY_TOLERANCE = 2.0
+
+place_parallel = DEFAULT_PARALLEL
+
+def set_parallel(parallel):
+    """
+    Sets how many scrape_place workers fetch place details at once, a number, or AUTO_PARALLEL to start at
+    DEFAULT_PARALLEL and let the gmaps rate controller ramp up while latency and errors stay low.
+
+    botasaurus runs each batch put in scrape_place with min(len(batch), parallel) workers and starts the next batch
+    once it is done, so no more places are fetched at once than a batch holds. PlaceLinkQueue batches links for that.
+    """
+    global place_parallel
+    controller = get_rate_controller("gmaps")
+    if parallel == AUTO_PARALLEL:
+        place_parallel = MAX_AUTO_PARALLEL
+        controller.configure(min(DEFAULT_PARALLEL, place_parallel), place_parallel, MAX_RATE_PER_WORKER * place_parallel, AUTO_LATENCY_TOLERANCE)
+    elif isinstance(parallel, int) and not isinstance(parallel, bool) and parallel >= 1:
+        place_parallel = parallel
+        controller.configure(parallel, parallel, MAX_RATE_PER_WORKER * parallel)
+    else:
+        raise ValueError(f'parallel must be a number of at least 1 or "{AUTO_PARALLEL}", not {parallel!r}')
 
 @request(
-    parallel=5,
+    parallel=DEFAULT_PARALLEL,
     async_queue=True,
 
     close_on_crash=True,
@@ -99,64 +230,170 @@ def set_cookies(ck):
     # request_interval=0.2, {ADD}
 
 )
-def scrape_place(requests: AntiDetectRequests, link):
-        cookies = get_cookies()
+def scrape_place(requests: AntiDetectRequests, data):
+        link = data["link"]
+        fields = data["fields"]
+        # Rotated over the workers, so no single set of cookies carries every request
+        cookie_set = browser_pool.cookie_jar.take()
+        cookies = cookie_set.cookies if cookie_set is not None else None
+        controller = get_rate_controller("gmaps")
         try:
-            html =  requests.get(link,cookies=cookies,).text
-            # Splitting HTML to get the part after 'window.APP_INITIALIZATION_STATE='
-            initialization_state_part = html.split(';window.APP_INITIALIZATION_STATE=')[1]
-
-            # Further splitting to isolate the APP_INITIALIZATION_STATE content
-            app_initialization_state = initialization_state_part.split(';window.APP_FLAGS')[0]
+            with controller.slot():
+                start = time()
+                html =  requests.get(link,cookies=cookies,).text
+                latency = time() - start
 
             # Extracting data from the APP_INITIALIZATION_STATE
-            data = extract_data(app_initialization_state, link)
+            data = extract_data_from_html(html, link, fields)
             # data['link'] = link
+            controller.record_success(latency)
+            browser_pool.cookie_jar.record_success(cookie_set)
 
             data['is_spending_on_ads'] = False
             cleaned = data
+            publish_place(link, cleaned)
+            place_registry.resolve(link, cleaned)
             
             return cleaned  
         except:
-            sleep(63)
+            # Mostly Google throttling us, so back off before botasaurus retries
+            controller.record_error()
+            browser_pool.cookie_jar.record_error(cookie_set)
+            controller.wait_after_error()
             raise
 
+def create_place_requests(links, fields):
+    # Fields are part of the request so places cached with some fields skipped are not reused for others
+    fields = extraction_fields(fields)
+    if fields is not None:
+        fields = tuple(fields)
+    return [{"link": link, "fields": fields} for link in links]
+
 def merge_sponsored_links(places, sponsored_links):
+    sponsored_links = set(sponsored_links)
     for place in places:
         place['is_spending_on_ads'] = place['link'] in sponsored_links
 
     return places
 
+class PlaceLinkQueue:
+    """
+    Queues the place links of a search for scrape_place as they are found, leaving out
+    the places another query of the run already fetches, and collects the places once the search is done.
+
+    A scroll of the feed only finds a few new links, and a batch never runs on more workers than it has links,
+    so links are held until there are as many as the gmaps rate controller lets run at once.
+    """
+    def __init__(self, query, fields):
+        self.query = query
+        self.fields = fields
+        self.token = get_search_token()
+        self.scrape_place_obj: AsyncQueueResult = scrape_place(parallel=place_parallel)
+        self.searched_links = {}
+        # Places another query of the run already fetches
+        self.referenced_links = {}
+        # Links not handed to scrape_place yet
+        self.pending_links = {}
+
+    def put(self, links):
+        track_links(self.token, links)
+        # The feed is read whole on every scroll, so only its new links are queued
+        links = [link for link in links if link not in self.searched_links]
+        self.searched_links.update(dict.fromkeys(links))
+        if place_registry.enabled:
+            self.referenced_links.update(dict.fromkeys(link for link in links if not place_registry.claim(link, self.query)))
+            links = [link for link in links if link not in self.referenced_links]
+        self.pending_links.update(dict.fromkeys(links))
+        if len(self.pending_links) >= self.batch_size():
+            self.flush()
+
+    def batch_size(self):
+        return get_rate_controller("gmaps").concurrency
+
+    def flush(self):
+        if self.pending_links:
+            self.scrape_place_obj.put(create_place_requests(list(self.pending_links), self.fields))
+            self.pending_links = {}
+
+    def get(self):
+        self.flush()
+        places = self.scrape_place_obj.get()
+
+        if place_registry.enabled:
+            place_registry.release(self.query)
+            places = places + self.get_referenced_places()
+
+        return places
+
+    def get_referenced_places(self):
+        """
+        Waits for the places other queries fetch. The ones they fail to fetch are claimed and fetched
+        by this query instead, as it found them itself.
+        """
+        referenced_places = []
+        links = list(self.referenced_links)
+        while links:
+            missing_links = []
+            for link in links:
+                place = place_registry.wait(link)
+                if place is None:
+                    missing_links.append(link)
+                else:
+                    referenced_places.append(place)
+
+            claimed_links = [link for link in missing_links if place_registry.claim(link, self.query)]
+            if claimed_links:
+                scrape_place_obj: AsyncQueueResult = scrape_place(parallel=place_parallel)
+                scrape_place_obj.put(create_place_requests(claimed_links, self.fields))
+                referenced_places.extend(scrape_place_obj.get())
+                place_registry.release(self.query)
+
+            # Claimed again by yet another query meanwhile, so wait for that one
+            links = [link for link in missing_links if link not in claimed_links]
+
+        return referenced_places
+
+def create_places_result(data, places, sponsored_links, failed):
+    places = merge_sponsored_links(places, sponsored_links)
+    
+    if data['convert_to_english']:
+        places = convert_unicode_dict_to_ascii_dict(places, in_place=True)
+
+    result = {"query": data['query'], "places": places}
+    
+    if failed:
+        DontCache(result)
+    return result
+
 @browser(
     block_images=True,
     reuse_driver=True,
     keep_drivers_alive=True, 
+    lang=browser_pool.lang(),
     close_on_crash=True,
     headless=True,
     output=None,
-    parallel=bt.calc_max_parallel_browsers,
 )
 def scrape_places_by_links(driver: AntiDetectDriver, data):
     
-    search_link = create_search_link("web developers in bangalore", "en", None, None)
-    perform_visit(driver, search_link)
-
-    set_cookies(driver.get_cookies_dict())
+    # Only visits a search page when no query left cookies in the jar
+    browser_pool.warm_up(driver)
 
     links = data["links"]
     cache = data["cache"]
+    fields = data.get("fields")
     
-    scrape_place_obj: AsyncQueueResult = scrape_place(cache=cache)
+    scrape_place_obj: AsyncQueueResult = scrape_place(cache=cache, parallel=place_parallel)
     convert_to_english = data['convert_to_english']
 
-    scrape_place_obj.put(links)
+    scrape_place_obj.put(create_place_requests(links, fields))
     places = scrape_place_obj.get()
 
     sponsored_links = []
     places = merge_sponsored_links(places, sponsored_links)
 
     if convert_to_english:
-        places = convert_unicode_dict_to_ascii_dict(places)
+        places = convert_unicode_dict_to_ascii_dict(places, in_place=True)
 
     return places 
 
@@ -171,7 +408,7 @@ def get_lang(data):
     block_images=True,
     reuse_driver=True,
     keep_drivers_alive=True, 
-    lang=get_lang,
+    lang=browser_pool.lang(get_lang),
     close_on_crash=True,
     headless=True,
     output=None,
@@ -181,9 +418,10 @@ def scrape_places(driver: AntiDetectDriver, data):
     # This fixes consent Issues in Countries like Spain 
     max_results = data['max']
     is_spending_on_ads = data['is_spending_on_ads']
-    convert_to_english = data['convert_to_english']
 
-    scrape_place_obj: AsyncQueueResult = scrape_place()
+    link_queue = PlaceLinkQueue(data['query'], data.get('fields'))
+    put_place_links = link_queue.put
+    stream = get_stream(link_queue.token)
 
     sponsored_links = None
     def get_sponsored_links():
@@ -208,7 +446,7 @@ def scrape_places(driver: AntiDetectDriver, data):
                             rst = []
                         elif driver.is_in_page("/maps/place/"):
                             rst = [driver.current_url]
-                            scrape_place_obj.put(rst)
+                            put_place_links(rst)
                         return
                     else:
                         did_element_scroll = driver.scroll_element(el)
@@ -223,11 +461,15 @@ def scrape_places(driver: AntiDetectDriver, data):
                                 '[role="feed"] >  div > div > a', bt.Wait.LONG))[:max_results]
                                                     
                         
+                        if stream is not None and stream.sponsored_links is None:
+                            # Sponsored results sit at the top of the feed, so they are known after the first scroll
+                            stream.sponsored_links = get_sponsored_links()
+
                         if is_spending_on_ads:
-                            scrape_place_obj.put(get_sponsored_links())
+                            put_place_links(get_sponsored_links())
                             return 
                             
-                        scrape_place_obj.put(links)
+                        put_place_links(links)
 
 
                         if max_results is not None and len(links) >= max_results:
@@ -243,6 +485,7 @@ def scrape_places(driver: AntiDetectDriver, data):
 
                         if elapsed_time > WAIT_TIME :
                             print('Google Maps was stuck in scrolling. Retrying.')
+                            # A stalled feed is not Google throttling the details, so the gmaps controller is left alone
                             sleep(63)
                             raise StuckInGmapsException()                           
                             # we increased speed so occurence if higher than 
@@ -259,7 +502,7 @@ def scrape_places(driver: AntiDetectDriver, data):
     
     perform_visit(driver, search_link)
     
-    set_cookies(driver.get_cookies_dict())
+    browser_pool.refresh_cookies(driver)
     
     RETRIES = 5
     failed_to_scroll = False
@@ -270,19 +513,156 @@ def scrape_places(driver: AntiDetectDriver, data):
 
     retry_if_is_error(put_links, [StaleElementReferenceException, StuckInGmapsException], RETRIES, raise_exception=False, on_failed_after_retry_exhausted=on_failed_after_retry_exhausted)
 
-    places = scrape_place_obj.get()
-
     sponsored_links = get_sponsored_links() 
-    places = merge_sponsored_links(places, sponsored_links)
-    
-    if convert_to_english:
-        places = convert_unicode_dict_to_ascii_dict(places)
+    if not failed_to_scroll:
+        notify_search_done(link_queue.token, list(link_queue.searched_links), sponsored_links)
 
-    result = {"query": data['query'], "places": places}
-    
-    if failed_to_scroll:
-        DontCache(result)
-    return result 
+    places = link_queue.get()
+
+    return create_places_result(data, places, sponsored_links, failed_to_scroll)
+
+@request(
+    close_on_crash=True,
+    output=None,
+)
+def scrape_places_over_http(requests: AntiDetectRequests, data):
+    """
+    Variant of scrape_places which pages through the search endpoint over HTTP instead of scrolling the feed in Chrome.
+    The first page failing fails the task, so search_places falls back to the browser.
+    """
+    query = data['query']
+    lang = data['lang']
+    max_results = data['max']
+
+    def get(link):
+        cookie_set = browser_pool.cookie_jar.take()
+        cookies = cookie_set.cookies if cookie_set is not None else None
+        controller = get_rate_controller("gmaps")
+        try:
+            with controller.slot():
+                start = time()
+                response = requests.get(link, cookies=cookies,)
+                latency = time() - start
+            response.raise_for_status()
+            controller.record_success(latency)
+            browser_pool.cookie_jar.record_success(cookie_set)
+            return response.text
+        except:
+            controller.record_error()
+            browser_pool.cookie_jar.record_error(cookie_set)
+            controller.wait_after_error()
+            raise
+
+    # Parsed before any place is queued, so falling back to the browser starts from scratch
+    payload, viewport = parse_search_html(get(create_search_link(query, lang, data['geo_coordinates'], data['zoom'])))
+    links = get_place_links(payload, lang)
+    if not links:
+        # An empty page may as well be a page we failed to understand, so let the browser tell
+        raise ValueError(f"No places found in the search page of {query}")
+
+    link_queue = PlaceLinkQueue(query, data.get('fields'))
+    failed_to_page = False
+    pages = 1
+    while True:
+        new_links = [link for link in unique_strings(links) if link not in link_queue.searched_links]
+        if max_results is not None:
+            new_links = new_links[:max_results - len(link_queue.searched_links)]
+        link_queue.put(new_links)
+
+        # Counted before places without a data id are dropped, a page missing one may still have a next page
+        if len(get_result_places(payload)) < RESULTS_PER_PAGE or pages >= MAX_PAGES:
+            break
+        if max_results is not None and len(link_queue.searched_links) >= max_results:
+            break
+
+        try:
+            payload = parse_search_page(get(create_search_page_link(query, lang, viewport, pages * RESULTS_PER_PAGE)))
+            links = get_place_links(payload, lang)
+        except Exception:
+            traceback.print_exc()
+            print('Failed to fetch the next page of results. Skipping.')
+            failed_to_page = True
+            break
+        pages += 1
+
+    # Sponsored results are only marked in the browser
+    sponsored_links = []
+    if not failed_to_page:
+        notify_search_done(link_queue.token, list(link_queue.searched_links), sponsored_links)
+
+    places = link_queue.get()
+
+    return create_places_result(data, places, sponsored_links, failed_to_page)
+
+SEARCH_BACKEND_BROWSER = "browser"
+SEARCH_BACKEND_HTTP = "http"
+
+def search_places(data, cache=True, search_backend=SEARCH_BACKEND_BROWSER):
+    """
+    Searches a query with scrape_places, or with scrape_places_over_http when search_backend is SEARCH_BACKEND_HTTP,
+    falling back to scrape_places if that fails. Sponsored places are only known in the browser.
+    """
+    if search_backend == SEARCH_BACKEND_HTTP and not data['is_spending_on_ads']:
+        result = scrape_places_over_http(data, cache=cache)
+        if result is not None:
+            return result
+        print(f"Searching {data['query']} over HTTP failed, searching it in the browser.")
+    elif search_backend not in [SEARCH_BACKEND_BROWSER, SEARCH_BACKEND_HTTP]:
+        raise ValueError(f'search_backend must be "{SEARCH_BACKEND_BROWSER}" or "{SEARCH_BACKEND_HTTP}", not {search_backend!r}')
+
+    return scrape_places(data, cache=cache)
+
+# One set of browsers serves both searches and links for the whole run
+browser_pool.share(scrape_places, scrape_places_by_links)
+
+def stream_places(data, cache=True, search_backend=SEARCH_BACKEND_BROWSER):
+    """
+    Streaming variant of search_places which yields every place as soon as its details are fetched,
+    while the feed is still being scrolled. Places served from the cache are yielded once the search finishes.
+    Raises the error of a failed search once the places fetched before it are yielded.
+
+    It is meant for callers consuming places one by one, Gmaps.places still processes every query as a whole.
+    """
+    convert_to_english = data['convert_to_english']
+    stream = open_stream(data['query'])
+
+    def search():
+        try:
+            with search_call(stream.token):
+                stream.result = search_places(data, cache=cache, search_backend=search_backend)
+        except BaseException as error:
+            # Raised by the generator, a thread's exception would only be printed
+            stream.error = error
+        finally:
+            stream.queue.put(None)
+
+    Thread(target=search, daemon=True).start()
+
+    yielded = set()
+    try:
+        while True:
+            place = stream.queue.get()
+            if place is None:
+                break
+            if place['link'] in yielded:
+                continue
+
+            yielded.add(place['link'])
+            place = dict(place)
+            place['is_spending_on_ads'] = place['link'] in (stream.sponsored_links or [])
+            yield convert_unicode_dict_to_ascii_dict(place) if convert_to_english else place
+    finally:
+        close_stream(stream)
+
+    if stream.error is not None:
+        raise stream.error
+    if stream.result is None:
+        # botasaurus prints the error of a failed task and returns None
+        raise RuntimeError(f"Searching {data['query']} failed")
+
+    for place in stream.result["places"]:
+        if place is not None and place['link'] not in yielded:
+            yield place
 
 if __name__ == "__main__":
     print(scrape_places(["restaurants in delhi"]))
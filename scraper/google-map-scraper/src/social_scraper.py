@@ -1,7 +1,7 @@
 from botasaurus import request as rq, bt
 from botasaurus.cache import DontCache
 import requests
-from time import sleep
+from .rate_limiter import get_rate_controller
 
 FAILED_DUE_TO_CREDITS_EXHAUSTED = "FAILED_DUE_TO_CREDITS_EXHAUSTED"
 FAILED_DUE_TO_NOT_SUBSCRIBED = "FAILED_DUE_TO_NOT_SUBSCRIBED"
@@ -29,9 +29,18 @@ def do_request(data, retry_count=3):
     }
 
     
-    response = requests.get(url, headers=headers, params=querystring)
-    response_data = response.json()
+    controller = get_rate_controller("rapidapi")
+    try:
+        with controller.slot():
+            response = requests.get(url, headers=headers, params=querystring)
+        response_data = response.json()
+    except Exception:
+        # Failed connections and pages that are not JSON count as errors too, or the rate would keep climbing
+        controller.record_error()
+        raise
+
     if response.status_code == 200:
+        controller.record_success(response.elapsed.total_seconds())
         update_credits()
 
         final = response_data.get('data', [None])[0]
@@ -62,8 +71,10 @@ def do_request(data, retry_count=3):
                         "data":  None,
                         "error":FAILED_DUE_TO_CREDITS_EXHAUSTED
                     })
-        elif "exceeded the rate limit per second for your plan" in message or "many requests" in message:
-            sleep(2)
+        elif response.status_code == 429 or "exceeded the rate limit per second for your plan" in message or "many requests" in message:
+            # Only throttling lowers the rate, quota and subscription errors fail every place the same way
+            controller.record_error()
+            controller.wait_after_error()
             return do_request(data, retry_count - 1)
         elif "You are not subscribed to this API." in message:
             
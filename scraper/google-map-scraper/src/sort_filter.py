@@ -1,5 +1,13 @@
 from src.utils import kebab_case, unicode_to_ascii
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Below this many places the composite key sort is faster than building NumPy columns
+NUMPY_SORT_THRESHOLD = 20000
+
 def sort_place(places:list, sort):
      
     def sorting_key(item):
@@ -44,11 +52,132 @@ def sort_place(places:list, sort):
 
     return sorted_data
 
-def sort_places(places:list, sorts):
-    for sort in sorts:
-            places = sort_place(places, sort)
+class Descending:
+    """Inverts the comparison of a key, so descending criteria can share one ascending composite key"""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __hash__(self):
+        return hash(self.value)
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+
+def compile_criterion(sort):
+    """Returns an ascending key for one criterion of a sort spec, ordering places as sort_place does"""
+    sorting_by, sorting_order = sort[0], sort[1]
+
+    if isinstance(sorting_order, bool):
+        if sorting_order:
+            # Places that have the field first
+            def key(item):
+                result = item.get(sorting_by, 0)
+                return 1 if result is False or result is None else 0
+        else:
+            def key(item):
+                result = item.get(sorting_by, 0)
+                return 1 if result is True or result is not None else 0
+        return key
+
+    if sorting_order == "desc":
+        # Negating numbers is cheaper than wrapping them, other values get their comparison inverted
+        def key(item):
+            value = item.get(sorting_by)
+            if value is None:
+                return (0,)
+            if isinstance(value, int):
+                return (-1, -value)
+            return (-2, -value) if isinstance(value, float) else (-2, Descending(value))
+        return key
+
+    def key(item):
+        value = item.get(sorting_by)
+        if value is None:
+            return (0,)
+        return (1, value) if isinstance(value, int) else (2, value)
+
+    return key
+
+
+class CompiledSort:
+    """
+    A sort spec compiled into one composite key.
+
+    Sorting by each criterion in turn makes the last criterion the primary one, with earlier criteria
+    breaking its ties and the input order breaking the rest. The composite key lists the criteria in
+    reverse and Python's stable sort keeps the input order, so one pass yields the same ordering.
+    """
+    def __init__(self, sorts):
+        # Primary criterion first
+        self.keys = [compile_criterion(sort) for sort in reversed(sorts)]
+
+    def key(self, item):
+        return tuple(key(item) for key in self.keys)
+
+    def columns(self, places):
+        return [[key(item) for item in places] for key in self.keys]
+
+    def ranked_columns(self, places):
+        """Replaces every key by its rank among the distinct keys of its column"""
+        ranked = []
+        for values in self.columns(places):
+            distinct = sorted(set(values))
+            ranks = {value: rank for rank, value in enumerate(distinct)}
+            ranked.append(([ranks[value] for value in values], len(distinct)))
+        return ranked
+
+    def sort(self, places):
+        return [places[index] for index in self.order(places)]
+
+    def order(self, places):
+        """Returns the indexes of places in sorted order"""
+        if not self.keys:
+            return list(range(len(places)))
+
+        try:
+            if np is not None and len(places) >= NUMPY_SORT_THRESHOLD:
+                return self.lexsort_order(places)
+            return self.rank_sort_order(places)
+        except TypeError:
+            # Unhashable field values can't be ranked, so compare the keys themselves
+            composite_keys = list(zip(*self.columns(places)))
+            return sorted(range(len(places)), key=composite_keys.__getitem__)
+
+    def rank_sort_order(self, places):
+        """Packs the ranks of all criteria into one integer per place, so the stable sort compares plain ints"""
+        composite_keys = [0] * len(places)
+        for ranks, radix in self.ranked_columns(places):
+            composite_keys = [composite * radix + rank for composite, rank in zip(composite_keys, ranks)]
+
+        return sorted(range(len(places)), key=composite_keys.__getitem__)
+
+    def lexsort_order(self, places):
+        """Orders the ranks of all criteria as columnar arrays with NumPy's stable lexsort"""
+        ranked = [np.array(ranks, dtype=np.int64) for ranks, _ in self.ranked_columns(places)]
+        if not ranked:
+            return list(range(len(places)))
+        # lexsort takes its primary key last
+        return np.lexsort(ranked[::-1]).tolist()
+
+    def rank_sort(self, places):
+        return [places[index] for index in self.rank_sort_order(places)]
+
+    def lexsort(self, places):
+        return [places[index] for index in self.lexsort_order(places)]
 
-    return places
+
+def compile_sort(sorts) -> CompiledSort:
+    return CompiledSort(sorts)
+
+
+def sort_places(places:list, sorts):
+    return compile_sort(sorts).sort(places)
 
 
 def list_contains_string(string_list, target_string):
@@ -59,54 +188,130 @@ def list_contains_string(string_list, target_string):
     return False
 
 
-def filter_places(ls, filter_data):
-    def fn(i):
-        min_rating = filter_data.get("min_rating")
-        max_rating = filter_data.get("max_rating")
-        min_reviews = filter_data.get("min_reviews")
-        max_reviews = filter_data.get("max_reviews")
-        has_phone = filter_data.get("has_phone")
-        has_website = filter_data.get("has_website")
+def normalize_category(category):
+    return kebab_case(unicode_to_ascii(category)).lower()
+
+
+def is_blank(value):
+    return value is None or value == ''
+
+
+def to_number_array(values):
+    """Numbers of a column as floats, along with which of them are blank"""
+    blank = np.fromiter((is_blank(value) for value in values), dtype=bool, count=len(values))
+    numbers = np.array([0.0 if is_blank(value) else value for value in values], dtype=float)
+    return numbers, blank
+
+
+class CompiledFilter:
+    """
+    filter_data compiled into the checks that are actually set, with category_in normalized once into a set.
+
+    Use matches or filter on places, or mask on a columnar batch of them.
+    """
+    def __init__(self, filter_data):
+        self.min_rating = filter_data.get("min_rating")
+        self.max_rating = filter_data.get("max_rating")
+        self.min_reviews = filter_data.get("min_reviews")
+        self.max_reviews = filter_data.get("max_reviews")
+        self.has_phone = filter_data.get("has_phone")
+        self.has_website = filter_data.get("has_website")
         category_in = filter_data.get("category_in")
 
-        rating = i.get('rating')
-        reviews = i.get('reviews')
-        web_site = i.get("website")
-        phone = i.get("phone")
-        main_category = i.get("main_category")
+        self.categories = {normalize_category(category) for category in category_in} if category_in else None
+        # main_category values repeat a lot, so each one is normalized only once
+        self.normalized_categories = {}
+        self.checks = self.compile_checks()
 
-        if category_in and (not list_contains_string(category_in, main_category)):
-            return False
+    def normalized_category(self, main_category):
+        if main_category is None:
+            return None
+        if main_category not in self.normalized_categories:
+            self.normalized_categories[main_category] = normalize_category(main_category)
+        return self.normalized_categories[main_category]
 
-        if min_rating is not None and (rating == '' or rating is None or rating < min_rating):
-            return False
-        
-        if max_rating is not None and (rating == '' or rating is None or rating > max_rating):
-            return False
+    def compile_checks(self):
+        checks = []
 
-        if min_reviews is not None and (reviews == '' or reviews is None or reviews < min_reviews):
-            return False
+        if self.categories is not None:
+            categories = self.categories
+            checks.append(lambda place: self.normalized_category(place.get("main_category")) in categories)
 
-        if max_reviews is not None and (reviews == '' or reviews is None or reviews > max_reviews):
-            return False
+        def add_range(field, minimum, maximum):
+            if minimum is not None:
+                checks.append(lambda place: not is_blank(place.get(field)) and not place.get(field) < minimum)
+            if maximum is not None:
+                checks.append(lambda place: not is_blank(place.get(field)) and not place.get(field) > maximum)
 
-        if has_website is not None:
-            if (has_website is False and web_site is not None):
-                return False
+        add_range("rating", self.min_rating, self.max_rating)
+        add_range("reviews", self.min_reviews, self.max_reviews)
 
-            if (has_website is True and web_site is None):
-                return False
+        if isinstance(self.has_website, bool):
+            has_website = self.has_website
+            checks.append(lambda place: (place.get("website") is not None) == has_website)
 
-        if has_phone is not None:
-            if (has_phone is True and (phone is None or phone == '')):
-                return False
+        if isinstance(self.has_phone, bool):
+            has_phone = self.has_phone
+            checks.append(lambda place: (not is_blank(place.get("phone"))) == has_phone)
 
-            if (has_phone is False and (not (phone is None or phone == ''))):
-                return False
+        return checks
 
+    def matches(self, place):
+        for check in self.checks:
+            if not check(place):
+                return False
         return True
 
-    return list(filter(fn, ls))
+    def filter(self, places):
+        if not self.checks:
+            return list(places)
+        return [place for place in places if self.matches(place)]
+
+    def mask(self, columns):
+        """
+        Evaluates the filter over a columnar batch, a dict of equally long value lists keyed by field,
+        and returns which rows are kept. Vectorized with NumPy when it is installed.
+        """
+        size = len(next(iter(columns.values()))) if columns else 0
+        if np is None:
+            rows = ({field: values[index] for field, values in columns.items()} for index in range(size))
+            return [self.matches(row) for row in rows]
+
+        keep = np.ones(size, dtype=bool)
+
+        if self.categories is not None:
+            categories = self.categories
+            keep &= np.fromiter((self.normalized_category(category) in categories for category in columns["main_category"]), dtype=bool, count=size)
+
+        for field, minimum, maximum in [("rating", self.min_rating, self.max_rating), ("reviews", self.min_reviews, self.max_reviews)]:
+            if minimum is not None or maximum is not None:
+                numbers, blank = to_number_array(columns[field])
+                keep &= ~blank
+                if minimum is not None:
+                    keep &= ~(numbers < minimum)
+                if maximum is not None:
+                    keep &= ~(numbers > maximum)
+
+        if isinstance(self.has_website, bool):
+            keep &= np.fromiter(((website is not None) == self.has_website for website in columns["website"]), dtype=bool, count=size)
+
+        if isinstance(self.has_phone, bool):
+            keep &= np.fromiter(((not is_blank(phone)) == self.has_phone for phone in columns["phone"]), dtype=bool, count=size)
+
+        return keep
+
+
+def compile_filter(filter_data) -> CompiledFilter:
+    return CompiledFilter(filter_data)
+
+
+def to_columns(places, fields):
+    """Columnar batch of the given fields of places, for CompiledFilter.mask"""
+    return {field: [place.get(field) for place in places] for field in fields}
+
+
+def filter_places(ls, filter_data):
+    return compile_filter(filter_data).filter(ls)
 
 
 def sort_dict_by_keys(dictionary, keys):
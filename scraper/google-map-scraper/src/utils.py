@@ -1,22 +1,57 @@
+import os
+import json
+from functools import lru_cache
 from botasaurus import bt
 from unidecode import unidecode
 from casefy import kebabcase
 
+UNICODE_CACHE_SIZE = 65536
+# Longer strings like review texts rarely repeat, and would only push names and categories out of the cache
+MAX_CACHED_LENGTH = 200
+
+def write_json_atomically(data, path):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        json.dump(data, file)
+    # Renamed once complete, so a crash while writing keeps the previous version
+    os.replace(temp_path, path)
+
+def transliterate(text):
+    # Replacing 'ë' with 'e' and return the ASCII text
+    return unidecode(text).replace("ë", "e")
+
+# lru_cache is thread safe and counts its hits and misses
+cached_transliterate = lru_cache(maxsize=UNICODE_CACHE_SIZE)(transliterate)
+
 def unicode_to_ascii(text):
     """
     Convert unicode text to ASCII, replacing special characters.
     """
-    # Replacing 'ë' with 'e' and return the ASCII text
-    return unidecode(text).replace("ë", "e")
+    if text.isascii():
+        return text
+    if len(text) > MAX_CACHED_LENGTH:
+        return transliterate(text)
+    return cached_transliterate(text)
+
+def unicode_cache_info():
+    """Hits, misses and size of the unicode_to_ascii cache"""
+    return cached_transliterate.cache_info()
 
-def applyTransformer(data, transformer):
+def clear_unicode_cache():
+    cached_transliterate.cache_clear()
+
+def applyTransformer(data, transformer, in_place=False):
     """
     Apply a transformer function to all strings in a nested data structure.
 
     :param data: The data structure (dict, list, nested dicts) to transform.
     :param transformer: A function that takes a string and returns a transformed string.
+    :param in_place: Whether to replace the changed strings inside data instead of building a transformed copy.
     :return: The transformed data structure.
     """
+    if in_place:
+        return transform_in_place(data, transformer)
+
     if isinstance(data, dict):
         # If the item is a dictionary, apply the transformer to each value.
         return {key: applyTransformer(value, transformer) for key, value in data.items()}
@@ -31,11 +66,36 @@ def applyTransformer(data, transformer):
         return data
 
 
-def convert_unicode_dict_to_ascii_dict(data):
+def transform_in_place(data, transformer):
+    """
+    Walks dicts and lists with an explicit stack, so deep structures don't recurse, and only assigns
+    the strings the transformer actually changed. No container is copied.
+    """
+    if isinstance(data, str):
+        return transformer(data)
+
+    stack = [data]
+    while stack:
+        container = stack.pop()
+        items = container.items() if isinstance(container, dict) else enumerate(container)
+        for key, value in items:
+            if isinstance(value, str):
+                transformed = transformer(value)
+                if transformed is not value and transformed != value:
+                    # Replacing the value of an existing key is safe while iterating
+                    container[key] = transformed
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
+
+    return data
+
+
+def convert_unicode_dict_to_ascii_dict(data, in_place=False):
     """
     Convert unicode data to ASCII, replacing special characters.
+    Pass in_place=True for data nothing else holds on to, to convert it without copying.
     """
-    return applyTransformer(data, unicode_to_ascii)
+    return applyTransformer(data, unicode_to_ascii, in_place)
 
 
 def kebab_case(s):
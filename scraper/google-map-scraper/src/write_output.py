@@ -1,15 +1,57 @@
+import csv
+import os
+import pickle
+import struct
+import tempfile
+from json import dumps
 from botasaurus.decorators_utils import create_directory_if_not_exists
 from botasaurus.decorators import print_filenames
+from botasaurus.beep_utils import prompt
 from botasaurus import bt
 
 from src.fields import Fields
 from src.utils import kebab_case, sort_dict_by_keys, unicode_to_ascii
 
-
-def make_folders(query_kebab):
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+OUTPUT_CSV = "csv"
+OUTPUT_JSON = "json"
+OUTPUT_PARQUET = "parquet"
+OUTPUT_GEOPARQUET = "geoparquet"
+DEFAULT_OUTPUT_FORMATS = [OUTPUT_CSV, OUTPUT_JSON]
+
+PARQUET_BATCH_SIZE = 1000
+
+# PROJJSON of EPSG:4326 (WGS 84), the CRS of Google Maps coordinates
+WGS84_PROJJSON = {
+    "$schema": "https://proj.org/schemas/v0.7/projjson.schema.json",
+    "type": "GeographicCRS",
+    "name": "WGS 84",
+    "datum": {
+        "type": "GeodeticReferenceFrame",
+        "name": "World Geodetic System 1984",
+        "ellipsoid": {"name": "WGS 84", "semi_major_axis": 6378137, "inverse_flattening": 298.257223563},
+    },
+    "coordinate_system": {
+        "subtype": "ellipsoidal",
+        "axis": [
+            {"name": "Geodetic latitude", "abbreviation": "Lat", "direction": "north", "unit": "degree"},
+            {"name": "Geodetic longitude", "abbreviation": "Lon", "direction": "east", "unit": "degree"},
+        ],
+    },
+    "id": {"authority": "EPSG", "code": 4326},
+}
+
+
+def make_folders(query_kebab, output_formats=DEFAULT_OUTPUT_FORMATS):
   create_directory_if_not_exists(f"output/{query_kebab}/")
-  create_directory_if_not_exists(f"output/{query_kebab}/json/")
-  create_directory_if_not_exists(f"output/{query_kebab}/csv/")
+  for output_format in output_formats:
+    create_directory_if_not_exists(f"output/{query_kebab}/{output_format}/")
   pass
 
 
@@ -122,250 +164,191 @@ def most_popular_times_to_string(data):
         return data
 
 
-def transform_places(places, fields):
-    transformed_places = []
-
-    for place in places:
-        transformed_place = {}
-        
-        for field in fields:
-            if field == Fields.REVIEWS_PER_RATING:
-                # Transforming reviews_per_rating
-                for key, value in place['reviews_per_rating'].items():
-                    transformed_place[f'reviews_per_rating_{key}'] = value
-
-            elif field == Fields.MENU:
-                # Adding menu link
-                transformed_place['menu_link'] = place['menu']['link'] if 'menu' in place and 'link' in place['menu'] else None
-
-            elif field == Fields.FEATURED_QUESTION:
-                transformed_place[Fields.FEATURED_QUESTION] = featured_question_to_string(place[Fields.FEATURED_QUESTION])
-
-            elif field == Fields.COMPETITORS:
-                transformed_place[Fields.COMPETITORS] = competitors_to_string(place[Fields.COMPETITORS])
-
-            elif field == Fields.POPULAR_TIMES:
-                transformed_place[Fields.POPULAR_TIMES] = popular_times_to_string(place[Fields.POPULAR_TIMES])
-
-            elif field == Fields.MOST_POPULAR_TIMES:
-                transformed_place[Fields.MOST_POPULAR_TIMES] = most_popular_times_to_string(place[Fields.MOST_POPULAR_TIMES])
-
-            elif field == Fields.ORDER_ONLINE_LINKS:
-                # Concatenating online links
-                links = '\n'.join([link['link'] for link in place['order_online_links']])
-                transformed_place[Fields.ORDER_ONLINE_LINKS] = links
-
-            elif field == Fields.RESERVATIONS:
-                # Concatenating reservation links
-                links = '\n'.join([link['link'] for link in place['reservations']])
-                transformed_place[Fields.RESERVATIONS] = links
-
-            elif field == Fields.OWNER:
-                # Adding owner name and profile link
-                transformed_place['owner_name'] = place['owner']['name']
-                transformed_place['owner_profile_link'] = place['owner']['link']
-
-            elif field == Fields.EMAILS:
-                emails = [email["value"] for email in place.get("emails", [])]
-                emails_with_sources = [f"{email['value']}: {len(email['sources'])}" for email in place.get("emails", [])]
-                transformed_place[Fields.EMAILS] = ", ".join(emails)
-                transformed_place["emails_with_number_of_sources"] = "\n".join(emails_with_sources)
-
-            elif field == Fields.PHONES:
-                phones = [phone["value"] for phone in place.get("phones", [])]
-                phones_with_sources = [f"{phone['value']}: {len(phone['sources'])}" for phone in place.get("phones", [])]
-                transformed_place[Fields.PHONES] = ", ".join(phones)
-                transformed_place["phones_with_number_of_sources"] = "\n".join(phones_with_sources)
-
-            elif field == Fields.CATEGORIES:
-                # Concatenating categories
-                categories = ', '.join(place[Fields.CATEGORIES] or [])
-                transformed_place[Fields.CATEGORIES] = categories
-            elif field == Fields.REVIEW_KEYWORDS:
-                # Concatenating review_keywords
-                review_keywords = ', '.join([kw['keyword'] for kw in place[Fields.REVIEW_KEYWORDS]])
-                transformed_place[Fields.REVIEW_KEYWORDS] = review_keywords
-
-            elif field == Fields.COORDINATES:
-                # Formatting coordinates
-                coords = f"{place[Fields.COORDINATES]['latitude']},{place[Fields.COORDINATES]['longitude']}"
-                transformed_place[Fields.COORDINATES] = coords
-
-            elif field == Fields.CLOSED_ON:
-                if isinstance(place[Fields.CLOSED_ON], list):
-                    transformed_place[Fields.CLOSED_ON] = ', '.join(place[Fields.CLOSED_ON])
-                else:
-                    transformed_place[Fields.CLOSED_ON] = place[Fields.CLOSED_ON]
-
-            elif field == Fields.HOURS:
-                # Formatting hours
-                hours = '\n'.join([f"{day['day']}: {', '.join(day['times'])}" for day in place['hours']])
-                transformed_place[Fields.HOURS] = unicode_to_ascii(hours)
-
-            elif field == Fields.DETAILED_ADDRESS:
-                # Adding detailed address
-                address = place.get(Fields.DETAILED_ADDRESS, {})
-                for key in address.keys():
-                    transformed_place[f'address_{key}'] = address.get(key)
-
-            elif field == Fields.ABOUT:
-                # Add transformed about data
-                transformed_about = transform_about(place[Fields.ABOUT])
-                transformed_place.update(transformed_about)
-            elif field == Fields.STATUS:
-                transformed_place[Fields.STATUS] = place[Fields.STATUS]
-
-            elif field in [Fields.DETAILED_REVIEWS, Fields.IMAGES, Fields.FEATURED_REVIEWS]:
-                pass  
+def transform_place(place, fields):
+    transformed_place = {}
+
+    for field in fields:
+        if field == Fields.REVIEWS_PER_RATING:
+            # Transforming reviews_per_rating
+            for key, value in place['reviews_per_rating'].items():
+                transformed_place[f'reviews_per_rating_{key}'] = value
+
+        elif field == Fields.MENU:
+            # Adding menu link
+            transformed_place['menu_link'] = place['menu']['link'] if 'menu' in place and 'link' in place['menu'] else None
+
+        elif field == Fields.FEATURED_QUESTION:
+            transformed_place[Fields.FEATURED_QUESTION] = featured_question_to_string(place[Fields.FEATURED_QUESTION])
+
+        elif field == Fields.COMPETITORS:
+            transformed_place[Fields.COMPETITORS] = competitors_to_string(place[Fields.COMPETITORS])
+
+        elif field == Fields.POPULAR_TIMES:
+            transformed_place[Fields.POPULAR_TIMES] = popular_times_to_string(place[Fields.POPULAR_TIMES])
+
+        elif field == Fields.MOST_POPULAR_TIMES:
+            transformed_place[Fields.MOST_POPULAR_TIMES] = most_popular_times_to_string(place[Fields.MOST_POPULAR_TIMES])
+
+        elif field == Fields.ORDER_ONLINE_LINKS:
+            # Concatenating online links
+            links = '\n'.join([link['link'] for link in place['order_online_links']])
+            transformed_place[Fields.ORDER_ONLINE_LINKS] = links
+
+        elif field == Fields.RESERVATIONS:
+            # Concatenating reservation links
+            links = '\n'.join([link['link'] for link in place['reservations']])
+            transformed_place[Fields.RESERVATIONS] = links
+
+        elif field == Fields.OWNER:
+            # Adding owner name and profile link
+            transformed_place['owner_name'] = place['owner']['name']
+            transformed_place['owner_profile_link'] = place['owner']['link']
+
+        elif field == Fields.EMAILS:
+            emails = [email["value"] for email in place.get("emails", [])]
+            emails_with_sources = [f"{email['value']}: {len(email['sources'])}" for email in place.get("emails", [])]
+            transformed_place[Fields.EMAILS] = ", ".join(emails)
+            transformed_place["emails_with_number_of_sources"] = "\n".join(emails_with_sources)
+
+        elif field == Fields.PHONES:
+            phones = [phone["value"] for phone in place.get("phones", [])]
+            phones_with_sources = [f"{phone['value']}: {len(phone['sources'])}" for phone in place.get("phones", [])]
+            transformed_place[Fields.PHONES] = ", ".join(phones)
+            transformed_place["phones_with_number_of_sources"] = "\n".join(phones_with_sources)
+
+        elif field == Fields.CATEGORIES:
+            # Concatenating categories
+            categories = ', '.join(place[Fields.CATEGORIES] or [])
+            transformed_place[Fields.CATEGORIES] = categories
+        elif field == Fields.REVIEW_KEYWORDS:
+            # Concatenating review_keywords
+            review_keywords = ', '.join([kw['keyword'] for kw in place[Fields.REVIEW_KEYWORDS]])
+            transformed_place[Fields.REVIEW_KEYWORDS] = review_keywords
+
+        elif field == Fields.COORDINATES:
+            # Formatting coordinates
+            coords = f"{place[Fields.COORDINATES]['latitude']},{place[Fields.COORDINATES]['longitude']}"
+            transformed_place[Fields.COORDINATES] = coords
+
+        elif field == Fields.CLOSED_ON:
+            if isinstance(place[Fields.CLOSED_ON], list):
+                transformed_place[Fields.CLOSED_ON] = ', '.join(place[Fields.CLOSED_ON])
             else:
-                # Adding other fields directly
-                if field in place:
-                    transformed_place[field] = place[field]
-
-        transformed_places.append(transformed_place)
-
-    return transformed_places
+                transformed_place[Fields.CLOSED_ON] = place[Fields.CLOSED_ON]
+
+        elif field == Fields.HOURS:
+            # Formatting hours
+            hours = '\n'.join([f"{day['day']}: {', '.join(day['times'])}" for day in place['hours']])
+            transformed_place[Fields.HOURS] = unicode_to_ascii(hours)
+
+        elif field == Fields.DETAILED_ADDRESS:
+            # Adding detailed address
+            address = place.get(Fields.DETAILED_ADDRESS, {})
+            for key in address.keys():
+                transformed_place[f'address_{key}'] = address.get(key)
+
+        elif field == Fields.ABOUT:
+            # Add transformed about data
+            transformed_about = transform_about(place[Fields.ABOUT])
+            transformed_place.update(transformed_about)
+        elif field == Fields.STATUS:
+            transformed_place[Fields.STATUS] = place[Fields.STATUS]
+
+        elif field in [Fields.DETAILED_REVIEWS, Fields.IMAGES, Fields.FEATURED_REVIEWS]:
+            pass  
+        else:
+            # Adding other fields directly
+            if field in place:
+                transformed_place[field] = place[field]
+
+    return transformed_place
 
-def create_places_csv(path, places, fields):
-    data = transform_places(places, fields)
-    bt.write_csv(data, path, False)
+def transform_places(places, fields):
+    return [transform_place(place, fields) for place in places]
 
 def can_create_detailed_reviews_csv(fields):
     return Fields.DETAILED_REVIEWS in fields
 
-def transform_detailed_reviews(places):
-    # Initialize an empty list to hold the transformed reviews
-    transformed_reviews = []
-
-    # Iterate over each place in the places dictionary
-    for place in places:
-        # Extract the place_id and name
-        place_id = place[Fields.PLACE_ID]
-        place_name = place['name']
-
-        for review in place[Fields.DETAILED_REVIEWS]:
-                # Create a dictionary to store the transformed review data
-                transformed_review = {
-                    Fields.PLACE_ID: place_id,
-                    'place_name': place_name,
-                    **review, 
+def detailed_review_rows(place):
+    # Extract the place_id and name
+    place_id = place[Fields.PLACE_ID]
+    place_name = place['name']
 
-                }
+    for review in place[Fields.DETAILED_REVIEWS]:
+        yield {
+            Fields.PLACE_ID: place_id,
+            'place_name': place_name,
+            **review, 
+        }
 
-                # Add the transformed review to the list
-                transformed_reviews.append(transformed_review)
-
-    # Return the list of transformed reviews
-    return transformed_reviews
-
-
-def create_detailed_reviews_csv(path, places, fields):
-    data = transform_detailed_reviews(places)
-    bt.write_csv(data, path , False)
+def transform_detailed_reviews(places):
+    return [row for place in places for row in detailed_review_rows(place)]
 
 def can_create_email_phone_details_csv(fields):
     return Fields.EMAILS in fields or Fields.PHONES in fields
 
+def email_phone_details_rows(place):
+    place_id = place.get(Fields.PLACE_ID)
+    name = place.get(Fields.NAME)
+
+    # Process emails
+    for email in place.get(Fields.EMAILS, []):
+        yield {
+            Fields.PLACE_ID: place_id,
+            'place_name': name,
+            'type': 'email',
+            'value': email.get('value'),
+            'number_of_sources': len(email.get('sources', [])),
+            'sources': '\n'.join(email.get('sources', []))
+        }
+
+    # Process phone numbers
+    for phone in place.get(Fields.PHONES, []):
+        yield {
+            Fields.PLACE_ID: place_id,
+            'place_name': name,
+            'type': 'phone',
+            'value': phone.get('value'),
+            'number_of_sources': len(phone.get('sources', [])),
+            'sources': '\n'.join(phone.get('sources', []))
+        }
+
 def transform_email_phone_details_csv(places):
-    contact_details = []
-
-    for place in places:
-        place_id = place.get(Fields.PLACE_ID)
-        name = place.get(Fields.NAME)
-
-        # Process emails
-        for email in place.get(Fields.EMAILS, []):
-            email_entry = {
-                Fields.PLACE_ID: place_id,
-                'place_name': name,
-                'type': 'email',
-                'value': email.get('value'),
-                'number_of_sources': len(email.get('sources', [])),
-                'sources': '\n'.join(email.get('sources', []))
-            }
-            contact_details.append(email_entry)
-
-        # Process phone numbers
-        for phone in place.get(Fields.PHONES, []):
-            phone_entry = {
-                Fields.PLACE_ID: place_id,
-                'place_name': name,
-                'type': 'phone',
-                'value': phone.get('value'),
-                'number_of_sources': len(phone.get('sources', [])),
-                'sources': '\n'.join(phone.get('sources', []))
-            }
-            contact_details.append(phone_entry)
-
-    return contact_details
-
-def create_email_phone_details_csv(path, places, fields):
-    data = transform_email_phone_details_csv(places)
-    bt.write_csv(data, path, False)
+    return [row for place in places for row in email_phone_details_rows(place)]
 
 def can_create_featured_reviews_csv(fields):
     return Fields.FEATURED_REVIEWS in fields
 
-def transform_featured_reviews_csv(places):
-    # Initialize an empty list to hold the transformed reviews
-    transformed_reviews = []
-
-    # Iterate over each place in the places dictionary
-    for place in places:
-        # Extract the place_id and name
-        place_id = place['place_id']
-        place_name = place['name']
-
-        for review in place[Fields.FEATURED_REVIEWS]:
-                # Create a dictionary to store the transformed review data
-                transformed_review = {
-                    'place_id': place_id,
-                    'place_name': place_name,
-                    **review, 
+def featured_review_rows(place):
+    place_id = place['place_id']
+    place_name = place['name']
 
-                }
+    for review in place[Fields.FEATURED_REVIEWS]:
+        yield {
+            'place_id': place_id,
+            'place_name': place_name,
+            **review, 
+        }
 
-                # Add the transformed review to the list
-                transformed_reviews.append(transformed_review)
-
-    # Return the list of transformed reviews
-    return transformed_reviews
-
-def create_featured_reviews_csv(path, places, fields):
-    data = transform_featured_reviews_csv(places)
-    bt.write_csv(data, path, False)
+def transform_featured_reviews_csv(places):
+    return [row for place in places for row in featured_review_rows(place)]
 
 def can_create_images_csv(fields):
     return Fields.IMAGES in fields
 
-def transform_images_csv(places, fields):
-    # Initialize an empty list to hold the transformed reviews
-    transformed = []
-
-    # Iterate over each place in the places dictionary
-    for place in places:
-        # Extract the place_id and name
-        place_id = place['place_id']
-        place_name = place['name']
-
-        for review in place[Fields.IMAGES]:
-                # Create a dictionary to store the transformed review data
-                transformed_review = {
-                    'place_id': place_id,
-                    'place_name': place_name,
-                    **review, 
-
-                }
-
-                # Add the transformed review to the list
-                transformed.append(transformed_review)
+def image_rows(place):
+    place_id = place['place_id']
+    place_name = place['name']
 
-    # Return the list of transformed reviews
-    return transformed
+    for image in place[Fields.IMAGES]:
+        yield {
+            'place_id': place_id,
+            'place_name': place_name,
+            **image, 
+        }
 
-def create_images_csv(path, places, fields):
-    data = transform_images_csv(places, fields)
-    bt.write_csv(data, path , False)
+def transform_images_csv(places, fields):
+    return [row for place in places for row in image_rows(place)]
 
 # def can_create_hours_csv(fields):
 #     return Fields.HOURS in fields
@@ -373,77 +356,379 @@ def create_images_csv(path, places, fields):
 # def transform_hours_csv(places, fields):
 #     pass
 
-# def create_hours_csv(path, places, fields):
-#     data = transform_hours_csv(places, fields)
-#     bt.write_csv(data, path)
-
 
 def transform_places_json(places, fields):
     new_results = [sort_dict_by_keys(x, fields) for x in places]
     return new_results
 
-def create_places_json(path, places, fields):
-    data = transform_places_json(places, fields)
-    bt.write_json(data, path, False )
+
+def remove_output(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def open_output(path, newline=None):
+    while True:
+        try:
+            return open(path, 'w', newline=newline, encoding='utf-8')
+        except PermissionError:
+            prompt(f"{path} is currently open in another application (e.g., Excel). Please close the the Application and press 'Enter' to save.")
+
+
+class CsvSink:
+    """
+    Writes rows the way bt.write_csv does, without holding them in memory.
+
+    The header is the union of the keys of all rows, so rows are spooled to a temporary file
+    while the header is collected and the CSV is written when the sink is closed.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.fieldnames = {}
+        self.spool = tempfile.TemporaryFile()
+        # The CSV at path is only replaced once the sink is closed
+        self.writing = False
+
+    def write(self, row):
+        # Nested values are written as JSON, like bt.write_csv does
+        row = {key: dumps(value) if isinstance(value, (dict, list, tuple, set)) else value for key, value in row.items()}
+        for key in row:
+            if key not in self.fieldnames:
+                self.fieldnames[key] = None
+        pickle.dump(row, self.spool, pickle.HIGHEST_PROTOCOL)
+
+    def rows(self):
+        self.spool.seek(0)
+        while True:
+            try:
+                yield pickle.load(self.spool)
+            except EOFError:
+                return
+
+    def close(self):
+        self.writing = True
+        with open_output(self.path, newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=list(self.fieldnames))
+            writer.writeheader()
+            writer.writerows(self.rows())
+        self.spool.close()
+
+    def abort(self):
+        self.spool.close()
+        if self.writing:
+            remove_output(self.path)
+
+
+class JsonArraySink:
+    """Writes items to a JSON array one at a time, formatted like bt.write_json"""
+    def __init__(self, path):
+        self.path = path
+        self.file = open_output(path)
+        self.count = 0
+
+    def write(self, item):
+        self.file.write("[\n" if self.count == 0 else ",\n")
+        # Indented one level deeper than json.dump indents a whole list
+        self.file.write("    " + dumps(item, indent=4).replace("\n", "\n    "))
+        self.count += 1
+
+    def close(self):
+        self.file.write("\n]" if self.count else "[]")
+        self.file.close()
+
+    def abort(self):
+        self.file.close()
+        remove_output(self.path)
+
+
+def to_string(value):
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list, tuple, set)):
+        return dumps(value)
+    return str(value)
+
+def to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def to_bool(value):
+    return None if value is None else bool(value)
+
+def to_string_list(value):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return [value]
+    return [to_string(item) for item in value]
+
+
+def get_coordinate(name):
+    def get(place):
+        coordinates = place.get(Fields.COORDINATES)
+        return to_float(coordinates.get(name)) if isinstance(coordinates, dict) else None
+    return get
+
+def parquet_place_columns(fields):
+    """
+    Returns the columns of the places Parquet file as (name, arrow type, function reading the value from a place).
+
+    Coordinates become float latitude and longitude columns and categories a list of strings.
+    Other nested fields are kept as JSON strings, like in the CSV.
+    """
+    typed = {
+        Fields.REVIEWS: (pa.int64(), to_int),
+        Fields.RATING: (pa.float64(), to_float),
+        Fields.IS_SPENDING_ON_ADS: (pa.bool_(), to_bool),
+        Fields.CATEGORIES: (pa.list_(pa.string()), to_string_list),
+    }
+
+    columns = []
+    for field in fields:
+        if field == Fields.DETAILED_REVIEWS:
+            # Written to their own file, keyed by place_id
+            continue
+        if field == Fields.COORDINATES:
+            columns.append(("latitude", pa.float64(), get_coordinate("latitude")))
+            columns.append(("longitude", pa.float64(), get_coordinate("longitude")))
+            continue
+        arrow_type, convert = typed.get(field, (pa.string(), to_string))
+        columns.append((field, arrow_type, lambda place, field=field, convert=convert: convert(place.get(field))))
+    return columns
+
+def parquet_review_columns():
+    """Returns the columns of the detailed reviews Parquet file, as produced by scraper.process_reviews"""
+    typed = [
+        ("review_id", pa.string(), to_string),
+        ("reviewer_name", pa.string(), to_string),
+        ("rating", pa.int64(), to_int),
+        ("review_text", pa.string(), to_string),
+        ("published_at", pa.string(), to_string),
+        ("published_at_date", pa.string(), to_string),
+        ("response_from_owner_text", pa.string(), to_string),
+        ("response_from_owner_ago", pa.string(), to_string),
+        ("response_from_owner_date", pa.string(), to_string),
+        ("review_likes_count", pa.int64(), to_int),
+        ("total_number_of_reviews_by_reviewer", pa.int64(), to_int),
+        ("total_number_of_photos_by_reviewer", pa.int64(), to_int),
+        ("reviewer_url", pa.string(), to_string),
+        ("is_local_guide", pa.bool_(), to_bool),
+        ("review_translated_text", pa.string(), to_string),
+        ("response_from_owner_translated_text", pa.string(), to_string),
+    ]
+    columns = [(Fields.PLACE_ID, pa.string(), lambda review: to_string(review.get(Fields.PLACE_ID)))]
+    for name, arrow_type, convert in typed:
+        columns.append((name, arrow_type, lambda review, name=name, convert=convert: convert(review.get(name))))
+    return columns
+
+
+class ParquetSink:
+    """Writes rows to a Parquet file with a fixed schema, one row group every batch_size rows"""
+    def __init__(self, path, columns, batch_size=PARQUET_BATCH_SIZE):
+        self.path = path
+        self.columns = columns
+        self.batch_size = batch_size
+        self.schema = pa.schema([(name, arrow_type) for name, arrow_type, _ in columns])
+        self.writer = pq.ParquetWriter(path, self.schema)
+        self.batch = [[] for _ in columns]
+        self.pending = 0
+
+    def write(self, row):
+        for values, (_, _, get) in zip(self.batch, self.columns):
+            values.append(get(row))
+        self.pending += 1
+        if self.pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.writer.write_batch(pa.record_batch(self.batch, schema=self.schema))
+            self.batch = [[] for _ in self.columns]
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.writer.close()
+
+    def abort(self):
+        try:
+            self.writer.close()
+        except Exception:
+            # The file is removed anyway
+            pass
+        remove_output(self.path)
+
+
+get_latitude = get_coordinate("latitude")
+get_longitude = get_coordinate("longitude")
+
+def get_point(place):
+    longitude, latitude = get_longitude(place), get_latitude(place)
+    if longitude is None or latitude is None:
+        return None
+    return longitude, latitude
+
+def point_wkb(longitude, latitude):
+    # Little endian WKB Point
+    return struct.pack("<BIdd", 1, 1, longitude, latitude)
+
+class GeoParquetSink(ParquetSink):
+    """
+    Writes places as GeoParquet 1.1, with a WKB point geometry column in EPSG:4326 and a bbox covering column,
+    so geopandas.read_parquet loads a GeoDataFrame without parsing coordinates and can skip row groups with bbox=.
+    """
+    def __init__(self, path, columns, batch_size=PARQUET_BATCH_SIZE):
+        self.bbox = None
+        bbox_type = pa.struct([(name, pa.float64()) for name in ["xmin", "ymin", "xmax", "ymax"]])
+        columns = columns + [
+            ("geometry", pa.binary(), self.get_geometry),
+            ("bbox", bbox_type, self.get_bbox),
+        ]
+        super().__init__(path, columns, batch_size)
+
+    def get_geometry(self, place):
+        point = get_point(place)
+        if point is None:
+            return None
+
+        longitude, latitude = point
+
+        if self.bbox is None:
+            self.bbox = [longitude, latitude, longitude, latitude]
+        else:
+            self.bbox = [min(self.bbox[0], longitude), min(self.bbox[1], latitude), max(self.bbox[2], longitude), max(self.bbox[3], latitude)]
+        return point_wkb(longitude, latitude)
+
+    def get_bbox(self, place):
+        point = get_point(place)
+        if point is None:
+            return None
+
+        longitude, latitude = point
+        return {"xmin": longitude, "ymin": latitude, "xmax": longitude, "ymax": latitude}
+
+    def geo_metadata(self):
+        geometry = {
+            "encoding": "WKB",
+            "geometry_types": ["Point"],
+            "crs": WGS84_PROJJSON,
+            "covering": {"bbox": {key: ["bbox", key] for key in ["xmin", "ymin", "xmax", "ymax"]}},
+        }
+        if self.bbox is not None:
+            geometry["bbox"] = self.bbox
+        return {"version": "1.1.0", "primary_column": "geometry", "columns": {"geometry": geometry}}
+
+    def close(self):
+        self.flush()
+        # The bbox of the file is only known once every place is written, and the footer is written last
+        self.writer.add_key_value_metadata({"geo": dumps(self.geo_metadata())})
+        self.writer.close()
 
 
 def format(query_kebab, type, name):
     return f"{name}-of-{query_kebab}.{type}"
 
-def create(places, selected_fields, csv_path, json_path, query_kebab):
-        
-    # try:
-        written = []
+def abort_sinks(sinks):
+    """Closes sinks without finishing them and removes what they wrote, so a failed write leaves no truncated outputs"""
+    for _, sink, _ in sinks:
+        sink.abort()
+
+def create_sinks(selected_fields, output_path, query_kebab, output_formats):
+    """Returns the enabled outputs as (path, sink, function turning a place into its rows)"""
+    sinks = []
+    try:
+        add_sinks(sinks, selected_fields, output_path, query_kebab, output_formats)
+    except BaseException:
+        abort_sinks(sinks)
+        raise
+    return sinks
+
+def add_sinks(sinks, selected_fields, output_path, query_kebab, output_formats):
+    json_path = output_path + "json/"
+    csv_path = output_path + "csv/"
+    parquet_path = output_path + "parquet/"
+
+    if OUTPUT_JSON in output_formats:
         places_json = json_path + format(query_kebab, "json", "places") 
-        create_places_json(places_json, places, selected_fields)
-
-        if can_create_places_csv(selected_fields):
-            places_path_csv = csv_path + format(query_kebab, "csv", "places") 
-            written.append(places_path_csv)
-            create_places_csv(places_path_csv, places, selected_fields)
+        sinks.append((places_json, JsonArraySink(places_json), lambda place: [sort_dict_by_keys(place, selected_fields)]))
 
-        
-        if can_create_email_phone_details_csv(selected_fields):
-            email_phone_details_path = csv_path  + format(query_kebab, "csv", "email-phone-details") 
-            # ".csv"
-            written.append(email_phone_details_path)
-            create_email_phone_details_csv(email_phone_details_path, places, selected_fields)
+    if OUTPUT_PARQUET in output_formats:
+        places_parquet = parquet_path + format(query_kebab, "parquet", "places")
+        sinks.append((places_parquet, ParquetSink(places_parquet, parquet_place_columns(selected_fields)), lambda place: [place]))
 
         if can_create_detailed_reviews_csv(selected_fields):
-            detailed_reviews_path = csv_path + format(query_kebab, "csv", "detailed-reviews") 
-            # "detailed-reviews.csv"
-            written.append(detailed_reviews_path)
-            create_detailed_reviews_csv(detailed_reviews_path, places, selected_fields)
-        
-        if can_create_featured_reviews_csv(selected_fields):
-            new_var1 = csv_path  + format(query_kebab, "csv", "featured-reviews") 
-            # + "featured-reviews.csv"
-            written.append(new_var1)
-            create_featured_reviews_csv(new_var1, places, selected_fields)
-        
-        if can_create_images_csv(selected_fields):
-            new_var = csv_path + format(query_kebab, "csv", "images") 
-            # + "images.csv"
-            written.append(new_var)
-            create_images_csv(new_var, places, selected_fields)
-
-        written.append(places_json)
-
-        print_filenames(written)
-
-    # except PermissionError:
-    #   bt.prompt("The file is currently open in another application (e.g., Excel). Please close the file and then press 'Enter' to save.")
-    #   create(places, selected_fields, csv_path, json_path)
-    
-def write_output(query, places, selected_fields):
+            detailed_reviews_parquet = parquet_path + format(query_kebab, "parquet", "detailed-reviews")
+            sinks.append((detailed_reviews_parquet, ParquetSink(detailed_reviews_parquet, parquet_review_columns()), detailed_review_rows))
+
+    if OUTPUT_GEOPARQUET in output_formats:
+        places_geoparquet = output_path + "geoparquet/" + format(query_kebab, "parquet", "places")
+        # The latitude and longitude columns are written even when coordinates are not among the fields
+        geo_fields = selected_fields if Fields.COORDINATES in selected_fields else selected_fields + [Fields.COORDINATES]
+        sinks.append((places_geoparquet, GeoParquetSink(places_geoparquet, parquet_place_columns(geo_fields)), lambda place: [place]))
+
+    if OUTPUT_CSV not in output_formats:
+        return
+
+    if can_create_places_csv(selected_fields):
+        places_path_csv = csv_path + format(query_kebab, "csv", "places") 
+        sinks.append((places_path_csv, CsvSink(places_path_csv), lambda place: [transform_place(place, selected_fields)]))
+
+    if can_create_email_phone_details_csv(selected_fields):
+        email_phone_details_path = csv_path  + format(query_kebab, "csv", "email-phone-details") 
+        sinks.append((email_phone_details_path, CsvSink(email_phone_details_path), email_phone_details_rows))
+
+    if can_create_detailed_reviews_csv(selected_fields):
+        detailed_reviews_path = csv_path + format(query_kebab, "csv", "detailed-reviews") 
+        sinks.append((detailed_reviews_path, CsvSink(detailed_reviews_path), detailed_review_rows))
+
+    if can_create_featured_reviews_csv(selected_fields):
+        featured_reviews_path = csv_path  + format(query_kebab, "csv", "featured-reviews") 
+        sinks.append((featured_reviews_path, CsvSink(featured_reviews_path), featured_review_rows))
+
+    if can_create_images_csv(selected_fields):
+        images_path = csv_path + format(query_kebab, "csv", "images") 
+        sinks.append((images_path, CsvSink(images_path), image_rows))
+
+def create(places, selected_fields, output_path, query_kebab, output_formats=DEFAULT_OUTPUT_FORMATS):
+    """Iterates places once, fanning the rows of each place out to every enabled output"""
+    sinks = create_sinks(selected_fields, output_path, query_kebab, output_formats)
+
+    try:
+        for place in places:
+            if not isinstance(place, dict):
+                continue
+            for _, sink, to_rows in sinks:
+                for row in to_rows(place):
+                    sink.write(row)
+    except BaseException:
+        abort_sinks(sinks)
+        raise
+
+    for index, (_, sink, _) in enumerate(sinks):
+        try:
+            sink.close()
+        except BaseException:
+            abort_sinks(sinks[index:])
+            raise
+
+    # Places JSON is listed last
+    written = sorted((path for path, _, _ in sinks), key=lambda path: path.endswith(".json"))
+    print_filenames(written)
     
+def write_output(query, places, selected_fields, output_formats=DEFAULT_OUTPUT_FORMATS):
+    if (OUTPUT_PARQUET in output_formats or OUTPUT_GEOPARQUET in output_formats) and pa is None:
+        raise ImportError("Writing Parquet output needs pyarrow. Install it with: python -m pip install pyarrow")
 
     query_kebab = kebab_case(query)
-    make_folders(query_kebab)
-
-    csv_path = f"output/{query_kebab}/csv/" 
-    json_path = f"output/{query_kebab}/json/"
-    # + query_kebab + "-"
-
+    make_folders(query_kebab, output_formats)
 
-    create(places, selected_fields, csv_path, json_path, query_kebab)
+    output_path = f"output/{query_kebab}/"
+    create(places, selected_fields, output_path, query_kebab, output_formats)
@@ -6,10 +6,12 @@ from io import StringIO
 
 
 class GeoCleaner:
-    def __init__(self, file):
+    def __init__(self, file, bbox=None):
         self # Capture the output of df.info()
         self.info_buffer = StringIO()
         self.file = file
+        # (minx, miny, maxx, maxy) in longitude and latitude, only used when loading GeoParquet
+        self.bbox = bbox
         self.df = None
         self.regions_level2 = gpd.read_file("../france_boundary/gadm36_FRA_2.shp")
         self.logger = self.setup_logger()
@@ -59,9 +61,21 @@ class GeoCleaner:
     
     def load_data(self):
         self.logger.info("Loading data...")
-        self.df = pd.read_csv(self.file)
+        if self.file.endswith(".parquet"):
+            # GeoParquet written by the scraper already has typed coordinates and a point geometry in EPSG:4326
+            self.df = gpd.read_parquet(self.file, bbox=self.bbox) if self.bbox else gpd.read_parquet(self.file)
+            # The bbox covering column only serves bbox= filtering, and its dict cells can't be hashed
+            self.df = self.df.drop(columns=["bbox"], errors="ignore")
+        else:
+            self.df = pd.read_csv(self.file)
         self.logger.info(f"Data loaded successfully from {self.file}")
 
+    def has_geometry(self):
+        return isinstance(self.df, gpd.GeoDataFrame)
+
+    def location_columns(self):
+        return ['latitude', 'longitude'] if self.has_geometry() else ['coordinates']
+
     def check_data(self):
         self.logger.info("Checking data...")
         self.logger.info(f"Unique main categories:\n{self.df['main_category'].unique()}")
@@ -85,7 +99,9 @@ class GeoCleaner:
         #self.df = self.df.drop(columns=columns_remove)
         # keep only the columns we need
         #self.df = self.df.loc[:, ["name", "competitors", "website", "main_category", "categories", "phone", "address", "coordinates","link"]].copy()
-        desired_columns = ["name", "website", "main_category", "categories", "phone", "address", "coordinates","link"]
+        desired_columns = ["name", "website", "main_category", "categories", "phone", "address", *self.location_columns(),"link"]
+        if self.has_geometry():
+            desired_columns.append("geometry")
         self.df = self.df[desired_columns]
         self.logger.info("Unwanted columns removed.")
         removed_columns = initial_columns - len(self.df.columns)
@@ -94,15 +110,16 @@ class GeoCleaner:
     def remove_null_and_duplicates(self):
         initial_rows = len(self.df)
         self.logger.info("Removing null values and duplicates...")
-        self.df = self.df.dropna(subset=['coordinates'])
-        self.df = self.df.drop_duplicates(subset=['coordinates'])
+        self.df = self.df.dropna(subset=self.location_columns())
+        self.df = self.df.drop_duplicates(subset=self.location_columns())
         self.logger.info("Null values and duplicates removed.")
         removed_rows = initial_rows - len(self.df)
         self.logger.info(f"Removed {removed_rows} rows with null or duplicate values")
     
     def format_main_categories(self):
         self.logger.info("Formating main categories...")
-        self.df[['latitude','longitude']] = self.df['coordinates'].str.split(',', expand=True)
+        if not self.has_geometry():
+            self.df[['latitude','longitude']] = self.df['coordinates'].str.split(',', expand=True)
         self.df['main_category'] = self.df['main_category'].map(self.translations).fillna(self.df['main_category'])
         self.logger.info("Main categories formated.")
 
@@ -110,9 +127,11 @@ class GeoCleaner:
         self.logger.info("Formating categories...")
         def translate_categories(category_list):
             translated_list = []
-            if isinstance(category_list, float) and np.isnan(category_list):
+            if category_list is None or (isinstance(category_list, float) and np.isnan(category_list)):
                 return translated_list
-            for category in category_list.split(", "):
+            # Categories are a list in GeoParquet and a comma separated string in the CSV
+            categories = category_list.split(", ") if isinstance(category_list, str) else category_list
+            for category in categories:
                 if category in self.translations:
                     translated_list.append(self.translations[category])
                 else:
@@ -244,6 +263,9 @@ class GeoCleaner:
         self.logger.info("Animal type added.")
         
     def transform_gpd(self):
+        if self.has_geometry():
+            self.logger.info(f"Data is already a GeoDataFrame with CRS: {self.df.crs.to_epsg()}")
+            return
         self.logger.info("Converting the DataFrame to a GeoDataFrame...")
          # Convert the DataFrame to a GeoDataFrame
         self.df = gpd.GeoDataFrame(self.df, geometry=gpd.points_from_xy(self.df.longitude, self.df.latitude))
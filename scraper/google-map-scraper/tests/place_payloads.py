@@ -0,0 +1,49 @@
+"""Random payloads shaped like the place of a place page, for comparing decoders and extractors"""
+import json
+
+from src.extract_data import PLACE_PATHS
+
+STRINGS = ["", "Café ]\"[,", "a\\\\b", "日本語", "line\nbreak", ")]}'", "0x1:0x2"]
+
+
+def random_value(rng, depth=0):
+    kind = rng.random()
+    if depth > 3 or kind < 0.3:
+        return rng.choice([None, True, False, rng.randint(-10, 10), 2 ** 70, rng.uniform(-90, 90), rng.choice(STRINGS)])
+    if kind < 0.4:
+        return {rng.choice(STRINGS): random_value(rng, depth + 1)}
+    return [random_value(rng, depth + 1) for _ in range(rng.randint(0, 4))]
+
+
+def set_path(node, path, value, rng):
+    for index, key in enumerate(path):
+        while len(node) <= key:
+            node.append(random_value(rng, 3) if rng.random() < 0.2 else None)
+        if index == len(path) - 1:
+            node[key] = value
+        else:
+            if not isinstance(node[key], list):
+                node[key] = []
+            node = node[key]
+
+
+def random_place(rng):
+    """Nested lists shaped like a place payload, with some paths present, some cut short and some missing"""
+    data = []
+    for path in PLACE_PATHS.values():
+        if rng.random() < 0.7:
+            set_path(data, path, random_value(rng), rng)
+    for _ in range(rng.randint(0, 5)):
+        # Values where a deeper path expects a list
+        path = rng.choice(list(PLACE_PATHS.values()))
+        cut = rng.randint(1, len(path))
+        set_path(data, path[:cut], rng.choice([None, "text", 7, {}]), rng)
+    return data
+
+
+def create_state(payload, rng):
+    state = [[random_value(rng) for _ in range(3)] for _ in range(3)]
+    state.append([random_value(rng) for _ in range(6)] + [")]}'\n" + json.dumps(payload)])
+    state += [random_value(rng) for _ in range(rng.randint(0, 3))]
+    # Whitespace between elements, as some pages have it
+    return json.dumps(state, indent=rng.choice([None, 1]), ensure_ascii=rng.random() < 0.5)
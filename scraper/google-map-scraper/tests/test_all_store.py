@@ -0,0 +1,61 @@
+import json
+import random
+import pytest
+from src import all_store
+from src.all_store import AllStore, SORT_HEADER
+from src.sort_filter import sort_places
+from tests.test_sort_filter import SORTS, random_place
+
+
+def append_chunks(store, sort, seed=0, n_chunks=10):
+    rng = random.Random(seed)
+    chunks = []
+    for index in range(n_chunks):
+        places = [random_place(rng, f"{index}-{n}", blanks=False) for n in range(rng.randint(0, 30))]
+        store.append(index, f"query {index}", places, sort)
+        chunks.append(places)
+    return chunks
+
+
+def ids(places):
+    return [place["place_id"] for place in places]
+
+
+@pytest.mark.parametrize("sort", SORTS)
+def test_merged_matches_sort_places_over_all_chunks(sort, tmp_path, monkeypatch):
+    # Small enough that the chunks are merged in two rounds
+    monkeypatch.setattr(all_store, "MAX_OPEN_CHUNKS", 3)
+    store = AllStore(str(tmp_path))
+    chunks = append_chunks(store, sort)
+
+    assert ids(store.merged(sort)) == ids(sort_places([place for places in chunks for place in places], sort))
+
+
+@pytest.mark.parametrize("sort", SORTS[1:])
+def test_merged_sorts_chunks_written_with_another_spec_again(sort, tmp_path):
+    store = AllStore(str(tmp_path))
+    chunks = append_chunks(store, SORTS[0])
+
+    assert ids(store.merged(sort)) == ids(sort_places([place for places in chunks for place in places], sort))
+    for path in store.chunk_paths():
+        with open(path, encoding="utf-8") as file:
+            assert json.loads(file.readline()) == {SORT_HEADER: json.loads(json.dumps(sort))}
+
+
+def test_load_returns_the_appended_order(tmp_path):
+    store = AllStore(str(tmp_path))
+    chunks = append_chunks(store, SORTS[0])
+
+    for index, places in enumerate(chunks):
+        assert store.load(index, f"query {index}") == places
+
+
+def test_merges_chunks_written_without_a_header(tmp_path):
+    store = AllStore(str(tmp_path))
+    rng = random.Random(3)
+    places = [random_place(rng, n, blanks=False) for n in range(20)]
+    with open(store.chunk_path(0, "query"), "w", encoding="utf-8") as file:
+        for place in places:
+            file.write(json.dumps(place) + "\n")
+
+    assert ids(store.merged(SORTS[0])) == ids(sort_places(places, SORTS[0]))
@@ -0,0 +1,89 @@
+from threading import Thread
+import pytest
+from src import gmaps, scraper
+from src.browser_pool import BrowserPool, DriverPool
+
+
+class Driver:
+    def __init__(self, name):
+        self.name = name
+
+
+def test_drivers_are_leased_by_lang():
+    pool = BrowserPool()
+    idle = pool.idle_drivers
+    places_lang = pool.lang(lambda data: data["lang"])
+    links_lang = pool.lang()
+
+    assert places_lang({"lang": "de"}) == "de"
+    idle.append(Driver("de"))
+    assert links_lang("https://example.com") is None
+    idle.append(Driver("links"))
+
+    assert places_lang({"lang": "fr"}) == "fr"
+    assert len(idle) == 0
+    places_lang({"lang": "de"})
+    assert len(idle) == 1
+    assert idle.pop().name == "de"
+    assert len(idle) == 0
+    with pytest.raises(IndexError):
+        idle.pop()
+
+    links_lang("https://example.com")
+    assert idle.pop().name == "links"
+
+
+def test_selections_are_per_thread():
+    pool = BrowserPool()
+    idle = pool.idle_drivers
+    lang = pool.lang(lambda data: data)
+    lang("de")
+    idle.append(Driver("de"))
+
+    seen = []
+    def lease():
+        lang("en")
+        seen.append(len(idle))
+        idle.append(Driver("en"))
+    thread = Thread(target=lease)
+    thread.start()
+    thread.join()
+
+    assert seen == [0]
+    assert idle.pop().name == "de"
+    lang("en")
+    assert idle.pop().name == "en"
+
+
+def test_an_unselected_pool_is_a_plain_list():
+    idle = DriverPool()
+    idle.select("de")
+    idle.append(Driver("de"))
+    idle.select(None)
+    idle.append(Driver("links"))
+    idle.deselect()
+
+    assert len(idle) == 2
+    assert [driver.name for driver in idle] == ["de", "links"]
+    assert idle.pop().name == "links"
+
+
+def test_share_rejects_tasks_without_a_driver_pool():
+    def task():
+        pass
+
+    with pytest.raises(TypeError):
+        BrowserPool().share(task)
+
+
+def test_drivers_are_quit_when_scraping_links_fails(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    closed = []
+    def fail(data, cache=True):
+        raise RuntimeError("crashed")
+    monkeypatch.setattr(scraper, "scrape_places_by_links", fail)
+    monkeypatch.setattr(scraper.browser_pool, "close", lambda: closed.append(True))
+
+    with pytest.raises(RuntimeError):
+        gmaps.Gmaps.links(["https://www.google.com/maps/place/1"], "links")
+    assert closed == [True]
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+from src import extract_data
+from src.extract_data import FIELD_PATHS, PLACE_PATHS, place_paths, safe_get
+from src.field_paths import FieldPaths
+from tests.place_payloads import random_place
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_trie_extract_matches_safe_get(seed):
+    rng = random.Random(seed)
+    data = random_place(rng)
+    values = place_paths.extract(data)
+
+    for name, path in PLACE_PATHS.items():
+        assert values.get(name) == safe_get(data, *path), name
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_trie_extract_of_some_fields_matches_safe_get(seed):
+    rng = random.Random(seed)
+    data = random_place(rng)
+    fields = rng.sample(list(FIELD_PATHS), rng.randint(1, 6))
+    values = FieldPaths(PLACE_PATHS, FIELD_PATHS).extract(data, fields)
+
+    names = {name for field in fields for name in FIELD_PATHS[field]}
+    assert set(values) <= names
+    for name in names:
+        assert values.get(name) == safe_get(data, *PLACE_PATHS[name]), name
+
+
+# Getters the paths replaced, each takes the whole payload
+GETTERS = {
+    'categories': extract_data.get_categories,
+    'thumbnail': extract_data.get_thumbnail,
+    'place_id': extract_data.get_place_id,
+    'description': extract_data.get_description,
+    'status': extract_data.get_open_state,
+    'plus_code': extract_data.get_plus_code,
+    'time_zone': extract_data.get_time_zone,
+    'rating': extract_data.get_rating,
+    'reviews': extract_data.get_reviews,
+    'phone': extract_data.get_phone,
+    'title': extract_data.get_title,
+    'address': extract_data.get_address,
+    'main_category': extract_data.get_main_category,
+    'cid': extract_data.get_cid,
+    'data_id': extract_data.get_data_id,
+}
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_paths_match_getters(seed):
+    data = random_place(random.Random(seed))
+    values = place_paths.extract(data)
+
+    for name, getter in GETTERS.items():
+        assert values.get(name) == getter(data), name
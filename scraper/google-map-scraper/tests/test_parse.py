@@ -0,0 +1,31 @@
+import json
+import random
+
+import pytest
+
+from src.extract_data import parse, parse_html, parse_legacy
+from tests.place_payloads import create_state, random_place
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_parse_matches_legacy(seed):
+    rng = random.Random(seed)
+    state = create_state(random_place(rng), rng)
+
+    assert parse(state) == parse_legacy(state)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_parse_html_matches_splitting_the_page(seed):
+    rng = random.Random(seed)
+    state = create_state(random_place(rng), rng)
+    html = f"<script>window.x=1;window.APP_INITIALIZATION_STATE={state};window.APP_FLAGS=[1,2]</script>"
+    legacy = parse_legacy(html.split(';window.APP_INITIALIZATION_STATE=')[1].split(';window.APP_FLAGS')[0])
+
+    assert parse_html(html) == legacy
+
+
+def test_parse_falls_back_on_unexpected_layout():
+    # The payload is not a string, so only the legacy decoder's error is left
+    with pytest.raises(Exception):
+        parse(json.dumps([[], [], [], [0, 1, 2, 3, 4, 5, [1]]]))
@@ -0,0 +1,63 @@
+from src import rate_limiter, scraper
+from src.place_registry import PlaceRegistry
+
+
+class RecordingQueue:
+    """Records the batches put in scrape_place"""
+    def __init__(self):
+        self.batches = []
+
+    def put(self, requests):
+        self.batches.append([request["link"] for request in requests])
+
+    def get(self):
+        return [{"link": link} for batch in self.batches for link in batch]
+
+
+def create_queue(monkeypatch, concurrency):
+    monkeypatch.setattr(rate_limiter, "controllers", {})
+    rate_limiter.get_rate_controller("gmaps").configure(concurrency, concurrency)
+    monkeypatch.setattr(scraper, "scrape_place", lambda **kwargs: RecordingQueue())
+    return scraper.PlaceLinkQueue("farms", None)
+
+
+def test_links_are_batched_up_to_the_allowed_concurrency(monkeypatch):
+    link_queue = create_queue(monkeypatch, 4)
+    feed = []
+    for scroll in range(5):
+        # Every scroll reads the whole feed, which grows by 3 links
+        feed = feed + [f"https://maps/place/{scroll}-{n}" for n in range(3)]
+        link_queue.put(feed)
+
+    assert [len(batch) for batch in link_queue.scrape_place_obj.batches] == [6, 6]
+    assert [place["link"] for place in link_queue.get()] == feed
+    assert [len(batch) for batch in link_queue.scrape_place_obj.batches] == [6, 6, 3]
+
+
+def test_batches_grow_with_the_concurrency(monkeypatch):
+    link_queue = create_queue(monkeypatch, 2)
+    link_queue.put(["https://maps/place/1", "https://maps/place/2"])
+    rate_limiter.get_rate_controller("gmaps").configure(4, 4)
+    link_queue.put(["https://maps/place/3", "https://maps/place/4"])
+    link_queue.put(["https://maps/place/5", "https://maps/place/6", "https://maps/place/7"])
+
+    assert [len(batch) for batch in link_queue.scrape_place_obj.batches] == [2, 5]
+
+
+def test_places_another_query_failed_to_fetch_are_fetched_again(monkeypatch):
+    registry = PlaceRegistry()
+    registry.start()
+    monkeypatch.setattr(scraper, "place_registry", registry)
+    owner = create_queue(monkeypatch, 1)
+    owner.query = "cafes"
+    referencing = scraper.PlaceLinkQueue("farms", None)
+
+    links = ["https://maps/place/1", "https://maps/place/2"]
+    owner.put(links)
+    referencing.put(links + ["https://maps/place/3"])
+    # The owner fetched the first place only
+    registry.resolve(links[0], {"link": links[0]})
+    registry.release(owner.query)
+
+    assert [place["link"] for place in referencing.get()] == ["https://maps/place/3", links[0], links[1]]
+    assert referencing.referenced_links == dict.fromkeys(links)
@@ -0,0 +1,152 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from src.async_reviews import AsyncRateLimiter, AsyncReviewsEngine
+from src.reviews_scraper import GoogleMapsAPIScraper
+
+URL = "https://www.google.com/maps/place/Cafe/data=!4m2!3m1!1s0x1:0x2?hl=en"
+
+
+def page(token, count, next_token, reviews=True):
+    nodes = [f"{token or 'first'}-{n}" for n in range(count)] if reviews else None
+    return (f"response of {token}", None, nodes, count, next_token)
+
+
+class ScriptedScraper(GoogleMapsAPIScraper):
+    """Answers each token with the next outcome of its script, a page or an exception to raise"""
+    def __init__(self, script):
+        super().__init__(request_interval=0, n_retries=3, retry_time=0)
+        self.script = {token: list(outcomes) for token, outcomes in script.items()}
+        self.requests = []
+        self.errors = []
+
+    def _answer(self, token):
+        self.requests.append(token)
+        outcome = self.script[token].pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def _get_request(self, feature_id, hl="", sort_by_id=0, token=""):
+        return self._answer(token)
+
+    def _build_query(self, feature_id, hl="", sort_by_id=0, token=""):
+        return token
+
+    def _read_response_text(self, response_text):
+        return self._answer(response_text)
+
+    def _parse_reviews(self, reviews_soup, hl, token):
+        return [{"review_id": node, "token": token} for node in reviews_soup]
+
+    def _handle_place_exception(self, response_text, name, n):
+        self.errors.append((response_text, n))
+
+
+def scrape_both(script, n_reviews, **kwargs):
+    scraper = ScriptedScraper(script)
+    result = scraper.scrape_reviews(URL, n_reviews, **kwargs)
+
+    engine = AsyncReviewsEngine(n_retries=3, retry_time=0)
+    engine.scraper = ScriptedScraper(script)
+
+    async def fetch(query):
+        return query
+    engine._fetch = fetch
+    async_result = asyncio.run(engine.scrape_reviews(URL, n_reviews, **kwargs))
+
+    assert async_result == result
+    assert engine.scraper.requests == scraper.requests
+    assert engine.scraper.errors == scraper.errors
+    return result, scraper
+
+
+def test_follows_tokens_until_a_short_page():
+    script = {"": [page("", 10, "a")], "a": [page("a", 10, "b")], "b": [page("b", 4, "c")]}
+    result, scraper = scrape_both(script, 50)
+
+    assert len(result) == 24
+    assert scraper.requests == ["", "a", "b"]
+
+
+def test_stops_at_n_reviews():
+    script = {"": [page("", 10, "a")], "a": [page("a", 10, "b")]}
+    result, scraper = scrape_both(script, 15)
+
+    assert [review["review_id"] for review in result] == [f"first-{n}" for n in range(10)] + [f"a-{n}" for n in range(5)]
+    assert scraper.requests == ["", "a"]
+
+
+def test_stops_at_known_reviews():
+    script = {"": [page("", 10, "a")], "a": [page("a", 10, "b")]}
+    result, scraper = scrape_both(script, 100, stop_at_review_ids={"a-3"})
+
+    assert len(result) == 13
+    assert scraper.requests == ["", "a"]
+
+
+def test_retries_a_failed_page():
+    script = {"": [ValueError("blocked"), page("", 10, "a")], "a": [page("a", 2, "")]}
+    result, scraper = scrape_both(script, 50)
+
+    assert len(result) == 12
+    assert scraper.requests == ["", "", "a"]
+    assert scraper.errors == [("", 0)]
+
+
+def test_skips_a_page_without_reviews_after_the_last_retry():
+    broken = page("a", 10, "b", reviews=False)
+    script = {"": [page("", 10, "a")], "a": [broken, broken, broken], "b": [page("b", 3, "")]}
+    result, scraper = scrape_both(script, 50)
+
+    assert [review["token"] for review in result] == ["a"] * 10 + [""] * 3
+    assert scraper.errors == [("response of a", 1)] * 3
+
+
+def test_raises_after_the_last_retry():
+    script = {"": [page("", 10, "a")], "a": [ValueError("blocked")] * 3}
+    with pytest.raises(ValueError):
+        ScriptedScraper(script).scrape_reviews(URL, 50)
+
+
+def test_run_fails_clearly_in_a_running_loop():
+    async def run_in_loop():
+        AsyncReviewsEngine().run([])
+
+    with pytest.raises(RuntimeError, match="scrape_all"):
+        asyncio.run(run_in_loop())
+
+
+class UndecodableResponse:
+    status_code = 200
+    content = b"caf\\u00e9"
+
+    @property
+    def text(self):
+        raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+
+    def raise_for_status(self):
+        pass
+
+
+def test_async_pages_are_fetched_and_decoded_like_sync_ones():
+    engine = AsyncReviewsEngine()
+    fetched = []
+    engine.scraper.session = type("Session", (), {"get": lambda self, url: fetched.append(url) or UndecodableResponse()})()
+
+    async def fetch():
+        engine.limiter = AsyncRateLimiter(10)
+        engine.host_semaphores = {}
+        engine.executor = ThreadPoolExecutor(max_workers=1)
+        try:
+            return await engine._fetch("https://www.google.com/async/reviewSort")
+        finally:
+            engine.executor.shutdown()
+
+    assert asyncio.run(fetch()) == engine.scraper._decode_response(UndecodableResponse()) == "café"
+    assert fetched == ["https://www.google.com/async/reviewSort"]
+
+
+def test_async_engine_retries_on_the_shared_session():
+    adapter = AsyncReviewsEngine().scraper.session.get_adapter("https://www.google.com")
+    assert 429 in adapter.max_retries.status_forcelist
@@ -0,0 +1,18 @@
+import os
+from src import review_store
+
+
+def test_stores_new_reviews_before_stored_ones(tmp_path, monkeypatch):
+    monkeypatch.setattr(review_store, "REVIEW_STORE_DIR", f"{tmp_path}/")
+
+    assert review_store.load_stored_reviews("place") == ([], set())
+    first = review_store.store_new_reviews("place", [{"review_id": "b"}, {"review_id": "a"}], [])
+    stored, known_review_ids = review_store.load_stored_reviews("place")
+    assert stored == first
+    assert known_review_ids == {"a", "b"}
+
+    edited = {"review_id": "b", "text": "edited"}
+    reviews = review_store.store_new_reviews("place", [{"review_id": "c"}, edited], stored)
+    assert reviews == [{"review_id": "c"}, edited, {"review_id": "a"}]
+    assert review_store.load_stored_reviews("place")[0] == reviews
+    assert os.listdir(tmp_path) == ["place.json"]
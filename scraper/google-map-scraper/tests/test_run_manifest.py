@@ -0,0 +1,50 @@
+import os
+from src.run_manifest import DETAILS_FETCHED, PENDING, SEARCHED, WRITTEN, RunManifest
+
+QUERIES = ["cafes in lisbon", "bakeries in porto"]
+OPTIONS = {"fields": ["name", "rating"], "sort": [["reviews", "desc"]], "max": 20, "lang": "en", "output_formats": ["csv"]}
+
+
+def start_run(directory):
+    manifest = RunManifest.open(QUERIES, directory=str(directory), options=OPTIONS)
+    manifest.mark(0, WRITTEN)
+    manifest.mark(1, SEARCHED, {"links": ["https://www.google.com/maps/place/1"], "sponsored_links": []})
+    return manifest
+
+
+def test_resumes_the_same_queries_and_options(tmp_path):
+    start_run(tmp_path)
+
+    manifest = RunManifest.open(QUERIES, resume=True, directory=str(tmp_path), options=dict(OPTIONS))
+    assert manifest.resumed
+    assert manifest.states == [WRITTEN, SEARCHED]
+    assert manifest.load(1, SEARCHED)["links"] == ["https://www.google.com/maps/place/1"]
+
+
+def test_starts_over_when_an_option_changed(tmp_path):
+    start_run(tmp_path)
+
+    for name, value in [("fields", ["name"]), ("sort", []), ("max", 50), ("lang", "pt"), ("output_formats", ["json"])]:
+        start_run(tmp_path)
+        manifest = RunManifest.open(QUERIES, resume=True, directory=str(tmp_path), options={**OPTIONS, name: value})
+        assert not manifest.resumed, name
+        assert manifest.states == [PENDING, PENDING]
+        assert os.listdir(tmp_path) == ["run_manifest.jsonl"]
+
+
+def test_starts_over_without_resume(tmp_path):
+    start_run(tmp_path)
+
+    manifest = RunManifest.open(QUERIES, directory=str(tmp_path), options=OPTIONS)
+    assert not manifest.resumed
+    assert not manifest.reached(1, SEARCHED)
+
+
+def test_finished_run_is_not_resumed(tmp_path):
+    manifest = start_run(tmp_path)
+    manifest.mark(1, DETAILS_FETCHED, {"query": QUERIES[1], "places": []})
+    manifest.mark(1, WRITTEN)
+    manifest.finish()
+
+    assert os.listdir(tmp_path) == []
+    assert not RunManifest.open(QUERIES, resume=True, directory=str(tmp_path), options=OPTIONS).resumed
@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+from src.gmaps import run_queries
+
+
+def test_results_keep_query_order():
+    def scrape(index, query):
+        # Later queries finish first
+        time.sleep(0.01 * (5 - index))
+        return query
+
+    assert run_queries(list(range(5)), scrape, lambda index, places: places * 2, 3) == [0, 2, 4, 6, 8]
+
+
+def test_failed_search_cancels_queued_searches():
+    started = []
+
+    def scrape(index, query):
+        started.append(index)
+        time.sleep(0.02)
+        if index == 1:
+            raise RuntimeError("search failed")
+        return query
+
+    with pytest.raises(RuntimeError):
+        run_queries(list(range(50)), scrape, lambda index, places: places, 2)
+    assert len(started) < 10
+
+
+def test_failed_processing_cancels_queued_searches():
+    started = []
+
+    def scrape(index, query):
+        started.append(index)
+        time.sleep(0.02)
+        return query
+
+    def process(index, places):
+        if index == 0:
+            raise KeyError("owner")
+        return places
+
+    with pytest.raises(KeyError):
+        run_queries(list(range(50)), scrape, process, 2)
+    assert len(started) < 10
@@ -0,0 +1,79 @@
+import pytest
+import requests
+from src import rate_limiter, social_scraper
+
+DATA = {"place_id": "place", "website": "https://example.com", "key": "key"}
+
+
+class FakeResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        if isinstance(self.data, Exception):
+            raise self.data
+        return self.data
+
+
+@pytest.fixture
+def controller(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "controllers", {})
+    return rate_limiter.get_rate_controller("rapidapi")
+
+
+def answer_with(monkeypatch, outcome):
+    def get(*args, **kwargs):
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+    monkeypatch.setattr(social_scraper.requests, "get", get)
+
+
+def test_only_200_is_a_success(monkeypatch, controller):
+    answer_with(monkeypatch, FakeResponse(204, {}))
+
+    result = social_scraper.do_request(DATA)
+
+    assert result.data["error"] == social_scraper.FAILED_DUE_TO_UNKNOWN_ERROR
+    assert controller.stats()["successes"] == 0
+
+
+@pytest.mark.parametrize("status_code, message, error", [
+    (503, "Service Unavailable", social_scraper.FAILED_DUE_TO_UNKNOWN_ERROR),
+    (429, "You have exceeded the MONTHLY quota", social_scraper.FAILED_DUE_TO_CREDITS_EXHAUSTED),
+    (403, "You are not subscribed to this API.", social_scraper.FAILED_DUE_TO_NOT_SUBSCRIBED),
+])
+def test_failures_that_are_not_throttling_keep_the_rate(monkeypatch, controller, status_code, message, error):
+    answer_with(monkeypatch, FakeResponse(status_code, {"message": message}))
+
+    result = social_scraper.do_request(DATA)
+
+    assert result.data["error"] == error
+    assert controller.stats()["errors"] == 0
+
+
+def test_records_an_error_when_rate_limited(monkeypatch, controller):
+    answer_with(monkeypatch, FakeResponse(429, {"message": "Too many requests"}))
+    monkeypatch.setattr(controller, "wait_after_error", lambda: None)
+
+    result = social_scraper.do_request(DATA)
+
+    assert result.data is None
+    assert controller.stats()["errors"] == 3
+
+
+def test_records_an_error_for_a_failed_connection(monkeypatch, controller):
+    answer_with(monkeypatch, requests.ConnectionError("refused"))
+
+    with pytest.raises(requests.ConnectionError):
+        social_scraper.do_request(DATA)
+    assert controller.stats()["errors"] == 1
+
+
+def test_records_an_error_for_a_page_that_is_not_json(monkeypatch, controller):
+    answer_with(monkeypatch, FakeResponse(502, ValueError("not JSON")))
+
+    with pytest.raises(ValueError):
+        social_scraper.do_request(DATA)
+    assert controller.stats()["errors"] == 1
@@ -0,0 +1,138 @@
+import random
+import pytest
+from src.gmaps import Gmaps
+from src.sort_filter import NUMPY_SORT_THRESHOLD, compile_filter, compile_sort, list_contains_string, np, sort_place, to_columns
+
+CATEGORIES = ["Restaurant", "Café", "cafe", "Dentist", "Pet Groomer", "pet-groomer", "Bäckerei"]
+
+SORTS = [
+    Gmaps.DEFAULT_SORT,
+    [Gmaps.SORT_BY_RATING_DESCENDING, Gmaps.SORT_BY_NAME_ASCENDING],
+    [Gmaps.SORT_BY_NOT_HAS_WEBSITE, Gmaps.SORT_BY_HAS_PHONE, Gmaps.SORT_BY_REVIEWS_DESCENDING],
+    [["reviews", "asc"], ["name", "desc"], ["is_spending_on_ads", False]],
+    [["owner", "asc"], ["rating", "desc"]],
+    [],
+]
+
+
+def random_place(rng, index, blanks=True):
+    # Empty strings can't be compared with numbers, so sorted places leave them out
+    blank = "" if blanks else None
+    return {
+        "place_id": index,
+        "name": rng.choice(["Alpha", "beta", "Gamma", "Ω Cafe", None]),
+        "rating": rng.choice([None, blank, 3, 4, 4.5, 4.8, 5]),
+        "reviews": rng.choice([None, blank, 0, 3, 12, 120, 4000]),
+        "website": rng.choice([None, "https://example.com"]),
+        "phone": rng.choice([None, "", "+1 555 0100"]),
+        "linkedin": rng.choice([None, "https://linkedin.com/company/example"]),
+        "is_spending_on_ads": rng.choice([True, False, None]),
+        "main_category": rng.choice(CATEGORIES),
+        "owner": rng.choice([None, ["Ana"], ["Bo", "Cy"]]),
+    }
+
+
+def sequential_sort(places, sorts):
+    for sort in sorts:
+        places = sort_place(places, sort)
+    return places
+
+
+def legacy_filter_places(ls, filter_data):
+    """The predicate chain filter_places used before compile_filter"""
+    def fn(i):
+        min_rating = filter_data.get("min_rating")
+        max_rating = filter_data.get("max_rating")
+        min_reviews = filter_data.get("min_reviews")
+        max_reviews = filter_data.get("max_reviews")
+        has_phone = filter_data.get("has_phone")
+        has_website = filter_data.get("has_website")
+        category_in = filter_data.get("category_in")
+
+        rating = i.get('rating')
+        reviews = i.get('reviews')
+        web_site = i.get("website")
+        phone = i.get("phone")
+        main_category = i.get("main_category")
+
+        if category_in and (not list_contains_string(category_in, main_category)):
+            return False
+
+        if min_rating is not None and (rating == '' or rating is None or rating < min_rating):
+            return False
+
+        if max_rating is not None and (rating == '' or rating is None or rating > max_rating):
+            return False
+
+        if min_reviews is not None and (reviews == '' or reviews is None or reviews < min_reviews):
+            return False
+
+        if max_reviews is not None and (reviews == '' or reviews is None or reviews > max_reviews):
+            return False
+
+        if has_website is not None:
+            if (has_website is False and web_site is not None):
+                return False
+
+            if (has_website is True and web_site is None):
+                return False
+
+        if has_phone is not None:
+            if (has_phone is True and (phone is None or phone == '')):
+                return False
+
+            if (has_phone is False and (not (phone is None or phone == ''))):
+                return False
+
+        return True
+
+    return list(filter(fn, ls))
+
+
+def random_filter(rng):
+    filter_data = {}
+    for key, values in [
+        ("min_rating", [3, 4.5]),
+        ("max_rating", [4, 4.8]),
+        ("min_reviews", [1, 100]),
+        ("max_reviews", [10, 1000]),
+        ("has_phone", [True, False]),
+        ("has_website", [True, False]),
+        ("category_in", [["cafe"], ["Pet Groomer", "Dentist"], ["bakerei", "Bäckerei"]]),
+    ]:
+        if rng.random() < 0.4:
+            filter_data[key] = rng.choice(values)
+    return filter_data
+
+
+@pytest.mark.parametrize("sorts", SORTS)
+def test_compile_sort_matches_sequential_sorts(sorts):
+    rng = random.Random(0)
+    for size in [0, 1, 2, 50, 500]:
+        places = [random_place(rng, index, blanks=False) for index in range(size)]
+        assert [place["place_id"] for place in compile_sort(sorts).sort(places)] == [place["place_id"] for place in sequential_sort(places, sorts)]
+
+
+@pytest.mark.skipif(np is None, reason="NumPy is not installed")
+@pytest.mark.parametrize("sorts", [sorts for sorts in SORTS if sorts and sorts[0][0] != "owner"])
+def test_lexsort_matches_sequential_sorts(sorts):
+    rng = random.Random(1)
+    places = [random_place(rng, index, blanks=False) for index in range(NUMPY_SORT_THRESHOLD + 100)]
+    compiled = compile_sort(sorts)
+
+    expected = [place["place_id"] for place in sequential_sort(places, sorts)]
+    assert [place["place_id"] for place in compiled.lexsort(places)] == expected
+    assert [place["place_id"] for place in compiled.sort(places)] == expected
+
+
+def test_compile_filter_matches_the_predicate_chain():
+    rng = random.Random(2)
+    places = [random_place(rng, index) for index in range(300)]
+    for _ in range(200):
+        filter_data = random_filter(rng)
+        expected = legacy_filter_places(places, filter_data)
+        compiled = compile_filter(filter_data)
+
+        assert compiled.filter(places) == expected
+        mask = compiled.mask(to_columns(places, ["rating", "reviews", "website", "phone", "main_category"]))
+        assert [place for place, keep in zip(places, mask) if keep] == expected
@@ -0,0 +1,68 @@
+from threading import Barrier, Thread
+
+import pytest
+
+from src import scraper
+
+
+def create_data(query):
+    return {"query": query, "convert_to_english": False}
+
+
+def fake_search(links, error=None, barrier=None):
+    def search_places(data, cache=True, search_backend=None):
+        token = scraper.get_search_token()
+        scraper.track_links(token, links)
+        if barrier is not None:
+            # Both streams have tracked their links before any place is published
+            barrier.wait()
+        for link in links:
+            scraper.publish_place(link, {"link": link})
+        if error is not None:
+            raise error
+        return {"query": data["query"], "places": [{"link": link} for link in links]}
+    return search_places
+
+
+def test_yields_every_place_once(monkeypatch):
+    links = [f"https://maps/place/{n}" for n in range(5)]
+    monkeypatch.setattr(scraper, "search_places", fake_search(links))
+
+    assert [place["link"] for place in scraper.stream_places(create_data("farms"))] == links
+    assert scraper.place_streams == {} and scraper.streamed_links == {}
+
+
+def test_raises_error_of_failed_search_after_its_places(monkeypatch):
+    links = [f"https://maps/place/{n}" for n in range(3)]
+    monkeypatch.setattr(scraper, "search_places", fake_search(links, ValueError("stuck")))
+
+    yielded = []
+    with pytest.raises(ValueError):
+        for place in scraper.stream_places(create_data("farms")):
+            yielded.append(place["link"])
+    assert yielded == links
+
+
+def test_raises_when_search_returns_nothing(monkeypatch):
+    monkeypatch.setattr(scraper, "search_places", lambda data, cache=True, search_backend=None: None)
+
+    with pytest.raises(RuntimeError):
+        list(scraper.stream_places(create_data("farms")))
+
+
+def test_streams_of_the_same_query_get_all_their_places(monkeypatch):
+    links = [f"https://maps/place/{n}" for n in range(4)]
+    monkeypatch.setattr(scraper, "search_places", fake_search(links, barrier=Barrier(2)))
+
+    results = [None, None]
+
+    def consume(index):
+        results[index] = [place["link"] for place in scraper.stream_places(create_data("farms"))]
+
+    threads = [Thread(target=consume, args=(index,)) for index in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert results == [links, links]
@@ -0,0 +1,180 @@
+import os
+import random
+import pytest
+from botasaurus import bt
+from src.fields import ALL_FIELDS, DEFAULT_FIELDS, Fields
+from src.gmaps import determine_extraction_fields
+from src.write_output import (
+    OUTPUT_CSV,
+    OUTPUT_GEOPARQUET,
+    OUTPUT_JSON,
+    OUTPUT_PARQUET,
+    can_create_detailed_reviews_csv,
+    can_create_email_phone_details_csv,
+    can_create_featured_reviews_csv,
+    can_create_images_csv,
+    format,
+    transform_detailed_reviews,
+    transform_email_phone_details_csv,
+    transform_featured_reviews_csv,
+    transform_images_csv,
+    transform_places,
+    transform_places_json,
+    pa,
+    write_output,
+)
+
+QUERY = "cafes in köln"
+QUERY_KEBAB = "cafes-in-köln"
+TEXTS = ["Café Zentral", "O'Reilly \"Pub\"", "a, b; c", "line\nbreak", "日本語", ""]
+
+
+def random_links(rng):
+    return [{"link": f"https://example.com/{n}", "source": rng.choice(TEXTS)} for n in range(rng.randint(0, 2))]
+
+
+def random_sources(rng, values):
+    return [{"value": value, "sources": [f"https://example.com/{n}" for n in range(rng.randint(1, 3))]} for value in rng.sample(values, rng.randint(0, 2))]
+
+
+def random_reviews(rng):
+    return [
+        {"review_id": f"r{n}", "rating": rng.randint(1, 5), "text": rng.choice(TEXTS), "review_photos": rng.choice([None, ["a.jpg", "b.jpg"]])}
+        for n in range(rng.randint(0, 3))
+    ]
+
+
+def random_place(rng, index):
+    text = lambda: rng.choice(TEXTS)
+    maybe = lambda value: rng.choice([None, value])
+    place = {
+        Fields.PLACE_ID: f"place-{index}",
+        Fields.NAME: text(),
+        Fields.DESCRIPTION: maybe(text()),
+        Fields.IS_SPENDING_ON_ADS: rng.choice([True, False]),
+        Fields.COMPETITORS: maybe([{"name": text(), "link": "https://example.com", "reviews": rng.randint(0, 99)}]),
+        Fields.REVIEWS: maybe(rng.randint(0, 5000)),
+        Fields.WEBSITE: maybe("https://example.com"),
+        Fields.EMAILS: random_sources(rng, ["a@example.com", "b@example.com"]),
+        Fields.PHONES: random_sources(rng, ["+1 555 0100", "+1 555 0101"]),
+        Fields.OWNER: {"id": "1", "name": text(), "link": "https://example.com/owner"},
+        Fields.FEATURED_IMAGE: "https://example.com/image.jpg",
+        Fields.MAIN_CATEGORY: text(),
+        Fields.CATEGORIES: maybe([text(), text()]),
+        Fields.RATING: maybe(rng.choice([4, 4.5, 3.9])),
+        Fields.WORKDAY_TIMING: maybe("9 am-5 pm"),
+        Fields.CLOSED_ON: rng.choice(["Open All Days", ["Sunday", "Monday"]]),
+        Fields.PHONE: maybe("+1 555 0100"),
+        Fields.ADDRESS: text(),
+        Fields.REVIEW_KEYWORDS: [{"keyword": text(), "count": rng.randint(1, 9)} for _ in range(rng.randint(0, 2))],
+        Fields.LINK: f"https://www.google.com/maps/place/{index}",
+        Fields.STATUS: maybe("Permanently closed"),
+        Fields.PRICE_RANGE: maybe("$$"),
+        Fields.REVIEWS_PER_RATING: {str(stars): rng.randint(0, 50) for stars in range(1, 6)},
+        Fields.FEATURED_QUESTION: maybe({"question": text(), "answer": text(), "question_ago": "a year ago", "answer_ago": "a month ago"}),
+        Fields.REVIEWS_LINK: "https://example.com/reviews",
+        Fields.COORDINATES: {"latitude": rng.uniform(-90, 90), "longitude": rng.uniform(-180, 180)},
+        Fields.PLUS_CODE: maybe("8FVC9G8F+5W"),
+        # Keys differ between places, so the CSV header is a union
+        Fields.DETAILED_ADDRESS: {key: text() for key in rng.sample(["ward", "street", "city", "postal_code", "state"], rng.randint(0, 5))},
+        Fields.TIME_ZONE: "Europe/Berlin",
+        Fields.CID: str(rng.randint(1, 10 ** 18)),
+        Fields.DATA_ID: "0x1:0x2",
+        Fields.ABOUT: [
+            {"id": about_id, "name": text(), "options": [{"name": text(), "enabled": rng.choice([True, False])} for _ in range(rng.randint(0, 3))]}
+            for about_id in rng.sample(["service_options", "accessibility", "payments"], rng.randint(0, 3))
+        ],
+        Fields.IMAGES: [{"about": text(), "link": f"https://example.com/{n}.jpg"} for n in range(rng.randint(0, 2))],
+        Fields.HOURS: [{"day": day, "times": ["9 am–5 pm"]} for day in ["Monday", "Tuesday"]],
+        Fields.MOST_POPULAR_TIMES: maybe([{"average_popularity": rng.randint(0, 100), "time_label": "6 pm"}]),
+        Fields.POPULAR_TIMES: maybe({"Monday": [{"time_label": "6 pm", "popularity_percentage": 40, "popularity_description": "Usually not busy"}]}),
+        Fields.MENU: rng.choice([{}, {"link": "https://example.com/menu", "source": text()}]),
+        Fields.RESERVATIONS: random_links(rng),
+        Fields.ORDER_ONLINE_LINKS: random_links(rng),
+        Fields.FEATURED_REVIEWS: random_reviews(rng),
+        Fields.DETAILED_REVIEWS: random_reviews(rng),
+    }
+    for social in [Fields.LINKEDIN, Fields.TWITTER, Fields.FACEBOOK, Fields.YOUTUBE, Fields.INSTAGRAM, Fields.PINTEREST, Fields.GITHUB, Fields.SNAPCHAT, Fields.TIKTOK]:
+        place[social] = maybe(f"https://{social}.com/example")
+    return place
+
+
+def write_with_bt(places, fields, output_path):
+    """The outputs as write_output wrote them before streaming, by building each list and handing it to bt"""
+    csv_path = output_path + "csv/"
+    json_path = output_path + "json/"
+    os.makedirs(csv_path)
+    os.makedirs(json_path)
+
+    bt.write_json(transform_places_json(places, fields), json_path + format(QUERY_KEBAB, "json", "places"), False)
+    bt.write_csv(transform_places(places, fields), csv_path + format(QUERY_KEBAB, "csv", "places"), False)
+    if can_create_email_phone_details_csv(fields):
+        bt.write_csv(transform_email_phone_details_csv(places), csv_path + format(QUERY_KEBAB, "csv", "email-phone-details"), False)
+    if can_create_detailed_reviews_csv(fields):
+        bt.write_csv(transform_detailed_reviews(places), csv_path + format(QUERY_KEBAB, "csv", "detailed-reviews"), False)
+    if can_create_featured_reviews_csv(fields):
+        bt.write_csv(transform_featured_reviews_csv(places), csv_path + format(QUERY_KEBAB, "csv", "featured-reviews"), False)
+    if can_create_images_csv(fields):
+        bt.write_csv(transform_images_csv(places, fields), csv_path + format(QUERY_KEBAB, "csv", "images"), False)
+
+
+def read_files(folder):
+    files = {}
+    for root, _, names in os.walk(folder):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as file:
+                files[os.path.relpath(path, folder)] = file.read()
+    return files
+
+
+def random_fields(rng):
+    return [field for field in ALL_FIELDS if rng.random() < 0.5]
+
+
+@pytest.mark.parametrize("seed", range(6))
+def test_write_output_matches_the_bt_writers(seed, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rng = random.Random(seed)
+    fields = [ALL_FIELDS, DEFAULT_FIELDS][seed] if seed < 2 else random_fields(rng)
+    places = [random_place(rng, index) for index in range(rng.choice([0, 1, 40]) if seed > 0 else 40)]
+
+    write_output(QUERY, places, fields, [OUTPUT_CSV, OUTPUT_JSON])
+    write_with_bt(places, fields, "expected/")
+
+    written = read_files(f"output/{QUERY_KEBAB}")
+    expected = read_files("expected")
+    assert sorted(written) == sorted(expected)
+    for name in expected:
+        assert written[name] == expected[name], name
+
+
+def test_geoparquet_always_has_coordinates(tmp_path, monkeypatch):
+    assert Fields.COORDINATES not in determine_extraction_fields([Fields.NAME], [], [OUTPUT_CSV])
+    assert Fields.COORDINATES in determine_extraction_fields([Fields.NAME], [], [OUTPUT_CSV, OUTPUT_GEOPARQUET])
+    if pa is None:
+        pytest.skip("pyarrow is not installed")
+
+    import pyarrow.parquet as pq
+    monkeypatch.chdir(tmp_path)
+    places = [random_place(random.Random(seed), seed) for seed in range(3)]
+    write_output(QUERY, places, [Fields.PLACE_ID, Fields.NAME], [OUTPUT_GEOPARQUET])
+
+    table = pq.read_table(f"output/{QUERY_KEBAB}/geoparquet/{format(QUERY_KEBAB, 'parquet', 'places')}")
+    assert table.column_names == [Fields.PLACE_ID, Fields.NAME, "latitude", "longitude", "geometry", "bbox"]
+    assert table.column("latitude").to_pylist() == [place[Fields.COORDINATES]["latitude"] for place in places]
+
+
+def test_a_failed_write_leaves_no_partial_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    output_formats = [OUTPUT_CSV, OUTPUT_JSON] + ([OUTPUT_PARQUET, OUTPUT_GEOPARQUET] if pa is not None else [])
+
+    def places():
+        rng = random.Random(0)
+        yield random_place(rng, 0)
+        yield random_place(rng, 1)
+        raise RuntimeError("crashed")
+
+    with pytest.raises(RuntimeError):
+        write_output(QUERY, places(), ALL_FIELDS, output_formats)
+    assert read_files(f"output/{QUERY_KEBAB}") == {}